@@ -0,0 +1,343 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+from logics.BaselineComparer import BaselineComparer
+from logics.ChangeConditions import parse_environment
+from logics.ChangeSerializers import SERIALIZERS
+from logics.ChangeLogComparator import LiquibaseChangelogComparer, SEED_DATA_INSERT, SEED_DATA_LOAD_DATA, SQL_DIALECTS
+from logics.HistoryMiner import ChangelogHistoryMiner
+from logics.MemoryBenchmark import measure_changelog_memory
+from logics.ShardedChangelogWriter import SHARD_BY_CHANGESET, SHARD_BY_TABLE
+from logics.SqlDialect import DIALECTS
+from logics.TableFilter import TableFilter, split_patterns
+from logics.ThreeWayMerge import ThreeWayChangelogMerger
+
+
+# Options of a single previous/current comparison, which --history and --baseline do not take
+COMPARISON_ONLY_OPTIONS = (('--format', 'output_format'), ('--seed-data-format', 'seed_data_format'),
+                           ('--seed-data-dir', 'seed_data_dir'), ('--version-store', 'version_store'),
+                           ('--snapshot-store', 'snapshot_store'), ('--report', 'report'), ('--sql-dir', 'sql_dir'),
+                           ('--shard-dir', 'shard_dir'), ('--environment', 'environments'),
+                           ('--merge-base', 'merge_base'), ('--check', 'check'), ('--validate', 'validate'))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Generate a Liquibase migration changelog from the differences between two changelogs.")
+    parser.add_argument('changelogs', nargs='+', metavar='CHANGELOG',
+                        help="previous and current changelog: file paths or revision:path specs, e.g. "
+                             "v1.2:db/changelog.xml HEAD:db/changelog.xml, or sqlite:path to diff against the "
+                             "schema of a SQLite database, or stored:NAME for a version saved in the "
+                             "--version-store; with --history, the changelog path "
+                             "inside the repository")
+    parser.add_argument('-o', '--output', help="write the migration to this file instead of standard output "
+                                               "(with --history: the output directory)")
+    parser.add_argument('--check', action='store_true',
+                        help="only check whether a migration is needed: print a JSON summary and exit with "
+                             "0 (no migration needed), 1 (migration needed) or 2 (error)")
+    parser.add_argument('--validate', action='store_true',
+                        help="dry-run the generated migration on an in-memory SQLite database built from the "
+                             "previous changelog: print a JSON result and exit with 0 (the result matches the "
+                             "current changelog), 1 (a changeSet failed or the schema differs) or 2 (error)")
+    parser.add_argument('--benchmark-memory', action='store_true',
+                        help="measure the memory each local XML CHANGELOG takes as a minidom document and as the "
+                             "comparer's element model, printing a JSON line per changelog")
+    parser.add_argument('--history', metavar='REVISION_RANGE',
+                        help="generate a migration for every consecutive revision pair in the range, e.g. v1.0..HEAD")
+    parser.add_argument('--baseline', metavar='CURRENT',
+                        help="diff this current changelog against every CHANGELOG given as a previous snapshot, "
+                             "writing one migration per candidate into the --output directory")
+    parser.add_argument('--merge-base', metavar='BASE',
+                        help="three-way merge: the two CHANGELOGs are branches (ours, theirs) of this base changelog; "
+                             "write the migration from BASE to the merged schema and exit with 0 (clean merge), "
+                             "1 (conflicts, resolved by keeping ours) or 2 (error)")
+    parser.add_argument('--conflict-report', metavar='PATH',
+                        help="with --merge-base, also write the merge conflicts to this file as JSON")
+    parser.add_argument('--workers', type=int, help="number of worker processes used with --history or --baseline, "
+                                                   "or to diff the schemas of a multi-schema changelog")
+    parser.add_argument('--repo', default='.', help="git repository used for revision:path specs (default: current directory)")
+    parser.add_argument('--snapshot-store', metavar='PATH',
+                        help="keep both snapshots in this SQLite file and diff them there, holding only one "
+                             "changelog in memory at a time; a rerun reuses the snapshots already stored")
+    parser.add_argument('--version-store', metavar='PATH',
+                        help="SQLite file of saved changelog versions, read by stored:NAME changelog specs; two "
+                             "stored versions are diffed without parsing any changelog")
+    parser.add_argument('--save-version', metavar='NAME',
+                        help="parse the single CHANGELOG and save it as version NAME in the --version-store, "
+                             "printing a JSON summary")
+    parser.add_argument('--format', dest='output_format', choices=sorted(SERIALIZERS), default='xml',
+                        help="output format of the migration changelog (default: xml)")
+    parser.add_argument('--report', metavar='PATH', help="also write a JSON report of the changes to this file")
+    parser.add_argument('--sql-dir', help="also write the SQL every changeSet runs, one migration.<dialect>.sql "
+                                          "file per --sql-dialects entry, into this directory")
+    parser.add_argument('--sql-dialects', type=parse_dialects, default=SQL_DIALECTS,
+                        help=f"comma-separated dialects for --sql-dir (default: {','.join(SQL_DIALECTS)}; "
+                             f"available: {','.join(sorted(DIALECTS))})")
+    parser.add_argument('--shard-dir', help="write shard files and a master changelog into this directory")
+    parser.add_argument('--shard-by', choices=(SHARD_BY_TABLE, SHARD_BY_CHANGESET), default=SHARD_BY_TABLE,
+                        help="with --shard-dir, write a shard per table or keep the changesets as one stream")
+    parser.add_argument('--max-changesets-per-shard', type=int, metavar='N',
+                        help="with --shard-dir, split shards holding more than N changesets")
+    parser.add_argument('--max-bytes-per-shard', type=int, metavar='BYTES',
+                        help="with --shard-dir, start a new shard file once one has reached about BYTES")
+    parser.add_argument('--insert-batch-size', type=int, default=1, help="number of new seed rows per insert changeset")
+    parser.add_argument('--seed-data-format', choices=(SEED_DATA_INSERT, SEED_DATA_LOAD_DATA), default=SEED_DATA_INSERT,
+                        help="emit new seed rows as insert changesets or as loadData with a CSV file")
+    parser.add_argument('--seed-data-dir', help="directory for CSV files written in loadData mode; per environment, a "
+                             "subdirectory named after it")
+    parser.add_argument('--include-tables', type=split_patterns, action='append', default=[], metavar='PATTERNS',
+                        help="only compare tables matching these comma-separated globs, or one 're:' regex; repeatable")
+    parser.add_argument('--exclude-tables', type=split_patterns, action='append', default=[], metavar='PATTERNS',
+                        help="leave out tables matching these comma-separated globs, or one 're:' regex; repeatable")
+    parser.add_argument('--exclude-columns', type=split_patterns, action='append', default=[], metavar='PATTERNS',
+                        help="leave out columns matching these patterns, as 'column' or 'table.column'; repeatable")
+    parser.add_argument('--environment', dest='environments', type=parse_environment_spec, action='append',
+                        default=[], metavar='SPEC',
+                        help="write a migration per environment into the --output directory; SPEC is a context "
+                             "or dbms name, or NAME:contexts=a,b;labels=EXPR;dbms=NAME; repeatable")
+    return parser
+
+
+def parse_environment_spec(value):
+    try:
+        return parse_environment(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def parse_dialects(value):
+    dialects = [dialect.strip().lower() for dialect in value.split(',') if dialect.strip()]
+    unknown = [dialect for dialect in dialects if dialect not in DIALECTS]
+    if not dialects:
+        raise argparse.ArgumentTypeError("expected at least one SQL dialect")
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown SQL dialect(s): {', '.join(unknown)}")
+    return dialects
+
+
+def build_table_filter(args):
+    """Return a TableFilter for the --include-tables/--exclude-tables/--exclude-columns options, or None."""
+    include_tables = [pattern for patterns in args.include_tables for pattern in patterns]
+    exclude_tables = [pattern for patterns in args.exclude_tables for pattern in patterns]
+    exclude_columns = [pattern for patterns in args.exclude_columns for pattern in patterns]
+    if not (include_tables or exclude_tables or exclude_columns):
+        return None
+    return TableFilter(include_tables, exclude_tables, exclude_columns)
+
+
+def reject_comparison_options(parser, args, mode):
+    """Exit with a usage error if any option that mode ignores was given."""
+    given = [option for option, dest in COMPARISON_ONLY_OPTIONS if getattr(args, dest) != parser.get_default(dest)]
+    if given:
+        parser.error(f"{mode} cannot be combined with {', '.join(given)}")
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    args.table_filter = build_table_filter(args)
+
+    if args.benchmark_memory:
+        return run_memory_benchmark(args)
+
+    if args.save_version:
+        if len(args.changelogs) != 1 or not args.version_store:
+            parser.error("--save-version takes exactly one changelog and a --version-store")
+        return run_save_version(args)
+
+    if args.history:
+        if len(args.changelogs) != 1 or not args.output:
+            parser.error("--history takes exactly one changelog path and an --output directory")
+        reject_comparison_options(parser, args, '--history')
+        return run_history(args)
+
+    if args.baseline:
+        if not args.output:
+            parser.error("--baseline needs an --output directory")
+        reject_comparison_options(parser, args, '--baseline')
+        return run_baseline(args)
+
+    if len(args.changelogs) != 2:
+        parser.error("expected a previous and a current changelog")
+
+    if args.merge_base:
+        return run_merge(args)
+
+    previous, current = args.changelogs
+    if args.environments:
+        if not args.output:
+            parser.error("--environment needs an --output directory")
+        return run_environments(previous, current, args)
+    if args.check:
+        return run_check(previous, current, args)
+    if args.validate:
+        return run_validate(previous, current, args)
+
+    comparator = LiquibaseChangelogComparer(previous, current,
+                                            insert_batch_size=args.insert_batch_size,
+                                            seed_data_format=args.seed_data_format,
+                                            seed_data_dir=args.seed_data_dir,
+                                            repo_path=args.repo, table_filter=args.table_filter,
+                                            max_workers=args.workers, snapshot_store=args.snapshot_store,
+                                            version_store=args.version_store)
+
+    if args.shard_dir:
+        master_path = comparator.compare_and_generate_sharded(args.shard_dir, shard_by=args.shard_by,
+                                                           max_changesets_per_shard=args.max_changesets_per_shard,
+                                                           max_bytes_per_shard=args.max_bytes_per_shard,
+                                                           report_path=args.report, sql_dir=args.sql_dir,
+                                                           sql_dialects=args.sql_dialects)
+        if master_path is None:
+            return 1
+        print(f"Master changelog written to {master_path}", file=sys.stderr)
+        return 0
+
+    new_changelog = comparator.compare_and_generate(report_path=args.report, output_format=args.output_format,
+                                                 sql_dir=args.sql_dir, sql_dialects=args.sql_dialects)
+    if new_changelog is None:
+        return 1
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(new_changelog)
+    else:
+        sys.stdout.write(new_changelog)
+    return 0
+
+
+def run_merge(args):
+    ours, theirs = args.changelogs
+    merger = ThreeWayChangelogMerger(args.merge_base, ours, theirs,
+                                     comparer_options={'insert_batch_size': args.insert_batch_size,
+                                                       'seed_data_format': args.seed_data_format,
+                                                       'seed_data_dir': args.seed_data_dir,
+                                                       'repo_path': args.repo, 'table_filter': args.table_filter,
+                                                       'max_workers': args.workers,
+                                                       'version_store': args.version_store})
+    migration = merger.merge_and_generate(output_format=args.output_format, report_path=args.report,
+                                          conflict_report_path=args.conflict_report)
+    if migration is None:
+        return 2
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(migration)
+    else:
+        sys.stdout.write(migration)
+    for conflict in merger.conflicts:
+        print(f"Conflict: {conflict['object']} {conflict['name']} {conflict['reason']}; "
+              f"kept {conflict['resolution']}", file=sys.stderr)
+    return 1 if merger.conflicts else 0
+
+
+def run_environments(previous, current, args):
+    comparator = LiquibaseChangelogComparer(previous, current,
+                                            insert_batch_size=args.insert_batch_size,
+                                            seed_data_format=args.seed_data_format,
+                                            seed_data_dir=args.seed_data_dir,
+                                            repo_path=args.repo, table_filter=args.table_filter,
+                                            version_store=args.version_store)
+    paths = comparator.compare_and_generate_environments(args.environments, args.output,
+                                                         output_format=args.output_format, report_path=args.report)
+    if paths is None:
+        return 1
+    for name, path in paths.items():
+        print(f"Migration for {name} written to {path}", file=sys.stderr)
+    return 0
+
+
+def run_check(previous, current, args):
+    comparator = LiquibaseChangelogComparer(previous, current, repo_path=args.repo, table_filter=args.table_filter,
+                                            version_store=args.version_store)
+    try:
+        summary = comparator.check_migration_needed()
+    except Exception as e:
+        print(json.dumps({'previous': previous, 'current': current, 'error': str(e)}))
+        return 2
+
+    print(json.dumps(summary))
+    return 1 if summary['migration_needed'] else 0
+
+
+def run_validate(previous, current, args):
+    comparator = LiquibaseChangelogComparer(previous, current, insert_batch_size=args.insert_batch_size,
+                                            repo_path=args.repo, table_filter=args.table_filter,
+                                            version_store=args.version_store, counter_file=None)
+    try:
+        result = comparator.validate_migration()
+    except Exception as e:
+        print(json.dumps({'previous': previous, 'current': current, 'error': str(e)}))
+        return 2
+
+    print(json.dumps(result))
+    return 0 if result['valid'] else 1
+
+
+def run_memory_benchmark(args):
+    for changelog in args.changelogs:
+        try:
+            result = measure_changelog_memory(changelog)
+        except Exception as e:
+            print(json.dumps({'changelog': changelog, 'error': str(e)}))
+            return 2
+        print(json.dumps(result))
+    return 0
+
+
+def run_save_version(args):
+    changelog = args.changelogs[0]
+    comparator = LiquibaseChangelogComparer(changelog, changelog, repo_path=args.repo, table_filter=args.table_filter,
+                                            version_store=args.version_store)
+    started = time.perf_counter()
+    try:
+        summary = comparator.save_version(changelog, args.save_version)
+    except Exception as e:
+        print(json.dumps({'changelog': changelog, 'error': str(e)}))
+        return 2
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    print(json.dumps(summary))
+    return 0
+
+
+def run_baseline(args):
+    comparer = BaselineComparer(args.baseline, repo_path=args.repo,
+                                comparer_options={'insert_batch_size': args.insert_batch_size,
+                                                  'table_filter': args.table_filter})
+    os.makedirs(args.output, exist_ok=True)
+
+    failures = 0
+    results = comparer.compare_many_parallel(args.changelogs, max_workers=args.workers)
+    for index, (candidate, migration_xml) in enumerate(results, start=1):
+        if migration_xml is None:
+            failures += 1
+            continue
+        name = re.sub(r'[^A-Za-z0-9_.-]+', '_', os.path.splitext(candidate)[0]).strip('_')
+        with open(os.path.join(args.output, f"{index:04d}-{name}.xml"), 'w', encoding='utf-8') as file:
+            file.write(migration_xml)
+
+    stats = comparer.cache_stats()
+    print(f"Table diff cache: {stats['hits']} hits, {stats['misses']} misses "
+          f"({stats['hit_rate']:.0%} hit rate)", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def run_history(args):
+    miner = ChangelogHistoryMiner(args.repo, args.changelogs[0], max_workers=args.workers,
+                                  comparer_options={'insert_batch_size': args.insert_batch_size,
+                                                    'table_filter': args.table_filter})
+    result = miner.mine(args.history, args.output)
+    for revision, error in result.skipped_revisions:
+        print(f"Skipped {revision}: {error}", file=sys.stderr)
+    written = sum(1 for entry in result.migration_files if entry[3])
+    print(f"{written} migration files written to {args.output}", file=sys.stderr)
+    print(f"Mined {result.revision_count} revisions in {result.elapsed_seconds:.2f}s "
+          f"({result.revisions_per_second:.1f} revisions/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
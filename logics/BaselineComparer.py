@@ -0,0 +1,99 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from logics.ChangeLogComparator import LiquibaseChangelogComparer
+from logics.GitBlobReader import get_shared_reader
+from logics.TableDiffCache import TableDiffCache, merge_cache_stats
+from logics.XmlChangelogSerializer import XmlChangelogSerializer
+
+# Baseline comparer of a worker process, set once by init_baseline_worker
+_worker_comparer = None
+
+
+def init_baseline_worker(baseline_snapshot, repo_path, comparer_options, table_diff_cache_size):
+    """Worker initializer: receive the baseline once per process and keep it read-only."""
+    global _worker_comparer
+    _worker_comparer = BaselineComparer(baseline_snapshot, repo_path=repo_path, comparer_options=comparer_options,
+                                        table_diff_cache_size=table_diff_cache_size)
+
+
+def compare_candidate_in_worker(candidate_spec):
+    """Worker entry point: parse one candidate and diff it against the process' baseline.
+
+    The worker's table diff cache statistics travel back with every result.
+    """
+    migration_xml = _worker_comparer.compare_candidate(candidate_spec)
+    return candidate_spec, migration_xml, (os.getpid(), _worker_comparer.table_diff_cache.stats())
+
+
+class BaselineComparer:
+    """Diff one baseline ("current") changelog against many candidate ("previous") changelogs.
+
+    The baseline is parsed once and reused for every candidate; results are streamed as
+    (candidate spec, migration XML) pairs, with None for a candidate that failed. Table-level
+    diffs are memoized across candidates, since most tables are identical across tenants.
+    """
+
+    def __init__(self, baseline, repo_path='.', comparer_options=None, table_diff_cache_size=4096):
+        self.repo_path = repo_path
+        self.table_diff_cache_size = table_diff_cache_size
+        self.table_diff_cache = TableDiffCache(table_diff_cache_size)
+        self.worker_cache_stats = {}
+        # Every candidate gets its own migration file, so changeset IDs do not share the global counter
+        self.comparer_options = dict({'counter_file': None}, **(comparer_options or {}))
+        self.comparer_options.pop('git_reader', None)
+
+        if isinstance(baseline, str):
+            comparer = self.create_comparer(baseline, baseline)
+            baseline = comparer.load_snapshot(baseline)
+        self.baseline_snapshot = baseline
+
+    def create_comparer(self, candidate_spec, baseline_spec):
+        # All candidates of this process are read through the same cat-file process
+        return LiquibaseChangelogComparer(candidate_spec, baseline_spec, repo_path=self.repo_path,
+                                          git_reader=get_shared_reader(self.repo_path),
+                                          table_diff_cache=self.table_diff_cache, **self.comparer_options)
+
+    def compare_candidate(self, candidate_spec):
+        """Parse one candidate and return the migration that brings it to the baseline, or None on error."""
+        comparer = self.create_comparer(candidate_spec, self.baseline_snapshot.label)
+        try:
+            candidate_snapshot = comparer.load_snapshot(candidate_spec)
+            changes = comparer.diff_snapshots(candidate_snapshot, self.baseline_snapshot)
+            return XmlChangelogSerializer().to_string(changes)
+        except Exception as e:
+            print(f"Error generating migration script for {candidate_spec}: {e}")
+            return None
+
+    def compare_many(self, candidate_specs):
+        """Yield (candidate spec, migration XML) for every candidate, one at a time, in order."""
+        for candidate_spec in candidate_specs:
+            yield candidate_spec, self.compare_candidate(candidate_spec)
+
+    def compare_many_parallel(self, candidate_specs, max_workers=None):
+        """Like compare_many, but candidates are parsed and diffed in worker processes.
+
+        The baseline is sent to each worker once; at most two candidates per worker are in flight.
+        """
+        max_workers = max_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_baseline_worker,
+                                 initargs=(self.baseline_snapshot, self.repo_path, self.comparer_options,
+                                           self.table_diff_cache_size)) as executor:
+            pending = deque()
+            for candidate_spec in candidate_specs:
+                pending.append(executor.submit(compare_candidate_in_worker, candidate_spec))
+                if len(pending) >= 2 * max_workers:
+                    yield self.collect_worker_result(pending.popleft())
+
+            while pending:
+                yield self.collect_worker_result(pending.popleft())
+
+    def collect_worker_result(self, future):
+        candidate_spec, migration_xml, (worker_pid, cache_stats) = future.result()
+        self.worker_cache_stats[worker_pid] = cache_stats
+        return candidate_spec, migration_xml
+
+    def cache_stats(self):
+        """Return the table diff cache statistics of this process and all workers, added up."""
+        return merge_cache_stats([self.table_diff_cache.stats(), *self.worker_cache_stats.values()])
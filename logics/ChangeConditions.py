@@ -0,0 +1,216 @@
+import re
+
+# changeSet attributes holding the context expression; contextFilter is the newer spelling
+CONTEXT_ATTRIBUTES = ('contextFilter', 'context')
+
+# Tokens of a context or label expression: parentheses, commas, '!' and names
+EXPRESSION_TOKEN_PATTERN = re.compile(r'\s*([(),!]|[^\s(),!]+)')
+
+# dbms values every database matches / no database matches
+ALL_DBMS = 'all'
+NO_DBMS = 'none'
+
+# Liquibase database short names; an environment spec that is one of these names selects that dbms
+KNOWN_DBMS = frozenset({'mysql', 'mariadb', 'postgresql', 'oracle', 'mssql', 'sqlite', 'h2', 'hsqldb', 'db2',
+                        'derby', 'firebird', 'sybase', 'informix', 'cockroachdb', 'snowflake'})
+
+
+def parse_expression(text):
+    """Parse a Liquibase context or label expression into a nested tuple, or None when it is empty.
+
+    Names combine with 'and', 'or' (or ','), '!'/'not' and parentheses, and match case-insensitively;
+    'and' binds tighter than 'or'.
+    """
+    tokens = [token.lower() for token in EXPRESSION_TOKEN_PATTERN.findall(text or '')]
+    if not tokens:
+        return None
+    expression, position = parse_or(tokens, 0)
+    if position != len(tokens):
+        raise ValueError(f"Unexpected '{tokens[position]}' in expression '{text}'")
+    return expression
+
+
+def parse_or(tokens, position):
+    operands = []
+    while True:
+        operand, position = parse_and(tokens, position)
+        operands.append(operand)
+        if position < len(tokens) and tokens[position] in ('or', ','):
+            position += 1
+        else:
+            return (operands[0] if len(operands) == 1 else ('or', tuple(operands))), position
+
+
+def parse_and(tokens, position):
+    operands = []
+    while True:
+        operand, position = parse_not(tokens, position)
+        operands.append(operand)
+        if position < len(tokens) and tokens[position] == 'and':
+            position += 1
+        else:
+            return (operands[0] if len(operands) == 1 else ('and', tuple(operands))), position
+
+
+def parse_not(tokens, position):
+    if position >= len(tokens):
+        raise ValueError("Expression ends where a name was expected")
+    token = tokens[position]
+    if token in ('!', 'not'):
+        operand, position = parse_not(tokens, position + 1)
+        return ('not', operand), position
+    if token == '(':
+        expression, position = parse_or(tokens, position + 1)
+        if position >= len(tokens) or tokens[position] != ')':
+            raise ValueError("Missing ')' in expression")
+        return expression, position + 1
+    if token in (')', ',', 'and', 'or'):
+        raise ValueError(f"Unexpected '{token}' in expression")
+    return ('name', token), position + 1
+
+
+def evaluate(expression, names):
+    """Tell whether a parsed expression holds for a set of lower-case names."""
+    operator, operand = expression
+    if operator == 'name':
+        return operand in names
+    if operator == 'not':
+        return not evaluate(operand, names)
+    if operator == 'and':
+        return all(evaluate(item, names) for item in operand)
+    return any(evaluate(item, names) for item in operand)
+
+
+def split_names(value):
+    return frozenset(name.strip().lower() for name in (value or '').split(',') if name.strip())
+
+
+def parse_dbms(value):
+    """Return a dbms list such as 'mysql, postgresql' or '!oracle' as (included, excluded) sets, or None."""
+    names = split_names(value)
+    if not names:
+        return None
+    excluded = frozenset(name[1:] for name in names if name.startswith('!'))
+    return frozenset(name for name in names if not name.startswith('!')), excluded
+
+
+def matches_dbms(dbms_rule, dbms):
+    included, excluded = dbms_rule
+    if dbms in excluded or NO_DBMS in included:
+        return False
+    return not included or ALL_DBMS in included or dbms in included
+
+
+class ChangeConditions:
+    """The context expression, labels and dbms lists a changeSet (or a single change) runs under.
+
+    Instances are shared: conditions_for returns the same object for the same attribute
+    values, and each one remembers its verdict per environment, so deciding whether a change
+    runs in an environment is one dictionary lookup after the first time.
+    """
+
+    def __init__(self, context, labels, dbms, change_dbms):
+        self.key = (context, labels, dbms, change_dbms)
+        self.context_expression = parse_expression(context)
+        self.labels = split_names(labels)
+        # The changeSet's dbms list, then that of the change itself; both must match
+        self.dbms_rules = tuple(rule for rule in (parse_dbms(dbms), parse_dbms(change_dbms)) if rule is not None)
+        self.unconditional = self.context_expression is None and not self.labels and not self.dbms_rules
+        self.verdicts = {}  # Environment key -> applies
+
+    def applies_to(self, environment):
+        verdict = self.verdicts.get(environment.key)
+        if verdict is None:
+            verdict = self.verdicts[environment.key] = (self.matches_contexts(environment)
+                                                        and self.matches_labels(environment)
+                                                        and self.matches_dbms(environment))
+        return verdict
+
+    def matches_contexts(self, environment):
+        # Without contexts given, Liquibase runs every changeSet whatever its context
+        return (self.context_expression is None or not environment.contexts
+                or evaluate(self.context_expression, environment.contexts))
+
+    def matches_labels(self, environment):
+        # Liquibase runs changeSets without labels whatever the label expression
+        return (not self.labels or environment.label_expression is None
+                or evaluate(environment.label_expression, self.labels))
+
+    def matches_dbms(self, environment):
+        return environment.dbms is None or all(matches_dbms(rule, environment.dbms) for rule in self.dbms_rules)
+
+    def with_change_dbms(self, dbms):
+        """Return these conditions narrowed by the dbms attribute of a single change."""
+        return conditions_for(*self.key[:3], dbms) if dbms else self
+
+
+# Shared ChangeConditions by (context, labels, dbms, change dbms)
+_conditions = {}
+
+
+def conditions_for(context='', labels='', dbms='', change_dbms=''):
+    key = (context or '', labels or '', dbms or '', change_dbms or '')
+    conditions = _conditions.get(key)
+    if conditions is None:
+        conditions = _conditions[key] = ChangeConditions(*key)
+    return conditions
+
+
+def changeset_conditions(changeset):
+    """Return the shared ChangeConditions of a changeSet element."""
+    context = next((changeset.getAttribute(name) for name in CONTEXT_ATTRIBUTES if changeset.getAttribute(name)), '')
+    return conditions_for(context, changeset.getAttribute('labels'), changeset.getAttribute('dbms'))
+
+
+# Conditions of changes outside any changeSet
+UNCONDITIONAL = conditions_for()
+
+
+class Environment:
+    """A target environment: the contexts it runs, the label expression it selects and its dbms.
+
+    Any part left unset selects every changeSet, as when Liquibase is run without it.
+    """
+
+    def __init__(self, name, contexts=(), labels=None, dbms=None):
+        self.name = name
+        self.contexts = frozenset(context.lower() for context in contexts)
+        self.labels = labels or None
+        self.label_expression = parse_expression(labels)
+        self.dbms = dbms.lower() if dbms else None
+        self.key = (self.contexts, self.labels, self.dbms)
+
+    @property
+    def file_name(self):
+        """Return the name made safe for use in a file name."""
+        return re.sub(r'[^A-Za-z0-9_.-]+', '_', self.name).strip('_') or 'default'
+
+    def __repr__(self):
+        return f"Environment({self.name!r})"
+
+
+def parse_environment(spec, known_dbms=KNOWN_DBMS):
+    """Parse an environment spec such as 'prod', 'mysql' or 'prod:contexts=prod,eu;labels=!beta;dbms=mysql'.
+
+    A name without settings is taken as a dbms when it is one of known_dbms and as a context
+    otherwise.
+    """
+    name, _, settings = spec.partition(':')
+    name = name.strip()
+    if not name:
+        raise ValueError(f"Environment spec '{spec}' has no name")
+    if not settings:
+        if name.lower() in known_dbms:
+            return Environment(name, dbms=name)
+        return Environment(name, contexts=[name])
+
+    options = {}
+    for setting in settings.split(';'):
+        key, separator, value = setting.partition('=')
+        key = key.strip().lower()
+        if not separator or key not in ('contexts', 'labels', 'dbms'):
+            raise ValueError(f"Unknown environment setting '{setting}' in '{spec}', "
+                             f"expected contexts=, labels= or dbms=")
+        options[key] = value.strip()
+    return Environment(name, contexts=split_names(options.get('contexts')), labels=options.get('labels'),
+                       dbms=options.get('dbms'))
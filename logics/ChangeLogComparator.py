@@ -1,15 +1,109 @@
-from xml.dom import minidom
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from logics.ChangeModel import (AddColumnChange, AlterSequenceChange, CreateIndexChange, CreateRoutineChange,
+                                CreateSequenceChange, CreateTableChange, CreateViewChange, DropColumnChange,
+                                DropIndexChange, DropRoutineChange, DropSequenceChange, DropTableChange,
+                                DropViewChange, InsertChange, LoadDataChange, SeedDataChange)
+from logics.ChangeSerializers import get_serializer
+from logics.ChangelogLoader import open_changelog_source
+from logics.ChangelogSnapshot import ChangelogSnapshot
+from logics.ChangelogSource import FileChangelogSource
+from logics.CsvSeedData import CsvSeedDataReader, CsvSeedDataWriter, SeedDataDiff
+from logics.GitBlobReader import GitCatFileBatch
+from logics.JsonDiffReport import JsonDiffReport
+from logics.ObjectKey import format_key, key_qualifiers, object_key
+from logics.ShardedChangelogWriter import ShardedChangelogWriter
+from logics.SnapshotHistoryStore import SnapshotHistoryStore, is_stored_spec, stored_version_name
+from logics.SqlChangelogSerializer import SqlChangelogSerializer
+from logics.SqliteSnapshotReader import SQLITE_SPEC_PREFIX, is_sqlite_spec, load_sqlite_snapshot
+from logics.SqliteSnapshotStore import ROUTINE, SEQUENCE, VIEW, SqliteSnapshotStore
+from logics.SqliteMigrationValidator import SqliteMigrationValidator
+from logics.XmlChangelogSerializer import XmlChangelogSerializer
+
+GLOBAL_COUNTER_FILE = 'global_counter.txt'
+
+# How new seed rows are emitted: batched <insert> changesets, or a loadData changeset plus a CSV file
+SEED_DATA_INSERT = 'insert'
+SEED_DATA_LOAD_DATA = 'loadData'
+
+# Dialects the SQL of each changeSet is rendered for with sql_dir
+SQL_DIALECTS = ('mysql', 'postgresql', 'oracle')
+
+# createSequence settings alterSequence can change; startValue only matters when a sequence is created
+ALTERABLE_SEQUENCE_ATTRIBUTES = ('incrementBy', 'minValue', 'maxValue', 'cycle', 'ordered', 'cacheSize', 'dataType')
+
+# Position of each change type in a migration, following the order diff_schema emits them in
+DIFF_PHASES = {
+    DropViewChange: 0, DropRoutineChange: 0,
+    CreateSequenceChange: 1, AlterSequenceChange: 1, DropSequenceChange: 1,
+    CreateTableChange: 2, DropTableChange: 2,
+    AddColumnChange: 3, DropColumnChange: 3,
+    InsertChange: 4, SeedDataChange: 4, LoadDataChange: 4,
+    CreateIndexChange: 5, DropIndexChange: 5,
+    CreateViewChange: 6, CreateRoutineChange: 6,
+}
+
+
+def merge_order(change):
+    """Sort key merging the changes of several schemas: phase by phase, schemas in key order."""
+    return (DIFF_PHASES[type(change)], change.qualifiers.get('catalogName', ''),
+            change.qualifiers.get('schemaName', ''))
+
+
+def diff_schema_partition(task, table_diff_cache=None):
+    """Diff the snapshots of one schema; changeset IDs are stamped later, once all schemas are merged."""
+    prev_snapshot, current_snapshot, comparer_options = task
+    comparer = LiquibaseChangelogComparer(prev_snapshot.label, current_snapshot.label, counter_file=None,
+                                          table_diff_cache=table_diff_cache, **comparer_options)
+    return comparer.diff_schema(prev_snapshot, current_snapshot)
+
 
 class LiquibaseChangelogComparer:
-    def __init__(self, previous_xml_path, current_xml_path):
+    def __init__(self, previous_xml_path, current_xml_path, insert_batch_size=1, seed_data_format=SEED_DATA_INSERT,
+                 seed_data_dir=None, repo_path='.', git_reader=None, counter_file=GLOBAL_COUNTER_FILE,
+                 table_diff_cache=None, snapshot_cache=None, table_filter=None, max_workers=None,
+                 snapshot_store=None, version_store=None, seed_data_subdir=None):
+        if seed_data_format not in (SEED_DATA_INSERT, SEED_DATA_LOAD_DATA):
+            raise ValueError(f"Unknown seed data format '{seed_data_format}', "
+                             f"expected '{SEED_DATA_INSERT}' or '{SEED_DATA_LOAD_DATA}'")
+        if seed_data_format == SEED_DATA_LOAD_DATA and not seed_data_dir:
+            raise ValueError("seed_data_dir is required when seed data is emitted as loadData")
+
         self.previous_xml_path = previous_xml_path
         self.current_xml_path = current_xml_path
-        self.change_set_counter = self.load_global_counter()
+        self.insert_batch_size = max(1, insert_batch_size or 1)
+        self.seed_data_format = seed_data_format
+        self.seed_data_dir = seed_data_dir
+        # Directory under seed_data_dir the CSV files are written to, set per environment
+        self.seed_data_subdir = seed_data_subdir
+        self.repo_path = repo_path
+        self.git_reader = git_reader
+        self.counter_file = counter_file
+        self.table_diff_cache = table_diff_cache
+        self.snapshot_cache = snapshot_cache
+        self.table_filter = table_filter
+        # Worker processes diffing the schemas of a multi-schema changelog; 1 diffs them in this process
+        self.max_workers = max(1, max_workers or 1)
+        # Path of a SqliteSnapshotStore file; when set, the changelogs are diffed through it
+        self.snapshot_store = snapshot_store
+        # SnapshotHistoryStore file read by 'stored:NAME' changelog specs
+        self.version_store = version_store
+        # Loaded on the first changeset ID, so comparisons that emit nothing never touch the counter file
+        self.change_set_counter = None
+        # Paths of the CSV files written by this comparer, so no two loadData changesets share a file
+        self.seed_data_paths = set()
 
     def load_global_counter(self):
-        """Load the changeset counter from the global_counter.txt file."""
+        """Load the changeset counter from the global_counter.txt file.
+
+        With counter_file=None the counter lives in memory only and starts at 1.
+        """
+        if self.counter_file is None:
+            return 1
         try:
-            with open('global_counter.txt', 'r') as file:
+            with open(self.counter_file, 'r') as file:
                 return int(file.read().strip())
         except (FileNotFoundError, ValueError):
             # If the file doesn't exist or the content is invalid, start at 1
@@ -17,228 +111,863 @@ class LiquibaseChangelogComparer:
 
     def save_global_counter(self):
         """Save the current changeset counter to the global_counter.txt file."""
-        with open('global_counter.txt', 'w') as file:
+        if self.counter_file is None:
+            return
+        with open(self.counter_file, 'w') as file:
             file.write(str(self.change_set_counter))
 
     def increment_and_get_changeset_id(self, prefix):
         """Increment the changeset counter, save it, and return the new changeset ID."""
+        if self.change_set_counter is None:
+            self.change_set_counter = self.load_global_counter()
         change_set_id = f"{prefix}-{self.change_set_counter}"
         self.change_set_counter += 1
         self.save_global_counter()
         return change_set_id
 
-    def compare_and_generate(self):
-        """Main function to compare previous and current XML and generate the migration XML in memory."""
+    def compare_and_generate(self, report_path=None, output_format='xml', sql_dir=None, sql_dialects=SQL_DIALECTS):
+        """Main function to compare previous and current XML and generate the migration XML in memory.
+
+        output_format selects the serializer ('xml', 'yaml', 'json' or 'sql'). With a
+        report_path, a JSON report of the same changes is written there as well, and with a
+        sql_dir the SQL each changeSet runs on every one of sql_dialects.
+        """
         try:
-            # Load previous and current XML files
-            prev_dom = minidom.parse(self.previous_xml_path)
-            current_dom = minidom.parse(self.current_xml_path)
+            serializer = get_serializer(output_format)
+            changes = self.generate_changes()
+            if report_path:
+                self.write_report(changes, report_path)
+            if sql_dir:
+                self.write_dialect_sql(changes, sql_dir, sql_dialects)
 
-            # Get all tables and indexes from previous and current XML files
-            prev_tables = prev_dom.getElementsByTagName('createTable')
-            current_tables = current_dom.getElementsByTagName('createTable')
+            # Return the generated migration as a string
+            return serializer.to_string(changes)
 
-            prev_inserts = prev_dom.getElementsByTagName('insert')
-            current_inserts = current_dom.getElementsByTagName('insert')
+        except Exception as e:
+            print(f"Error generating migration script: {e}")
+            return None
 
-            prev_indexes = prev_dom.getElementsByTagName('createIndex')
-            current_indexes = current_dom.getElementsByTagName('createIndex')
+    def compare_and_generate_environments(self, environments, output_dir, output_format='xml', report_path=None):
+        """Write one migration per Environment, <output_dir>/migration.<environment>.<ext>, from one parse.
 
-            # Create an in-memory XML structure for migration script
-            in_memory_xml = self.create_in_memory_xml()
+        Each changelog is parsed once; every environment diffs the snapshots replayed from
+        the changes that run there (see ChangelogSnapshot.for_environment). With a report_path,
+        a JSON report per environment is written next to it, named <report>.<environment>.json.
+        Seed data CSV files go to <seed_data_dir>/<environment>/, so environments never share one.
+        Returns {environment name: migration path}, or None if generation failed.
+        """
+        try:
+            serializer = get_serializer(output_format)
+            os.makedirs(output_dir, exist_ok=True)
+            paths = {}
+            for environment, changes in self.generate_environment_changes(environments):
+                file_name = environment.file_name
+                paths[environment.name] = os.path.join(output_dir, f"migration.{file_name}{serializer.file_extension}")
+                with open(paths[environment.name], 'w', encoding='utf-8') as file:
+                    file.write(serializer.to_string(changes))
+                if report_path:
+                    report_base, report_extension = os.path.splitext(report_path)
+                    self.write_report(changes, f"{report_base}.{file_name}{report_extension or '.json'}")
+            return paths
 
-            # Handle table additions or deletions
-            self.handle_create_table_changes(prev_tables, current_tables, in_memory_xml)
+        except Exception as e:
+            print(f"Error generating environment migration scripts: {e}")
+            return None
 
-            # Handle column changes (added/dropped columns)
-            self.handle_column_changes(prev_tables, current_tables, in_memory_xml)
+    def generate_environment_changes(self, environments):
+        """Yield (environment, change records) for every Environment, parsing each changelog once."""
+        owns_git_reader = self.git_reader is None
+        try:
+            prev_snapshot = self.load_snapshot(self.previous_xml_path)
+            current_snapshot = self.load_snapshot(self.current_xml_path)
+            for environment in environments:
+                self.seed_data_subdir = environment.file_name
+                yield environment, self.diff_snapshots(prev_snapshot.for_environment(environment),
+                                                       current_snapshot.for_environment(environment))
+        finally:
+            self.seed_data_subdir = None
+            if owns_git_reader and self.git_reader is not None:
+                self.git_reader.close()
+                self.git_reader = None
+
+    def compare_and_generate_sharded(self, output_dir, shard_by='table', max_changesets_per_shard=None,
+                                     max_bytes_per_shard=None, max_workers=None, report_path=None, sql_dir=None,
+                                     sql_dialects=SQL_DIALECTS):
+        """Compare the changelogs and write the migration as shard files plus a master changelog.
+
+        Returns the path of the master changelog, or None if generation failed.
+        """
+        try:
+            changes = self.generate_changes()
+            if report_path:
+                self.write_report(changes, report_path)
+            if sql_dir:
+                self.write_dialect_sql(changes, sql_dir, sql_dialects)
+
+            writer = ShardedChangelogWriter(output_dir,
+                                            shard_by=shard_by,
+                                            max_changesets_per_shard=max_changesets_per_shard,
+                                            max_bytes_per_shard=max_bytes_per_shard,
+                                            max_workers=max_workers)
+            return writer.write(changes)
 
-            # Handle <insert> changes
-            self.handle_insert_changes(prev_inserts, current_inserts, in_memory_xml)
+        except Exception as e:
+            print(f"Error generating sharded migration script: {e}")
+            return None
 
-            # Handle <createIndex> and <dropIndex> changes
-            self.handle_index_changes(prev_indexes, current_indexes, in_memory_xml)
+    def write_report(self, changes, report_path):
+        """Stream the JSON diff report of the changes to report_path and return its summary."""
+        report = JsonDiffReport(self.previous_xml_path, self.current_xml_path)
+        return report.write_file(changes, report_path)
 
-            # Return the generated in-memory XML as a string
-            return in_memory_xml.toprettyxml(indent="  ")
+    def write_dialect_sql(self, changes, sql_dir, dialects):
+        """Write the changes as <sql_dir>/migration.<dialect>.sql for each dialect, in one pass; return the paths."""
+        os.makedirs(sql_dir, exist_ok=True)
+        paths = {dialect: os.path.join(sql_dir, f"migration.{dialect}.sql") for dialect in dialects}
+        files = {dialect: open(path, 'w', encoding='utf-8') for dialect, path in paths.items()}
+        try:
+            SqlChangelogSerializer().write_dialects(changes, files)
+        finally:
+            for file in files.values():
+                file.close()
+        return paths
+
+    def generate_migration_document(self):
+        """Compare previous and current XML and return the migration as an in-memory XML document."""
+        return XmlChangelogSerializer().to_document(self.generate_changes())
+
+    def generate_changes(self):
+        """Compare previous and current XML and return the list of change records, IDs stamped.
+
+        Either side may be a file path or a 'revision:path' spec read from the git repository at repo_path.
+        Two 'stored:NAME' specs are diffed from their manifests in the version_store, see diff_stored_versions.
+        """
+        owns_git_reader = self.git_reader is None
+        try:
+            stored_specs = [is_stored_spec(spec) for spec in (self.previous_xml_path, self.current_xml_path)]
+            if all(stored_specs):
+                return self.diff_stored_versions()
+
+            # Saved versions are already parsed; they are loaded as they are rather than copied into the store
+            if self.snapshot_store is not None and not any(stored_specs):
+                return self.diff_stored_changelogs()
+
+            # Load previous and current XML files, together with the changelogs they include
+            prev_snapshot = self.load_snapshot(self.previous_xml_path)
+            current_snapshot = self.load_snapshot(self.current_xml_path)
+
+            return self.diff_snapshots(prev_snapshot, current_snapshot)
+
+        finally:
+            if owns_git_reader and self.git_reader is not None:
+                self.git_reader.close()
+                self.git_reader = None
+
+    def compare_snapshots(self, prev_snapshot, current_snapshot):
+        """Compare two parsed snapshots and return the migration as an in-memory XML document."""
+        return XmlChangelogSerializer().to_document(self.diff_snapshots(prev_snapshot, current_snapshot))
+
+    def diff_snapshots(self, prev_snapshot, current_snapshot):
+        """Compare two parsed snapshots and return the change records of the migration, in changelog order.
+
+        Snapshots spanning several schemas are diffed one schema at a time (in worker
+        processes with max_workers > 1). The partial change lists are merged phase by phase,
+        so every drop of a view still comes before any table change and so on, and are then
+        stamped with changeset IDs in their final order.
+        """
+        schemas = sorted(prev_snapshot.schemas() | current_snapshot.schemas())
+        if len(schemas) <= 1:
+            return self.diff_schema(prev_snapshot, current_snapshot)
+
+        prev_partitions = prev_snapshot.schema_partitions()
+        current_partitions = current_snapshot.schema_partitions()
+
+        tasks = [(prev_partitions.get(schema) or prev_snapshot.empty_partition(schema),
+                  current_partitions.get(schema) or current_snapshot.empty_partition(schema),
+                  self.partition_options()) for schema in schemas]
+        if self.max_workers > 1:
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as executor:
+                partition_changes = list(executor.map(diff_schema_partition, tasks))
+        else:
+            partition_changes = [diff_schema_partition(task, self.table_diff_cache) for task in tasks]
+
+        return self.stamp_merged_changes(change for changes in partition_changes for change in changes)
+
+    def stamp_merged_changes(self, changes):
+        """Put the changes of several schemas in migration order (see merge_order) and stamp their changeset IDs."""
+        changes = sorted(changes, key=merge_order)
+        for change in changes:
+            change.changeset_id = self.increment_and_get_changeset_id(change.id_prefix())
+        return changes
+
+    def partition_options(self):
+        """Return the options a comparer of one schema partition is created with."""
+        return {'insert_batch_size': self.insert_batch_size, 'seed_data_format': self.seed_data_format,
+                'seed_data_dir': self.seed_data_dir, 'seed_data_subdir': self.seed_data_subdir,
+                'repo_path': self.repo_path}
+
+    def diff_schema(self, prev_snapshot, current_snapshot):
+        """Compare the snapshots as one schema and return the change records, stamped with changeset IDs."""
+        # Get all tables and indexes from previous and current XML files
+        prev_tables = prev_snapshot.tables
+        current_tables = current_snapshot.tables
+
+        prev_inserts = prev_snapshot.inserts
+        current_inserts = current_snapshot.inserts
+
+        prev_indexes = prev_snapshot.indexes
+        current_indexes = current_snapshot.indexes
+
+        changes = []
+
+        # Handle dropped views and routines first, while the tables they read still exist
+        self.handle_dropped_views_and_routines(prev_snapshot, current_snapshot, changes)
+
+        # Handle sequence changes before the tables whose defaults may use them
+        self.handle_sequence_changes(prev_snapshot.sequences, current_snapshot.sequences, changes)
+
+        # Handle table additions or deletions
+        self.handle_create_table_changes(prev_tables, current_tables, changes)
+
+        # Handle column changes (added/dropped columns)
+        self.handle_column_changes(prev_tables, current_tables, changes)
+
+        # Seed data is only compared when both sides carry it; a database snapshot has none
+        if prev_snapshot.includes_data and current_snapshot.includes_data:
+            # Handle <insert> changes
+            self.handle_insert_changes(prev_inserts, current_inserts, changes)
+
+            # Handle <loadData>/<loadUpdateData> seed data changes
+            self.handle_load_data_changes(prev_snapshot.load_data, current_snapshot.load_data, current_tables,
+                                          changes)
+
+        # Handle <createIndex> and <dropIndex> changes
+        self.handle_index_changes(prev_indexes, current_indexes, changes)
+
+        # Handle new and changed views and routines once the tables they read are in place
+        self.handle_view_and_routine_changes(prev_snapshot, current_snapshot, changes)
+
+        return changes
+
+    def diff_stored_changelogs(self):
+        """Compare the changelogs through the SqliteSnapshotStore file at snapshot_store.
+
+        Only one side is held in memory at a time: each is parsed (unless the store already
+        holds an up-to-date copy), written to the store and dropped before the other is read.
+        The diff then runs as queries on the store, and its changes are ordered and stamped
+        like those of a partitioned diff_snapshots.
+        """
+        with SqliteSnapshotStore(self.snapshot_store) as store:
+            previous = self.store_snapshot(store, self.previous_xml_path)
+            current = self.store_snapshot(store, self.current_xml_path)
+            comparer = LiquibaseChangelogComparer(self.previous_xml_path, self.current_xml_path, counter_file=None,
+                                                  **self.partition_options())
+            return self.stamp_merged_changes(comparer.diff_stored_snapshots(store, previous, current))
+
+    def diff_stored_versions(self):
+        """Compare two versions saved in the version_store, reading back only the keys whose hashes differ."""
+        with self.open_version_store() as store:
+            prev_snapshot, current_snapshot = store.narrowed_snapshots(
+                stored_version_name(self.previous_xml_path), stored_version_name(self.current_xml_path),
+                self.previous_xml_path, self.current_xml_path)
+        return self.diff_snapshots(prev_snapshot, current_snapshot)
+
+    def save_version(self, changelog_spec, name):
+        """Load a changelog and save its snapshot as version name in the version_store; return a summary."""
+        snapshot = self.load_snapshot(changelog_spec)
+        with self.open_version_store() as store:
+            return store.save_version(name, snapshot)
+
+    def open_version_store(self):
+        if self.version_store is None:
+            raise ValueError("A version store is required for 'stored:' changelog specs and saved versions")
+        return SnapshotHistoryStore(self.version_store)
+
+    def store_snapshot(self, store, changelog_spec):
+        """Return (snapshot id, includes data, source) of a changelog in the store, parsing it only when needed.
+
+        Stored snapshots are keyed like cached ones (see load_snapshot) and reused as long
+        as none of the files they were read from changed.
+        """
+        table_filter_key = self.table_filter.key if self.table_filter is not None else None
+        if is_sqlite_spec(changelog_spec):
+            source, path = FileChangelogSource(), changelog_spec[len(SQLITE_SPEC_PREFIX):]
+            cache_key = repr(('sqlite', os.path.abspath(path), table_filter_key))
+        else:
+            source, path = open_changelog_source(changelog_spec, self.get_git_reader)
+            cache_key = repr((source.cache_key(path), table_filter_key))
+
+        stored = store.find_snapshot(cache_key, source)
+        if stored is not None:
+            return (*stored, source)
+        snapshot = self.load_snapshot(changelog_spec)
+        return store.write_snapshot(cache_key, snapshot), snapshot.includes_data, snapshot.source
+
+    def diff_stored_snapshots(self, store, previous, current):
+        """Compare two snapshots of a SqliteSnapshotStore and return the change records, in diff_schema order.
+
+        previous and current are (snapshot id, includes data, source) as store_snapshot returns
+        them. Only the elements the changes are built from are read back out of the store.
+        """
+        prev_id, prev_includes_data, prev_source = previous
+        current_id, current_includes_data, current_source = current
+        changes = []
+
+        # Handle dropped views and routines first, while the tables they read still exist
+        for _, key, prev_view in store.dropped_objects(prev_id, current_id, VIEW):
+            self.add_change(changes, DropViewChange(key[2], prev_view), key)
+        for _, key, prev_routine in store.dropped_objects(prev_id, current_id, ROUTINE):
+            self.add_change(changes, DropRoutineChange(key[2], prev_routine), key)
+
+        # Handle sequence changes before the tables whose defaults may use them
+        for _, key, sequence, prev_sequence in store.changed_objects(prev_id, current_id, SEQUENCE):
+            if prev_sequence is None:
+                self.add_change(changes, CreateSequenceChange(key[2], sequence), key)
+                continue
+            alterations = self.get_sequence_alterations(prev_sequence, sequence)
+            if alterations:
+                self.add_change(changes, AlterSequenceChange(key[2], sequence, alterations), key)
+        for _, key, prev_sequence in store.dropped_objects(prev_id, current_id, SEQUENCE):
+            self.add_change(changes, DropSequenceChange(key[2], prev_sequence), key)
+
+        # Handle table additions or deletions
+        for key, table in store.created_tables(prev_id, current_id):
+            self.add_change(changes, CreateTableChange(key[2], table), key)
+        for key in store.dropped_tables(prev_id, current_id):
+            self.add_change(changes, DropTableChange(key[2]), key)
+
+        # Handle column changes (added/dropped columns)
+        for key, added_columns in store.added_columns(prev_id, current_id):
+            self.add_change(changes, AddColumnChange(key[2], added_columns), key)
+        for key, dropped_column_names in store.dropped_columns(prev_id, current_id):
+            self.add_change(changes, DropColumnChange(key[2], dropped_column_names), key)
+
+        # Seed data is only compared when both sides carry it; a database snapshot has none
+        if prev_includes_data and current_includes_data:
+            for key, rows in store.new_inserts(prev_id, current_id):
+                if self.seed_data_format == SEED_DATA_LOAD_DATA:
+                    self.add_load_data_changeset(key, rows, changes)
+                else:
+                    self.add_insert_changesets(key, rows, changes)
+
+            current_load_data = store.load_data(current_id, current_source)
+            seed_data_tables = [store.first_table(current_id, key)
+                                for key in dict.fromkeys(object_key(entry[0]) for entry in current_load_data)]
+            self.handle_load_data_changes(store.load_data(prev_id, prev_source), current_load_data,
+                                          [table for table in seed_data_tables if table is not None], changes)
+
+        # Handle <createIndex> and <dropIndex> changes
+        for key, index_name, index in store.created_indexes(prev_id, current_id):
+            self.add_change(changes, CreateIndexChange(key[2], index_name, index), key)
+        for key, index_name in store.dropped_indexes(prev_id, current_id):
+            self.add_change(changes, DropIndexChange(key[2], index_name), key)
+
+        # Handle new and changed views and routines once the tables they read are in place
+        for _, key, view, prev_view in store.changed_objects(prev_id, current_id, VIEW):
+            if prev_view is None:
+                self.add_change(changes, CreateViewChange(key[2], view), key)
+            elif not self.same_definition(prev_view, view):
+                self.add_change(changes, CreateViewChange(key[2], view, replace=True), key)
+        for _, key, routine, prev_routine in store.changed_objects(prev_id, current_id, ROUTINE):
+            if prev_routine is None:
+                self.add_change(changes, CreateRoutineChange(key[2], routine), key)
+            elif not self.same_definition(prev_routine, routine):
+                self.add_change(changes, CreateRoutineChange(key[2], routine, replace=True), key)
+
+        return changes
+
+    def load_snapshot(self, changelog_spec):
+        """Load a changelog from a file path or a 'revision:path' spec, resolving its includes.
+
+        With a snapshot_cache, an unchanged changelog is parsed only once per process. A
+        'sqlite:path' spec introspects that SQLite database instead. With a table_filter, only
+        the selected tables and columns are read. A 'stored:NAME' spec reads a version saved
+        in the version_store, as it was filtered when it was saved.
+        """
+        if is_stored_spec(changelog_spec):
+            with self.open_version_store() as store:
+                return store.load_snapshot(stored_version_name(changelog_spec), label=changelog_spec)
+        if is_sqlite_spec(changelog_spec):
+            return load_sqlite_snapshot(changelog_spec, table_filter=self.table_filter)
+
+        source, path = open_changelog_source(changelog_spec, self.get_git_reader)
+        if self.snapshot_cache is None:
+            return ChangelogSnapshot.load(source, path, label=changelog_spec, table_filter=self.table_filter)
+
+        cache_key = source.cache_key(path)
+        if self.table_filter is not None:
+            # A filtered snapshot only stands in for runs with the same filter
+            cache_key = (cache_key, self.table_filter.key)
+        snapshot = self.snapshot_cache.get(cache_key)
+        if snapshot is None:
+            snapshot = ChangelogSnapshot.load(source, path, label=changelog_spec, table_filter=self.table_filter)
+            self.snapshot_cache.put(cache_key, snapshot)
+        return snapshot
+
+    def check_migration_needed(self):
+        """Tell whether a migration is needed without generating one.
+
+        Root fingerprints are compared first; when they differ, the comparison stops at the
+        first difference the migration would contain. No changeset IDs are allocated and no
+        files are written. Returns a dict with 'migration_needed', 'first_difference'
+        (None or a dict describing it) and 'elapsed_ms'.
+        """
+        start = time.perf_counter()
+        owns_git_reader = self.git_reader is None
+        try:
+            prev_snapshot = self.load_snapshot(self.previous_xml_path)
+            current_snapshot = self.load_snapshot(self.current_xml_path)
+
+            first_difference = None
+            if prev_snapshot.fingerprint() != current_snapshot.fingerprint():
+                first_difference = self.find_first_difference(prev_snapshot, current_snapshot)
+        finally:
+            if owns_git_reader and self.git_reader is not None:
+                self.git_reader.close()
+                self.git_reader = None
+
+        return {
+            'previous': self.previous_xml_path,
+            'current': self.current_xml_path,
+            'migration_needed': first_difference is not None,
+            'first_difference': first_difference,
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 3),
+        }
+
+    def validate_migration(self):
+        """Generate the migration and dry-run it on an in-memory SQLite database.
+
+        Returns the SqliteMigrationValidator result plus 'previous', 'current', 'changesets'
+        and 'elapsed_ms'. Changeset IDs come from an in-memory counter starting at 1, as with
+        counter_file=None, so a dry run leaves the counter file untouched.
+        """
+        start = time.perf_counter()
+        owns_git_reader = self.git_reader is None
+        counter_file, change_set_counter = self.counter_file, self.change_set_counter
+        try:
+            self.counter_file = self.change_set_counter = None
+            prev_snapshot = self.load_snapshot(self.previous_xml_path)
+            current_snapshot = self.load_snapshot(self.current_xml_path)
+            changes = self.diff_snapshots(prev_snapshot, current_snapshot)
+        finally:
+            self.counter_file, self.change_set_counter = counter_file, change_set_counter
+            if owns_git_reader and self.git_reader is not None:
+                self.git_reader.close()
+                self.git_reader = None
+
+        result = {'previous': self.previous_xml_path, 'current': self.current_xml_path, 'changesets': len(changes)}
+        result.update(SqliteMigrationValidator().validate(prev_snapshot, current_snapshot, changes))
+        result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        return result
+
+    def find_first_difference(self, prev_snapshot, current_snapshot):
+        """Return a dict describing the first change the migration would contain, or None.
+
+        Checks run in the order the migration is generated, cheapest first, and stop at the
+        first hit.
+        """
+        for key in prev_snapshot.views.keys() - current_snapshot.views.keys():
+            return {'change': 'dropView', 'viewName': format_key(key)}
+        for tag_name, key in prev_snapshot.routines.keys() - current_snapshot.routines.keys():
+            return {'change': 'drop' + tag_name[len('create'):], 'name': format_key(key)}
+
+        for key, sequence in current_snapshot.sequences.items():
+            prev_sequence = prev_snapshot.sequences.get(key)
+            if prev_sequence is None:
+                return {'change': 'createSequence', 'sequenceName': format_key(key)}
+            if self.get_sequence_alterations(prev_sequence, sequence):
+                return {'change': 'alterSequence', 'sequenceName': format_key(key)}
+        for key in prev_snapshot.sequences.keys() - current_snapshot.sequences.keys():
+            return {'change': 'dropSequence', 'sequenceName': format_key(key)}
+
+        prev_tables_by_key = self.index_tables_by_key(prev_snapshot.tables)
+        current_tables_by_key = self.index_tables_by_key(current_snapshot.tables)
+
+        for key in current_tables_by_key:
+            if key not in prev_tables_by_key:
+                return {'change': 'createTable', 'tableName': format_key(key)}
+        for key in prev_tables_by_key:
+            if key not in current_tables_by_key:
+                return {'change': 'dropTable', 'tableName': format_key(key)}
+
+        for key, current_table in current_tables_by_key.items():
+            prev_table = prev_tables_by_key[key]
+            if prev_table.fingerprint() == current_table.fingerprint():
+                continue
+            added_columns, dropped_column_names = self.get_table_column_changes(prev_table, current_table)
+            if added_columns:
+                return {'change': 'addColumn', 'tableName': format_key(key),
+                        'column': added_columns[0].getAttribute('name')}
+            if dropped_column_names:
+                return {'change': 'dropColumn', 'tableName': format_key(key), 'column': dropped_column_names[0]}
+
+        if prev_snapshot.includes_data and current_snapshot.includes_data:
+            prev_insert_tables = {object_key(prev_insert) for prev_insert in prev_snapshot.inserts}
+            for curr_insert in current_snapshot.inserts:
+                if object_key(curr_insert) not in prev_insert_tables:
+                    return {'change': 'insert', 'tableName': format_key(object_key(curr_insert))}
+
+            prev_load_data = self.group_load_data_by_table(prev_snapshot.load_data)
+            for key, current_entries in self.group_load_data_by_table(current_snapshot.load_data).items():
+                prev_entries = prev_load_data.get(key, [])
+                primary_key_columns = self.get_seed_data_primary_key(key, current_entries, current_snapshot.tables)
+                changes = SeedDataDiff(primary_key_columns).iter_changes(
+                    [self.read_seed_data_rows(entry) for entry in prev_entries],
+                    [self.read_seed_data_rows(entry) for entry in current_entries])
+                for kind, _ in changes:
+                    return {'change': kind, 'tableName': format_key(key)}
+
+        prev_index_keys = {(object_key(index), index.getAttribute('indexName')) for index in prev_snapshot.indexes}
+        current_index_keys = {(object_key(index), index.getAttribute('indexName'))
+                              for index in current_snapshot.indexes}
+        for key, index_name in current_index_keys - prev_index_keys:
+            return {'change': 'createIndex', 'tableName': format_key(key), 'indexName': index_name}
+        for key, index_name in prev_index_keys - current_index_keys:
+            return {'change': 'dropIndex', 'tableName': format_key(key), 'indexName': index_name}
+
+        for key, view in current_snapshot.views.items():
+            prev_view = prev_snapshot.views.get(key)
+            if prev_view is None or not self.same_definition(prev_view, view):
+                return {'change': 'createView', 'viewName': format_key(key), 'replace': prev_view is not None}
+        for (tag_name, key), routine in current_snapshot.routines.items():
+            prev_routine = prev_snapshot.routines.get((tag_name, key))
+            if prev_routine is None or not self.same_definition(prev_routine, routine):
+                return {'change': tag_name, 'name': format_key(key), 'replace': prev_routine is not None}
 
-        except Exception as e:
-            print(f"Error generating migration script: {e}")
-            return None
+        return None
+
+    def get_git_reader(self):
+        """Return the cat-file reader shared by both changelogs, starting it on first use."""
+        if self.git_reader is None:
+            self.git_reader = GitCatFileBatch(self.repo_path)
+        return self.git_reader
 
     def create_in_memory_xml(self):
         """Creates the in-memory XML structure with the root element."""
-        doc = minidom.Document()
+        return XmlChangelogSerializer().create_document()
 
-        # Create the root element
-        database_change_log = doc.createElement('databaseChangeLog')
-        database_change_log.setAttribute('xmlns', 'http://www.liquibase.org/xml/ns/dbchangelog')
-        database_change_log.setAttribute('xmlns:xsi', 'http://www.w3.org/2001/XMLSchema-instance')
-        database_change_log.setAttribute('xsi:schemaLocation',
-                                         'http://www.liquibase.org/xml/ns/dbchangelog '
-                                         'http://www.liquibase.org/xml/ns/dbchangelog/dbchangelog-latest.xsd')
-        doc.appendChild(database_change_log)
+    def add_change(self, changes, change, key=None):
+        """Stamp the change with the next changeset ID and append it to the change list.
 
-        return doc
+        key is the (catalog, schema, name) key of the object the change applies to; its
+        catalog and schema become the qualifiers of the change.
+        """
+        if key is not None and (key[0] or key[1]):
+            change.qualifiers = key_qualifiers(key)
+        change.changeset_id = self.increment_and_get_changeset_id(change.id_prefix())
+        changes.append(change)
 
-    def handle_create_table_changes(self, prev_tables, current_tables, in_memory_xml):
+    def handle_create_table_changes(self, prev_tables, current_tables, changes):
         """Handle table changes (additions, deletions) between previous and current XML."""
+        prev_tables_by_key = self.index_tables_by_key(prev_tables)
+        current_tables_by_key = self.index_tables_by_key(current_tables)
+
         for current_table in current_tables:
-            current_table_name = current_table.getAttribute('tableName')
-            prev_table = self.get_table_by_name(prev_tables, current_table_name)
+            key = object_key(current_table)
+            prev_table = prev_tables_by_key.get(key)
             if not prev_table:
-                changeset = in_memory_xml.createElement('changeSet')
-                changeset.setAttribute('author', 'migration')
-                changeset.setAttribute('id', self.increment_and_get_changeset_id(f'create-table-{current_table_name}'))
-
-                cloned_table = current_table.cloneNode(True)
-                changeset.appendChild(cloned_table)
-                in_memory_xml.documentElement.appendChild(changeset)
+                self.add_change(changes, CreateTableChange(key[2], current_table), key)
 
         for prev_table in prev_tables:
-            prev_table_name = prev_table.getAttribute('tableName')
-            current_table = self.get_table_by_name(current_tables, prev_table_name)
+            key = object_key(prev_table)
+            current_table = current_tables_by_key.get(key)
             if not current_table:
-                changeset = in_memory_xml.createElement('changeSet')
-                changeset.setAttribute('author', 'migration')
-                changeset.setAttribute('id', self.increment_and_get_changeset_id(f'drop-table-{prev_table_name}'))
-
-                drop_table = in_memory_xml.createElement('dropTable')
-                drop_table.setAttribute('tableName', prev_table_name)
-                changeset.appendChild(drop_table)
-                in_memory_xml.documentElement.appendChild(changeset)
+                self.add_change(changes, DropTableChange(key[2]), key)
 
-    def handle_column_changes(self, prev_tables, current_tables, in_memory_xml):
+    def handle_column_changes(self, prev_tables, current_tables, changes):
         """Handle column changes (additions, deletions) between previous and current XML."""
         try:
-            for current_table in current_tables:
-                current_table_name = current_table.getAttribute('tableName')
-                prev_table = self.get_table_by_name(prev_tables, current_table_name)
+            prev_tables_by_key = self.index_tables_by_key(prev_tables)
+            # (added columns, dropped column names) per table key, diffed once per table pair
+            column_changes = {}
 
-                if prev_table:
-                    current_columns = current_table.getElementsByTagName('column')
-                    prev_columns = prev_table.getElementsByTagName('column')
+            for current_table in current_tables:
+                key = object_key(current_table)
+                prev_table = prev_tables_by_key.get(key)
 
-                    added_columns = [col for col in current_columns if not self.column_exists_in_table(prev_columns, col)]
+                if prev_table and key not in column_changes:
+                    column_changes[key] = self.get_table_column_changes(prev_table, current_table)
+                    added_columns = column_changes[key][0]
                     if added_columns:
-                        add_column_changeset = in_memory_xml.createElement('changeSet')
-                        add_column_changeset.setAttribute('author', 'migration')
-                        add_column_changeset.setAttribute('id', self.increment_and_get_changeset_id(f'add-column-{current_table_name}'))
-
-                        add_column_tag = in_memory_xml.createElement('addColumn')
-                        add_column_tag.setAttribute('tableName', current_table_name)
-
-                        for column in added_columns:
-                            add_column_tag.appendChild(column.cloneNode(True))
-
-                        add_column_changeset.appendChild(add_column_tag)
-                        in_memory_xml.documentElement.appendChild(add_column_changeset)
+                        self.add_change(changes, AddColumnChange(key[2], added_columns), key)
 
             for prev_table in prev_tables:
-                prev_table_name = prev_table.getAttribute('tableName')
-                current_table = self.get_table_by_name(current_tables, prev_table_name)
-
-                if current_table:
-                    prev_columns = prev_table.getElementsByTagName('column')
-                    current_columns = current_table.getElementsByTagName('column')
-
-                    dropped_columns = [col for col in prev_columns if not self.column_exists_in_table(current_columns, col)]
-                    if dropped_columns:
-                        drop_column_changeset = in_memory_xml.createElement('changeSet')
-                        drop_column_changeset.setAttribute('author', 'migration')
-                        drop_column_changeset.setAttribute('id', self.increment_and_get_changeset_id(f'drop-column-{prev_table_name}'))
-
-                        drop_column_tag = in_memory_xml.createElement('dropColumn')
-                        drop_column_tag.setAttribute('tableName', prev_table_name)
-
-                        for column in dropped_columns:
-                            column_name = column.getAttribute('name')
-                            column_element = in_memory_xml.createElement('column')
-                            column_element.setAttribute('name', column_name)
-
-                            drop_column_tag.appendChild(column_element)
-
-                        drop_column_changeset.appendChild(drop_column_tag)
-                        in_memory_xml.documentElement.appendChild(drop_column_changeset)
+                key = object_key(prev_table)
+                if key in column_changes:
+                    dropped_column_names = column_changes.pop(key)[1]
+                    if dropped_column_names:
+                        self.add_change(changes, DropColumnChange(key[2], dropped_column_names), key)
 
         except Exception as e:
             print(f"Error while handling column changes: {e}")
 
-    def handle_insert_changes(self, prev_inserts, curr_inserts, in_memory_xml):
-        """Handle comparison of insert statements between two XMLs."""
-        for curr_insert in curr_inserts:
-            table_name = curr_insert.getAttribute("tableName")
-            prev_insert_found = False
-
-            for prev_insert in prev_inserts:
-                if prev_insert.getAttribute("tableName") == table_name:
-                    prev_insert_found = True
-                    break
-
-            if not prev_insert_found:
-                change_set = in_memory_xml.createElement("changeSet")
-                change_set.setAttribute("author", "migration")
-                change_set.setAttribute("id", self.increment_and_get_changeset_id(f'insert-{table_name}'))
-
-                insert_tag = in_memory_xml.createElement("insert")
-                insert_tag.setAttribute("tableName", table_name)
+    def get_table_column_changes(self, prev_table, current_table):
+        """Return (added column elements, dropped column names) for a table present on both sides.
+
+        Results are memoized in table_diff_cache by the fingerprints of both table definitions,
+        so identical table pairs (e.g. the same table across many tenants) are diffed once.
+        """
+        cache_key = None
+        if self.table_diff_cache is not None:
+            cache_key = (prev_table.fingerprint(), current_table.fingerprint())
+            cached_changes = self.table_diff_cache.get(cache_key)
+            if cached_changes is not None:
+                return cached_changes
+
+        prev_columns = prev_table.getElementsByTagName('column')
+        current_columns = current_table.getElementsByTagName('column')
+        prev_column_names = {column.getAttribute('name') for column in prev_columns}
+        current_column_names = {column.getAttribute('name') for column in current_columns}
+
+        added_columns = [column for column in current_columns if column.getAttribute('name') not in prev_column_names]
+        dropped_column_names = [column.getAttribute('name') for column in prev_columns
+                                if column.getAttribute('name') not in current_column_names]
+        changes = (added_columns, dropped_column_names)
+
+        if cache_key is not None:
+            self.table_diff_cache.put(cache_key, changes)
+        return changes
+
+    def index_tables_by_key(self, tables):
+        """Return {table key: table element}; the first definition of a key wins, like get_table_by_key."""
+        tables_by_key = {}
+        for table in tables:
+            tables_by_key.setdefault(object_key(table), table)
+        return tables_by_key
 
-                for column in curr_insert.getElementsByTagName("column"):
-                    column_copy = column.cloneNode(True)
-                    insert_tag.appendChild(column_copy)
+    def handle_insert_changes(self, prev_inserts, curr_inserts, changes):
+        """Handle comparison of insert statements between two XMLs."""
+        prev_insert_tables = {object_key(prev_insert) for prev_insert in prev_inserts}
 
-                change_set.appendChild(insert_tag)
-                in_memory_xml.documentElement.appendChild(change_set)
+        # Collect the new rows per table, in the order they appear in the current XML
+        new_rows = {}
+        for curr_insert in curr_inserts:
+            key = object_key(curr_insert)
+            if key not in prev_insert_tables:
+                new_rows.setdefault(key, []).append(curr_insert)
+
+        for key, rows in new_rows.items():
+            if self.seed_data_format == SEED_DATA_LOAD_DATA:
+                self.add_load_data_changeset(key, rows, changes)
+            else:
+                self.add_insert_changesets(key, rows, changes)
+
+    def add_insert_changesets(self, key, rows, changes):
+        """Add the rows as changesets of up to insert_batch_size <insert> statements each."""
+        for start in range(0, len(rows), self.insert_batch_size):
+            self.add_change(changes, InsertChange(key[2], rows[start:start + self.insert_batch_size]), key)
+
+    def add_load_data_changeset(self, key, rows, changes):
+        """Write the rows to a CSV file in seed_data_dir and add a single loadData changeset for them."""
+        csv_path, column_types = CsvSeedDataWriter(self.seed_data_output_dir()).write_rows(self.seed_data_file_name(key), rows)
+        self.add_load_data_file_changeset(key, csv_path, column_types, len(rows), changes)
+
+    def handle_load_data_changes(self, prev_load_data, current_load_data, current_tables, changes):
+        """Handle loadData/loadUpdateData seed data by diffing the referenced CSV files by primary key."""
+        prev_by_table = self.group_load_data_by_table(prev_load_data)
+        current_by_table = self.group_load_data_by_table(current_load_data)
+
+        for key, current_entries in current_by_table.items():
+            prev_entries = prev_by_table.get(key, [])
+            primary_key_columns = self.get_seed_data_primary_key(key, current_entries, current_tables)
+            column_types = self.get_seed_data_column_types(current_entries)
+
+            seed_data_diff = SeedDataDiff(primary_key_columns)
+            row_changes = seed_data_diff.iter_changes([self.read_seed_data_rows(entry) for entry in prev_entries],
+                                                      [self.read_seed_data_rows(entry) for entry in current_entries])
+            self.add_seed_data_changesets(key, row_changes, primary_key_columns, column_types, changes)
+
+    def add_seed_data_changesets(self, key, row_changes, primary_key_columns, column_types, changes):
+        """Add insert/update/delete changesets for a stream of seed data deltas, insert_batch_size per changeset."""
+        pending_kind = None
+        pending_rows = []
+        csv_file = None
+
+        def flush():
+            if pending_rows:
+                self.add_change(changes, SeedDataChange(pending_kind, key[2], list(pending_rows),
+                                                        primary_key_columns, column_types), key)
+                pending_rows.clear()
 
-    def handle_index_changes(self, prev_indexes, current_indexes, in_memory_xml):
+        try:
+            for kind, row in row_changes:
+                if kind == 'insert' and self.seed_data_format == SEED_DATA_LOAD_DATA:
+                    # New rows are streamed straight into the CSV file behind a single loadData changeset
+                    if csv_file is None:
+                        csv_file = CsvSeedDataWriter(self.seed_data_output_dir()).open_table(
+                            self.seed_data_file_name(key), {name: column_types.get(name) for name in row})
+                    csv_file.write_row(row)
+                    continue
+
+                if kind != pending_kind or len(pending_rows) >= self.insert_batch_size:
+                    flush()
+                    pending_kind = kind
+                pending_rows.append(row)
+            flush()
+        finally:
+            if csv_file is not None:
+                csv_file.close()
+
+        if csv_file is not None:
+            self.add_load_data_file_changeset(key, csv_file.path,
+                                              {name: column_types.get(name) for name in csv_file.column_names},
+                                              csv_file.row_count, changes)
+
+    def seed_data_output_dir(self):
+        """Return the directory CSV files are written to: seed_data_dir, or its seed_data_subdir."""
+        if self.seed_data_subdir:
+            return os.path.join(self.seed_data_dir, self.seed_data_subdir)
+        return self.seed_data_dir
+
+    def seed_data_file_name(self, key):
+        """Return the name of a new CSV file for a table: its key, then '<key>.2', '<key>.3', ... once taken."""
+        name = format_key(key)
+        number = 1
+        while os.path.join(self.seed_data_output_dir(), f"{name}.csv") in self.seed_data_paths:
+            number += 1
+            name = f"{format_key(key)}.{number}"
+        self.seed_data_paths.add(os.path.join(self.seed_data_output_dir(), f"{name}.csv"))
+        return name
+
+    def add_load_data_file_changeset(self, key, csv_path, column_types, row_count, changes):
+        """Add a loadData changeset for a CSV file written into seed_data_dir (or its seed_data_subdir).
+
+        The file path is written relative to the parent of seed_data_dir, which is where the
+        migration changelogs are expected to be saved.
+        """
+        changelog_dir = os.path.dirname(os.path.abspath(self.seed_data_dir))
+        relative_path = os.path.relpath(os.path.abspath(csv_path), changelog_dir).replace(os.sep, '/')
+        self.add_change(changes, LoadDataChange(key[2], relative_path, column_types, row_count), key)
+
+    def group_load_data_by_table(self, load_data_entries):
+        """Group loadData entries per table key, in changelog order."""
+        by_table = {}
+        for entry in load_data_entries:
+            by_table.setdefault(object_key(entry[0]), []).append(entry)
+        return by_table
+
+    def read_seed_data_rows(self, entry):
+        """Return a row stream for a loadData entry; a missing file yields no rows."""
+        element, csv_path, source = entry
+        if not source.exists(csv_path):
+            print(f"Seed data file not found, skipping: {source.describe(csv_path)}")
+            return iter(())
+
+        reader = CsvSeedDataReader(csv_path,
+                                   separator=element.getAttribute('separator'),
+                                   quote_char=element.getAttribute('quotchar'),
+                                   encoding=element.getAttribute('encoding'),
+                                   source=source)
+        return reader.iter_rows()
+
+    def get_seed_data_primary_key(self, key, load_data_entries, tables):
+        """Return the primary key columns used to match seed data rows of a table."""
+        for element, _, _ in load_data_entries:
+            if element.getAttribute('primaryKey'):
+                return [name.strip() for name in element.getAttribute('primaryKey').split(',')]
+
+        table = self.get_table_by_key(tables, key)
+        if table is None:
+            return []
+        return [column.getAttribute('name') for column in table.getElementsByTagName('column')
+                if any(constraints.getAttribute('primaryKey') == 'true'
+                       for constraints in column.getElementsByTagName('constraints'))]
+
+    def get_seed_data_column_types(self, load_data_entries):
+        """Return the {column: type} hints declared on the loadData elements of a table."""
+        column_types = {}
+        for element, _, _ in load_data_entries:
+            for column in element.getElementsByTagName('column'):
+                name = column.getAttribute('name') or column.getAttribute('header')
+                if column.getAttribute('type'):
+                    column_types[name] = column.getAttribute('type').upper()
+        return column_types
+
+    def handle_index_changes(self, prev_indexes, current_indexes, changes):
         """Handle comparison of createIndex and dropIndex between two XMLs."""
+        prev_index_keys = {(object_key(index), index.getAttribute('indexName')) for index in prev_indexes}
+        current_index_keys = {(object_key(index), index.getAttribute('indexName')) for index in current_indexes}
+
         for curr_index in current_indexes:
-            table_name = curr_index.getAttribute("tableName")
+            key = object_key(curr_index)
             index_name = curr_index.getAttribute("indexName")
-            prev_index_found = False
-
-            for prev_index in prev_indexes:
-                if prev_index.getAttribute("tableName") == table_name and prev_index.getAttribute("indexName") == index_name:
-                    prev_index_found = True
-                    break
-
-            if not prev_index_found:
+            if (key, index_name) not in prev_index_keys:
                 # Add new createIndex changeset
-                change_set = in_memory_xml.createElement("changeSet")
-                change_set.setAttribute("author", "migration")
-                change_set.setAttribute("id", self.increment_and_get_changeset_id(f'create-index-{table_name}-{index_name}'))
-
-                cloned_index = curr_index.cloneNode(True)
-                change_set.appendChild(cloned_index)
-                in_memory_xml.documentElement.appendChild(change_set)
+                self.add_change(changes, CreateIndexChange(key[2], index_name, curr_index), key)
 
         for prev_index in prev_indexes:
-            table_name = prev_index.getAttribute("tableName")
+            key = object_key(prev_index)
             index_name = prev_index.getAttribute("indexName")
-            curr_index_found = False
-
-            for curr_index in current_indexes:
-                if curr_index.getAttribute("tableName") == table_name and curr_index.getAttribute("indexName") == index_name:
-                    curr_index_found = True
-                    break
-
-            if not curr_index_found:
+            if (key, index_name) not in current_index_keys:
                 # Add dropIndex changeset for indexes present in prev XML but missing in current XML
-                drop_changeset = in_memory_xml.createElement('changeSet')
-                drop_changeset.setAttribute('author', 'migration')
-                drop_changeset.setAttribute('id', self.increment_and_get_changeset_id(f'drop-index-{table_name}-{index_name}'))
-
-                drop_index = in_memory_xml.createElement('dropIndex')
-                drop_index.setAttribute('indexName', index_name)
-                drop_index.setAttribute('tableName', table_name)
-                drop_changeset.appendChild(drop_index)
-
-                in_memory_xml.documentElement.appendChild(drop_changeset)
-
-    def get_table_by_name(self, tables, table_name):
-        """Return the table element with the specified name, or None if not found."""
+                self.add_change(changes, DropIndexChange(key[2], index_name), key)
+
+    def handle_dropped_views_and_routines(self, prev_snapshot, current_snapshot, changes):
+        """Handle views, procedures and functions present in the previous XML but missing in the current one."""
+        for key, prev_view in prev_snapshot.views.items():
+            if key not in current_snapshot.views:
+                self.add_change(changes, DropViewChange(key[2], prev_view), key)
+
+        for routine_key, prev_routine in prev_snapshot.routines.items():
+            if routine_key not in current_snapshot.routines:
+                self.add_change(changes, DropRoutineChange(routine_key[1][2], prev_routine), routine_key[1])
+
+    def handle_view_and_routine_changes(self, prev_snapshot, current_snapshot, changes):
+        """Handle new views and routines, and re-create changed ones with replaceIfExists."""
+        for key, view in current_snapshot.views.items():
+            prev_view = prev_snapshot.views.get(key)
+            if prev_view is None:
+                self.add_change(changes, CreateViewChange(key[2], view), key)
+            elif not self.same_definition(prev_view, view):
+                self.add_change(changes, CreateViewChange(key[2], view, replace=True), key)
+
+        for routine_key, routine in current_snapshot.routines.items():
+            prev_routine = prev_snapshot.routines.get(routine_key)
+            key = routine_key[1]
+            if prev_routine is None:
+                self.add_change(changes, CreateRoutineChange(key[2], routine), key)
+            elif not self.same_definition(prev_routine, routine):
+                self.add_change(changes, CreateRoutineChange(key[2], routine, replace=True), key)
+
+    def same_definition(self, prev_element, current_element):
+        """Tell whether a view or routine is defined the same way on both sides.
+
+        Identical elements are recognized by their fingerprints, without loading lazily read
+        bodies; only when those differ are the normalized definitions hashed and compared.
+        """
+        return (prev_element.fingerprint() == current_element.fingerprint()
+                or prev_element.definition_fingerprint() == current_element.definition_fingerprint())
+
+    def handle_sequence_changes(self, prev_sequences, current_sequences, changes):
+        """Handle createSequence, alterSequence and dropSequence changes between previous and current XML."""
+        for key, sequence in current_sequences.items():
+            prev_sequence = prev_sequences.get(key)
+            if prev_sequence is None:
+                self.add_change(changes, CreateSequenceChange(key[2], sequence), key)
+                continue
+            alterations = self.get_sequence_alterations(prev_sequence, sequence)
+            if alterations:
+                self.add_change(changes, AlterSequenceChange(key[2], sequence, alterations), key)
+
+        for key, prev_sequence in prev_sequences.items():
+            if key not in current_sequences:
+                self.add_change(changes, DropSequenceChange(key[2], prev_sequence), key)
+
+    def get_sequence_alterations(self, prev_sequence, current_sequence):
+        """Return {attribute: new value} for the alterable settings a sequence changed.
+
+        A setting removed from the current definition has no alterSequence form and is ignored.
+        """
+        if prev_sequence.fingerprint() == current_sequence.fingerprint():
+            return {}
+        return {name: current_sequence.getAttribute(name) for name in ALTERABLE_SEQUENCE_ATTRIBUTES
+                if current_sequence.hasAttribute(name)
+                and current_sequence.getAttribute(name) != prev_sequence.getAttribute(name)}
+
+    def get_table_by_key(self, tables, key):
+        """Return the table element with the (catalog, schema, name) key, or None if not found."""
         for table in tables:
-            if table.getAttribute('tableName') == table_name:
+            if object_key(table) == key:
                 return table
         return None
 
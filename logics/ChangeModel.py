@@ -0,0 +1,249 @@
+"""Change records produced by a changelog comparison.
+
+The comparer diffs two snapshots once into a list of these records; serializers turn the
+same records into a Liquibase XML changelog, a JSON report, and so on. Every record
+becomes exactly one changeSet and carries its changeset ID once it has been stamped.
+
+Records use __slots__ and reference the snapshot's elements instead of copying them, so a
+change list stays small enough to keep around (and pickle) after the diff has run.
+
+Views, sequences and routines belong to no table; their records keep the object name in
+table_name, which reports and changeset IDs use like a table name. The catalogName and
+schemaName of the object, if any, are in qualifiers.
+"""
+
+# Qualifiers of an object in the default schema; shared, never modified
+NO_QUALIFIERS = {}
+
+
+class Change:
+    """Base class of all change records."""
+
+    __slots__ = ('table_name', 'changeset_id', 'qualifiers')
+
+    # Liquibase change tag, also used as the change type in reports
+    change_type = ''
+    # Prefix of the changeset ID; the counter value is appended when the ID is stamped
+    id_prefix_format = ''
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+        self.changeset_id = None
+        self.qualifiers = NO_QUALIFIERS  # {catalogName/schemaName: value} of the object
+
+    def id_prefix(self):
+        return self.id_prefix_format.format(table=self.table_name)
+
+
+class CreateTableChange(Change):
+    __slots__ = ('table',)
+
+    change_type = 'createTable'
+    id_prefix_format = 'create-table-{table}'
+
+    def __init__(self, table_name, table):
+        super().__init__(table_name)
+        self.table = table  # createTable SchemaElement
+
+
+class DropTableChange(Change):
+    __slots__ = ()
+
+    change_type = 'dropTable'
+    id_prefix_format = 'drop-table-{table}'
+
+
+class AddColumnChange(Change):
+    __slots__ = ('columns',)
+
+    change_type = 'addColumn'
+    id_prefix_format = 'add-column-{table}'
+
+    def __init__(self, table_name, columns):
+        super().__init__(table_name)
+        self.columns = columns  # column SchemaElements
+
+
+class DropColumnChange(Change):
+    __slots__ = ('column_names',)
+
+    change_type = 'dropColumn'
+    id_prefix_format = 'drop-column-{table}'
+
+    def __init__(self, table_name, column_names):
+        super().__init__(table_name)
+        self.column_names = column_names
+
+
+class InsertChange(Change):
+    """New rows copied from <insert> elements of the current changelog."""
+
+    __slots__ = ('rows',)
+
+    change_type = 'insert'
+    id_prefix_format = 'insert-{table}'
+
+    def __init__(self, table_name, rows):
+        super().__init__(table_name)
+        self.rows = rows  # insert SchemaElements
+
+
+class SeedDataChange(Change):
+    """Delta rows of CSV seed data: kind is 'insert', 'update' or 'delete'."""
+
+    __slots__ = ('kind', 'rows', 'primary_key_columns', 'column_types')
+
+    def __init__(self, kind, table_name, rows, primary_key_columns, column_types):
+        super().__init__(table_name)
+        self.kind = kind
+        self.rows = rows  # {column: value} dicts; only the key columns for deletes
+        self.primary_key_columns = primary_key_columns
+        self.column_types = column_types
+
+    @property
+    def change_type(self):
+        return self.kind
+
+    def id_prefix(self):
+        return f'{self.kind}-{self.table_name}'
+
+
+class LoadDataChange(Change):
+    """Rows written to a CSV file that a loadData change loads in bulk."""
+
+    __slots__ = ('file', 'column_types', 'row_count')
+
+    change_type = 'loadData'
+    id_prefix_format = 'load-data-{table}'
+
+    def __init__(self, table_name, file, column_types, row_count):
+        super().__init__(table_name)
+        self.file = file  # path relative to the migration changelog
+        self.column_types = column_types
+        self.row_count = row_count
+
+
+class CreateIndexChange(Change):
+    __slots__ = ('index_name', 'index')
+
+    change_type = 'createIndex'
+    id_prefix_format = 'create-index-{table}-{index}'
+
+    def __init__(self, table_name, index_name, index):
+        super().__init__(table_name)
+        self.index_name = index_name
+        self.index = index  # createIndex SchemaElement
+
+    def id_prefix(self):
+        return self.id_prefix_format.format(table=self.table_name, index=self.index_name)
+
+
+class DropIndexChange(Change):
+    __slots__ = ('index_name',)
+
+    change_type = 'dropIndex'
+    id_prefix_format = 'drop-index-{table}-{index}'
+
+    def __init__(self, table_name, index_name):
+        super().__init__(table_name)
+        self.index_name = index_name
+
+    def id_prefix(self):
+        return self.id_prefix_format.format(table=self.table_name, index=self.index_name)
+
+
+class CreateViewChange(Change):
+    """A new view, or with replace a view whose definition changed (createView replaceIfExists)."""
+
+    __slots__ = ('view', 'replace')
+
+    change_type = 'createView'
+
+    def __init__(self, view_name, view, replace=False):
+        super().__init__(view_name)
+        self.view = view  # createView SchemaElement of the current changelog
+        self.replace = replace
+
+    def id_prefix(self):
+        return f"{'replace' if self.replace else 'create'}-view-{self.table_name}"
+
+
+class DropViewChange(Change):
+    __slots__ = ('view',)
+
+    change_type = 'dropView'
+    id_prefix_format = 'drop-view-{table}'
+
+    def __init__(self, view_name, view):
+        super().__init__(view_name)
+        self.view = view  # createView SchemaElement of the previous changelog
+
+
+class CreateSequenceChange(Change):
+    __slots__ = ('sequence',)
+
+    change_type = 'createSequence'
+    id_prefix_format = 'create-sequence-{table}'
+
+    def __init__(self, sequence_name, sequence):
+        super().__init__(sequence_name)
+        self.sequence = sequence  # createSequence SchemaElement
+
+
+class AlterSequenceChange(Change):
+    """New settings of an existing sequence, e.g. {'incrementBy': '10'}."""
+
+    __slots__ = ('sequence', 'attributes')
+
+    change_type = 'alterSequence'
+    id_prefix_format = 'alter-sequence-{table}'
+
+    def __init__(self, sequence_name, sequence, attributes):
+        super().__init__(sequence_name)
+        self.sequence = sequence  # createSequence SchemaElement of the current changelog
+        self.attributes = attributes
+
+
+class DropSequenceChange(Change):
+    __slots__ = ('sequence',)
+
+    change_type = 'dropSequence'
+    id_prefix_format = 'drop-sequence-{table}'
+
+    def __init__(self, sequence_name, sequence):
+        super().__init__(sequence_name)
+        self.sequence = sequence  # createSequence SchemaElement of the previous changelog
+
+
+class CreateRoutineChange(Change):
+    """A new stored procedure or function, or with replace one whose definition changed."""
+
+    __slots__ = ('routine', 'replace')
+
+    def __init__(self, routine_name, routine, replace=False):
+        super().__init__(routine_name)
+        self.routine = routine  # createProcedure/createFunction SchemaElement of the current changelog
+        self.replace = replace
+
+    @property
+    def change_type(self):
+        return self.routine.tagName
+
+    def id_prefix(self):
+        kind = self.routine.tagName[len('create'):].lower()
+        return f"{'replace' if self.replace else 'create'}-{kind}-{self.table_name}"
+
+
+class DropRoutineChange(Change):
+    __slots__ = ('routine',)
+
+    def __init__(self, routine_name, routine):
+        super().__init__(routine_name)
+        self.routine = routine  # createProcedure/createFunction SchemaElement of the previous changelog
+
+    @property
+    def change_type(self):
+        return 'drop' + self.routine.tagName[len('create'):]
+
+    def id_prefix(self):
+        return f"drop-{self.routine.tagName[len('create'):].lower()}-{self.table_name}"
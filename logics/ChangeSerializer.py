@@ -0,0 +1,217 @@
+from logics.ChangeModel import (AddColumnChange, AlterSequenceChange, CreateIndexChange, CreateRoutineChange,
+                                CreateSequenceChange, CreateTableChange, CreateViewChange, DropColumnChange,
+                                DropIndexChange, DropRoutineChange, DropSequenceChange, DropTableChange,
+                                DropViewChange, InsertChange, LoadDataChange, SeedDataChange)
+from logics.ChangelogSnapshot import SchemaElement
+from logics.CsvSeedData import seed_data_where_clause
+
+# Maps loadData column types to the <insert>/<update> column attribute carrying the value
+LOAD_DATA_VALUE_ATTRIBUTES = {
+    'NUMERIC': 'valueNumeric',
+    'BOOLEAN': 'valueBoolean',
+    'DATE': 'valueDate',
+    'DATETIME': 'valueDate',
+    'COMPUTED': 'valueComputed',
+}
+
+# YAML/JSON key of an element's own text, where it is not the tag name (as it is for sql)
+TEXT_KEYS = {
+    'column': 'value',
+    'createView': 'selectQuery',
+    'createProcedure': 'procedureBody',
+    'createFunction': 'functionBody',
+}
+
+class ChangeSerializer:
+    """Base class of the serializers that turn a change list into a changelog file.
+
+    Every change record is turned into the Liquibase change elements of its changeSet,
+    as format-neutral SchemaElements; subclasses write those out one changeSet at a time,
+    so a change list is streamed rather than built up as a whole document.
+    """
+
+    # Name the serializer is registered under, and the file extension of its output
+    format_name = ''
+    file_extension = ''
+
+    def __init__(self, author='migration'):
+        self.author = author
+        self.builders = {
+            CreateTableChange: self.build_create_table,
+            DropTableChange: self.build_drop_table,
+            AddColumnChange: self.build_add_column,
+            DropColumnChange: self.build_drop_column,
+            InsertChange: self.build_insert,
+            SeedDataChange: self.build_seed_data,
+            LoadDataChange: self.build_load_data,
+            CreateIndexChange: self.build_create_index,
+            DropIndexChange: self.build_drop_index,
+            CreateViewChange: self.build_create_view,
+            DropViewChange: self.build_drop_view,
+            CreateSequenceChange: self.build_create_sequence,
+            AlterSequenceChange: self.build_alter_sequence,
+            DropSequenceChange: self.build_drop_sequence,
+            CreateRoutineChange: self.build_create_routine,
+            DropRoutineChange: self.build_drop_routine,
+        }
+
+    def write(self, changes, file):
+        """Write the changelog for the changes to a text file object."""
+        raise NotImplementedError
+
+    def to_string(self, changes):
+        chunks = []
+        self.write(changes, StringWriter(chunks))
+        return ''.join(chunks)
+
+    def write_file(self, changes, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            self.write(changes, file)
+
+    def changeset_mapping(self, change):
+        """Return the changeSet of a change as nested dicts and lists, the layout of YAML/JSON changelogs."""
+        return {'changeSet': {
+            'id': change.changeset_id,
+            'author': self.author,
+            'changes': [{element.tagName: self.element_mapping(element)} for element in self.change_elements(change)],
+        }}
+
+    def element_mapping(self, element):
+        """Return a change element as a dict: attributes as keys, columns as a 'columns' list."""
+        mapping = {name: structured_value(name, value) for name, value in element.attributes.items()}
+        for child in element.children:
+            if child.tagName == 'column':
+                mapping.setdefault('columns', []).append({'column': self.element_mapping(child)})
+            elif not child.children and not child.attributes:
+                # Text-only children such as <where> become plain string values
+                mapping[child.tagName] = child.text.strip()
+            else:
+                mapping[child.tagName] = self.element_mapping(child)
+        if element.text:
+            mapping[TEXT_KEYS.get(element.tagName, element.tagName)] = element.text.strip()
+        return mapping
+
+    def change_elements(self, change):
+        """Return the change elements (SchemaElements) making up the changeSet of a change."""
+        return self.builders[type(change)](change)
+
+    def build_create_table(self, change):
+        return [change.table]
+
+    def build_drop_table(self, change):
+        return [SchemaElement('dropTable', dict(change.qualifiers, tableName=change.table_name))]
+
+    def build_add_column(self, change):
+        return [SchemaElement('addColumn', dict(change.qualifiers, tableName=change.table_name), list(change.columns))]
+
+    def build_drop_column(self, change):
+        columns = [SchemaElement('column', {'name': column_name}) for column_name in change.column_names]
+        return [SchemaElement('dropColumn', dict(change.qualifiers, tableName=change.table_name), columns)]
+
+    def build_insert(self, change):
+        # A row that is already a plain <insert> of columns is used as is, keeping its source span
+        attributes = dict(change.qualifiers, tableName=change.table_name)
+        return [row if row.attributes == attributes and not row.text
+                and all(child.tagName == 'column' for child in row.children)
+                else SchemaElement('insert', dict(attributes), row.getElementsByTagName('column'))
+                for row in change.rows]
+
+    def build_seed_data(self, change):
+        """Build an <insert>, <update> or <delete> per seed data row."""
+        change_elements = []
+        for row in change.rows:
+            children = []
+            if change.kind == 'delete':
+                children.append(self.build_where(row, change.column_types))
+            else:
+                for column_name, value in row.items():
+                    if change.column_types.get(column_name) == 'SKIP' or (value is None and change.kind == 'insert'):
+                        continue
+                    if change.kind == 'update' and column_name in change.primary_key_columns:
+                        # Key columns only identify the row in the where clause
+                        continue
+                    if value is None:
+                        children.append(SchemaElement('column', {'name': column_name, 'valueComputed': 'NULL'}))
+                    else:
+                        value_attribute = LOAD_DATA_VALUE_ATTRIBUTES.get(change.column_types.get(column_name), 'value')
+                        children.append(SchemaElement('column', {'name': column_name, value_attribute: value}))
+
+                if change.kind == 'update':
+                    key_columns = {name: row.get(name) for name in change.primary_key_columns or row}
+                    children.append(self.build_where(key_columns, change.column_types))
+
+            change_elements.append(SchemaElement(change.kind, dict(change.qualifiers, tableName=change.table_name),
+                                                 children))
+        return change_elements
+
+    def build_where(self, key_values, column_types):
+        return SchemaElement('where', text=seed_data_where_clause(key_values, column_types))
+
+    def build_load_data(self, change):
+        columns = []
+        for column_name, column_type in change.column_types.items():
+            attributes = {'name': column_name}
+            if column_type:
+                attributes['type'] = column_type
+            columns.append(SchemaElement('column', attributes))
+
+        return [SchemaElement('loadData', dict(change.qualifiers,
+                                               tableName=change.table_name,
+                                               file=change.file,
+                                               relativeToChangelogFile='true',
+                                               separator=',',
+                                               encoding='UTF-8'), columns)]
+
+    def build_create_index(self, change):
+        return [change.index]
+
+    def build_drop_index(self, change):
+        return [SchemaElement('dropIndex', dict(change.qualifiers, indexName=change.index_name,
+                                                tableName=change.table_name))]
+
+    def build_create_view(self, change):
+        # A changed view is re-created in place; an unchanged source element keeps its span
+        if change.replace and change.view.getAttribute('replaceIfExists') != 'true':
+            return [change.view.with_attributes(replaceIfExists='true')]
+        return [change.view]
+
+    def build_drop_view(self, change):
+        return [SchemaElement('dropView', dict(change.qualifiers, viewName=change.table_name))]
+
+    def build_create_sequence(self, change):
+        return [change.sequence]
+
+    def build_alter_sequence(self, change):
+        return [SchemaElement('alterSequence', dict(change.qualifiers, sequenceName=change.table_name,
+                                                    **change.attributes))]
+
+    def build_drop_sequence(self, change):
+        return [SchemaElement('dropSequence', dict(change.qualifiers, sequenceName=change.table_name))]
+
+    def build_create_routine(self, change):
+        if change.replace and change.routine.getAttribute('replaceIfExists') != 'true':
+            return [change.routine.with_attributes(replaceIfExists='true')]
+        return [change.routine]
+
+    def build_drop_routine(self, change):
+        kind = change.routine.tagName[len('create'):]
+        attributes = dict(change.qualifiers)
+        attributes[kind.lower() + 'Name'] = change.table_name
+        return [SchemaElement('drop' + kind, attributes)]
+
+
+def structured_value(name, value):
+    """Return an attribute value for YAML/JSON output; true/false flags become booleans, data values stay strings."""
+    if value in ('true', 'false') and not name.startswith('value') and name != 'defaultValue':
+        return value == 'true'
+    return value
+
+
+class StringWriter:
+    """Minimal file-like object collecting written text in a list of chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def write(self, text):
+        self.chunks.append(text)
@@ -0,0 +1,45 @@
+from logics.JsonChangelogSerializer import JsonChangelogSerializer
+from logics.SqlChangelogSerializer import SqlChangelogSerializer
+from logics.XmlChangelogSerializer import XmlChangelogSerializer
+from logics.YamlChangelogSerializer import YamlChangelogSerializer
+
+# Output formats by name; register_serializer adds more
+SERIALIZERS = {}
+
+
+def register_serializer(serializer_class):
+    """Make a ChangeSerializer subclass available under its format_name."""
+    SERIALIZERS[serializer_class.format_name] = serializer_class
+    return serializer_class
+
+
+def get_serializer(output_format, **options):
+    """Return a serializer instance for the output format name."""
+    try:
+        serializer_class = SERIALIZERS[output_format]
+    except KeyError:
+        raise ValueError(f"Unknown output format '{output_format}', expected one of: "
+                         f"{', '.join(sorted(SERIALIZERS))}") from None
+    return serializer_class(**options)
+
+
+for _serializer_class in (XmlChangelogSerializer, YamlChangelogSerializer, JsonChangelogSerializer,
+                          SqlChangelogSerializer):
+    register_serializer(_serializer_class)
+
+
+class RenderedChangelogCache:
+    """Keep the change list of one comparison and each output format rendered from it.
+
+    The diff runs once; the first request for a format renders the change list, and any
+    later request for the same format is a dictionary lookup.
+    """
+
+    def __init__(self, changes):
+        self.changes = list(changes)
+        self.rendered = {}
+
+    def render(self, output_format):
+        if output_format not in self.rendered:
+            self.rendered[output_format] = get_serializer(output_format).to_string(self.changes)
+        return self.rendered[output_format]
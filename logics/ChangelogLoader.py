@@ -0,0 +1,94 @@
+import os
+
+from logics.ChangelogSource import FileChangelogSource, GitChangelogSource, parse_revision_spec
+from logics.FormattedSqlChangelogReader import is_formatted_sql_changelog, parse_formatted_sql_changelog
+from logics.StructuredChangelogReader import is_structured_changelog, parse_structured_changelog
+from logics.XmlChangelogReader import parse_xml_changelog
+
+# Files picked up by <includeAll>
+CHANGELOG_EXTENSIONS = ('.xml', '.yaml', '.yml', '.json', '.sql')
+
+
+class LoadedChangelog:
+    """A root changelog and every changelog it includes, parsed from one source."""
+
+    def __init__(self, source, root_path):
+        self.source = source
+        self.root_path = root_path
+        self.documents = []  # (changelog path, SchemaElement root) in include order
+
+    def get_elements(self, tag_name):
+        """Return the elements with the tag name across all included changelogs, in include order."""
+        return [element for _, dom in self.documents for element in dom.getElementsByTagName(tag_name)]
+
+    def get_elements_with_path(self, tag_names):
+        """Return (element, changelog path) pairs for any of the tag names, in include order."""
+        return [(element, path) for path, dom in self.documents for element in dom.getElementsByTagName('*')
+                if element.tagName in tag_names]
+
+
+class ChangelogLoader:
+    """Parse a changelog and resolve its <include>/<includeAll> tree against the same source.
+
+    Every format is read straight into SchemaElements laid out like the XML form, so all feed
+    the same snapshot model. Elements of local XML files also record their byte span. With a
+    table_filter (see TableFilter), changes to filtered-out tables are skipped while reading.
+    """
+
+    def __init__(self, source, table_filter=None):
+        self.source = source
+        self.table_filter = table_filter
+
+    def load(self, root_path):
+        loaded_changelog = LoadedChangelog(self.source, root_path)
+        self.load_into(loaded_changelog, root_path, set())
+        return loaded_changelog
+
+    def load_into(self, loaded_changelog, path, visited):
+        """Parse one changelog and, depth first, everything it includes."""
+        if path in visited:
+            return
+        visited.add(path)
+
+        if is_formatted_sql_changelog(path):
+            # Formatted SQL is read line by line straight from the source buffer
+            with self.source.open_buffer(path) as buffer:
+                root = parse_formatted_sql_changelog(path, iter(buffer.readline, b''), self.table_filter)
+        elif is_structured_changelog(path):
+            root = parse_structured_changelog(path, self.source.read_bytes(path), self.table_filter)
+        elif isinstance(self.source, FileChangelogSource):
+            with self.source.open_buffer(path) as buffer:
+                data = buffer.getvalue() if hasattr(buffer, 'getvalue') else buffer
+                root = parse_xml_changelog(data, span_path=os.path.abspath(path), table_filter=self.table_filter,
+                                           span_stamp=self.source.stamp(path))
+        else:
+            root = parse_xml_changelog(self.source.read_bytes(path), table_filter=self.table_filter)
+        loaded_changelog.documents.append((path, root))
+
+        for element in root.childNodes:
+            if element.nodeType != element.ELEMENT_NODE:
+                continue
+
+            relative_to_changelog = element.getAttribute('relativeToChangelogFile').lower() == 'true'
+            if element.tagName == 'include':
+                included_path = self.source.resolve(path, element.getAttribute('file'), relative_to_changelog)
+                self.load_into(loaded_changelog, included_path, visited)
+
+            elif element.tagName == 'includeAll':
+                directory = self.source.resolve(path, element.getAttribute('path').rstrip('/\\'), relative_to_changelog)
+                for included_path in self.source.list_files(directory):
+                    if included_path.lower().endswith(CHANGELOG_EXTENSIONS):
+                        self.load_into(loaded_changelog, included_path, visited)
+
+
+def open_changelog_source(spec, git_reader_factory):
+    """Return (source, path) for a changelog spec: a file path or a 'revision:path' inside a git repository.
+
+    git_reader_factory is only called when the spec names a revision.
+    """
+    revision_spec = parse_revision_spec(spec)
+    if revision_spec is None:
+        return FileChangelogSource(), spec
+
+    revision, path = revision_spec
+    return GitChangelogSource(git_reader_factory(), revision), path
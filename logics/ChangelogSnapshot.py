@@ -0,0 +1,327 @@
+import hashlib
+import re
+
+from logics.ChangeConditions import UNCONDITIONAL, changeset_conditions
+from logics.ChangelogLoader import ChangelogLoader
+from logics.ObjectKey import format_key, object_key, qualified_key, schema_key
+from logics.SchemaElement import SchemaElement
+
+# Change elements the comparer reads out of a changelog
+SEED_DATA_TAGS = ('loadData', 'loadUpdateData')
+
+# Name attribute of the routine change tags
+ROUTINE_NAME_ATTRIBUTES = {'createProcedure': 'procedureName', 'createFunction': 'functionName'}
+DROP_ROUTINE_TAGS = {'dropProcedure': 'createProcedure', 'dropFunction': 'createFunction'}
+
+# Routine name in a body written as a whole CREATE statement, for changes without a name attribute
+ROUTINE_NAME_PATTERN = re.compile(r'\bcreate\s+(?:or\s+replace\s+)?(?:procedure|function)\s+([\w$#."`\[\]]+)',
+                                  re.IGNORECASE)
+
+# Attributes naming an object rather than describing it
+NAME_ATTRIBUTES = ('catalogName', 'schemaName', 'sequenceName')
+
+# Change elements replayed into a snapshot, see ChangelogSnapshot.apply_change
+REPLAYED_TAGS = frozenset({'createTable', 'addColumn', 'dropColumn', 'dropTable', 'dropIndex', 'insert',
+                           'createIndex', 'createView', 'dropView', 'createSequence', 'alterSequence',
+                           'dropSequence', *ROUTINE_NAME_ATTRIBUTES, *DROP_ROUTINE_TAGS, *SEED_DATA_TAGS})
+
+# Blocks whose changes do not run as part of the changelog and are not replayed
+SKIPPED_BLOCK_TAGS = ('rollback', 'preConditions')
+
+
+class ChangelogSnapshot:
+    """The parts of a changelog (and its includes) the comparer needs, parsed once.
+
+    A snapshot holds no DOM and no open files, so it can be cached, reused against many
+    other snapshots and sent to worker processes.
+    """
+
+    def __init__(self, label=''):
+        self.label = label
+        self.tables = []      # createTable elements, with later addColumn/dropColumn changes applied
+        self.inserts = []     # insert elements
+        self.indexes = []     # createIndex elements
+        self.load_data = []   # (loadData element, resolved CSV path, source)
+        self.views = {}       # (catalog, schema, viewName) key -> createView element, see ObjectKey
+        self.sequences = {}   # sequence key -> createSequence element, with later alterSequence changes applied
+        self.routines = {}    # (createProcedure or createFunction, routine key) -> routine element
+        self.source = None
+        self.stamps = []      # (path, source stamp) of every parsed changelog and seed data file
+        self.includes_data = True  # False for schema-only snapshots, e.g. read from a database
+        self.replay_log = None  # (ChangeConditions, change element, changelog path) when any change is conditional
+        self._fingerprint = None
+        self._table_positions = {}  # table key -> position in tables while the changelog is replayed
+        self._environment_snapshots = {}  # keys of the conditions that hold -> snapshot, see for_environment
+
+    @classmethod
+    def from_changelog(cls, loaded_changelog, label=None):
+        """Build a snapshot from a LoadedChangelog by replaying its changes in order.
+
+        createTable/createIndex add objects; addColumn, dropColumn, dropTable and dropIndex
+        are applied to them, so the snapshot describes the schema the changelog ends up with.
+        Views, sequences and routines are kept by name; a later definition of a name replaces
+        the earlier one.
+
+        Every change is replayed whatever its changeSet's context, labels and dbms. When any
+        changeSet has them, the changes are also kept with their ChangeConditions, so
+        for_environment can replay the subset one environment runs without reading the files again.
+        """
+        snapshot = cls(label or loaded_changelog.source.describe(loaded_changelog.root_path))
+        snapshot.source = loaded_changelog.source
+
+        replay_log = []
+        conditional = False
+        for changelog_path, dom in loaded_changelog.documents:
+            snapshot.stamps.append((changelog_path, loaded_changelog.source.stamp(changelog_path)))
+            conditions = UNCONDITIONAL
+            for element in iter_change_elements(dom):
+                if element.tagName == 'changeSet':
+                    conditions = changeset_conditions(element)
+                    conditional = conditional or not conditions.unconditional
+                elif element.tagName in REPLAYED_TAGS:
+                    change_conditions = conditions.with_change_dbms(element.getAttribute('dbms'))
+                    conditional = conditional or change_conditions is not conditions
+                    snapshot.apply_change(element, changelog_path)
+                    replay_log.append((change_conditions, element, changelog_path))
+                    if element.tagName in SEED_DATA_TAGS:
+                        csv_path = snapshot.load_data[-1][1]
+                        snapshot.stamps.append((csv_path, loaded_changelog.source.stamp(csv_path)))
+
+        snapshot.finish_replay()
+        if conditional:
+            snapshot.replay_log = replay_log
+        return snapshot
+
+    def apply_change(self, element, changelog_path):
+        """Replay one change element read from the changelog at changelog_path."""
+        if element.tagName == 'createTable':
+            self.add_table(SchemaElement.from_dom(element))
+        elif element.tagName == 'addColumn':
+            self.apply_add_column(element)
+        elif element.tagName == 'dropColumn':
+            self.apply_drop_column(element)
+        elif element.tagName == 'dropTable':
+            self.apply_drop_table(element)
+        elif element.tagName == 'dropIndex':
+            self.apply_drop_index(element)
+        elif element.tagName == 'insert':
+            self.inserts.append(SchemaElement.from_dom(element))
+        elif element.tagName == 'createIndex':
+            self.indexes.append(SchemaElement.from_dom(element))
+        elif element.tagName == 'createView':
+            self.views[object_key(element, 'viewName')] = SchemaElement.from_dom(element)
+        elif element.tagName == 'dropView':
+            self.views.pop(object_key(element, 'viewName'), None)
+        elif element.tagName == 'createSequence':
+            self.sequences[object_key(element, 'sequenceName')] = SchemaElement.from_dom(element)
+        elif element.tagName == 'alterSequence':
+            self.apply_alter_sequence(element)
+        elif element.tagName == 'dropSequence':
+            self.sequences.pop(object_key(element, 'sequenceName'), None)
+        elif element.tagName in ROUTINE_NAME_ATTRIBUTES:
+            routine = SchemaElement.from_dom(element)
+            self.routines[(routine.tagName, routine_key(routine))] = routine
+        elif element.tagName in DROP_ROUTINE_TAGS:
+            create_tag = DROP_ROUTINE_TAGS[element.tagName]
+            self.routines.pop((create_tag, object_key(element, ROUTINE_NAME_ATTRIBUTES[create_tag])), None)
+        elif element.tagName in SEED_DATA_TAGS:
+            relative_to_changelog = element.getAttribute('relativeToChangelogFile').lower() == 'true'
+            csv_path = self.source.resolve(changelog_path, element.getAttribute('file'), relative_to_changelog)
+            self.load_data.append((SchemaElement.from_dom(element), csv_path, self.source))
+
+    def finish_replay(self):
+        # Dropped tables leave None in their slot while replaying
+        self.tables = [table for table in self.tables if table is not None]
+        self._table_positions = {}
+
+    def for_environment(self, environment):
+        """Return the snapshot of the changes that run in an Environment, replayed from the kept changes.
+
+        Environments under which the same conditions hold share one snapshot. A snapshot whose
+        changeSets carry no context, labels or dbms is the same in every environment and is
+        returned as it is.
+        """
+        if self.replay_log is None:
+            return self
+        selected = frozenset(conditions.key for conditions in {entry[0] for entry in self.replay_log}
+                             if conditions.applies_to(environment))
+        snapshot = self._environment_snapshots.get(selected)
+        if snapshot is None:
+            snapshot = ChangelogSnapshot(f"{self.label} [{environment.name}]")
+            snapshot.source = self.source
+            for conditions, element, changelog_path in self.replay_log:
+                if conditions.applies_to(environment):
+                    snapshot.apply_change(element, changelog_path)
+            snapshot.finish_replay()
+            snapshot.stamps = self.stamps
+            self._environment_snapshots[selected] = snapshot
+        return snapshot
+
+    def add_table(self, table):
+        # Like get_table_by_key, the first definition of a key is the one later changes apply to
+        self._table_positions.setdefault(object_key(table), len(self.tables))
+        self.tables.append(table)
+
+    def replace_table(self, key, children):
+        """Replace a table with a copy holding other column children; the original element stays untouched."""
+        position = self._table_positions.get(key)
+        if position is None:
+            return
+        table = self.tables[position]
+        self.tables[position] = SchemaElement(table.tagName, dict(table.attributes), children, table.text)
+
+    def apply_add_column(self, element):
+        key = object_key(element)
+        if key in self._table_positions:
+            columns = [SchemaElement.from_dom(column) for column in element.childNodes
+                       if column.nodeType == column.ELEMENT_NODE and column.tagName == 'column']
+            self.replace_table(key, [*self.tables[self._table_positions[key]].children, *columns])
+
+    def apply_drop_column(self, element):
+        key = object_key(element)
+        if key not in self._table_positions:
+            return
+        dropped_names = {column.getAttribute('name') for column in element.getElementsByTagName('column')}
+        if element.getAttribute('columnName'):
+            dropped_names.add(element.getAttribute('columnName'))
+        table = self.tables[self._table_positions[key]]
+        self.replace_table(key, [child for child in table.children
+                                 if child.tagName != 'column' or child.getAttribute('name') not in dropped_names])
+
+    def apply_drop_table(self, element):
+        """Remove a table together with its indexes."""
+        key = object_key(element)
+        position = self._table_positions.pop(key, None)
+        if position is None:
+            return
+        self.tables[position] = None
+        self.indexes = [index for index in self.indexes if object_key(index) != key]
+
+    def apply_drop_index(self, element):
+        """Remove the indexes of the name in the element's schema, on its table if it names one."""
+        index_name = element.getAttribute('indexName')
+        key = object_key(element)
+        self.indexes = [index for index in self.indexes
+                        if index.getAttribute('indexName') != index_name
+                        or (object_key(index) != key if key[2] else schema_key(object_key(index)) != schema_key(key))]
+
+    def apply_alter_sequence(self, element):
+        """Replace a sequence with a copy carrying the altered settings."""
+        key = object_key(element, 'sequenceName')
+        sequence = self.sequences.get(key)
+        if sequence is not None:
+            self.sequences[key] = sequence.with_attributes(**{
+                name: value for name, value in element.attributes.items() if name not in NAME_ATTRIBUTES})
+
+    def schemas(self):
+        """Return the (catalog, schema, '') keys of the schemas the snapshot's objects are in."""
+        keys = {object_key(element) for group in (self.tables, self.inserts, self.indexes) for element in group}
+        keys.update(object_key(entry[0]) for entry in self.load_data)
+        keys.update(self.views)
+        keys.update(self.sequences)
+        keys.update(key for _, key in self.routines)
+        return {schema_key(key) for key in keys}
+
+    def empty_partition(self, schema):
+        """Return an empty snapshot standing for one schema of this snapshot."""
+        snapshot = ChangelogSnapshot(f"{self.label} [{format_key(schema) or 'default schema'}]")
+        snapshot.source = self.source
+        snapshot.includes_data = self.includes_data
+        return snapshot
+
+    def schema_partitions(self):
+        """Split the snapshot by schema: {(catalog, schema, '') key: snapshot of that schema's objects}.
+
+        Partitions share the elements of this snapshot; seed data and inserts go with the
+        schema of their table.
+        """
+        partitions = {}
+
+        def partition(key):
+            schema = schema_key(key)
+            snapshot = partitions.get(schema)
+            if snapshot is None:
+                snapshot = partitions[schema] = self.empty_partition(schema)
+            return snapshot
+
+        for table in self.tables:
+            partition(object_key(table)).tables.append(table)
+        for insert in self.inserts:
+            partition(object_key(insert)).inserts.append(insert)
+        for index in self.indexes:
+            partition(object_key(index)).indexes.append(index)
+        for entry in self.load_data:
+            partition(object_key(entry[0])).load_data.append(entry)
+        for key, view in self.views.items():
+            partition(key).views[key] = view
+        for key, sequence in self.sequences.items():
+            partition(key).sequences[key] = sequence
+        for key, routine in self.routines.items():
+            partition(key[1]).routines[key] = routine
+        return partitions
+
+    @classmethod
+    def load(cls, source, path, label=None, table_filter=None):
+        """Parse the changelog at path (and everything it includes) from the source into a snapshot.
+
+        With a table_filter (see TableFilter), only the selected tables and columns are read.
+        """
+        return cls.from_changelog(ChangelogLoader(source, table_filter).load(path), label)
+
+    def is_stale(self):
+        """Return True if any file this snapshot was parsed from changed since."""
+        return any(self.source.stamp(path) != stamp for path, stamp in self.stamps)
+
+    def fingerprint(self):
+        """Return the root fingerprint of the snapshot, computed once.
+
+        It covers every table, index, insert, view, sequence, routine and seed data element
+        plus the content of the seed data files, independent of their order in the changelogs. Equal root
+        fingerprints mean no migration is needed.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(digest_size=16)
+            for group in (self.tables, self.indexes, self.inserts, self.views.values(), self.sequences.values(),
+                          self.routines.values()):
+                for element_fingerprint in sorted(element.fingerprint() for element in group):
+                    digest.update(element_fingerprint)
+                digest.update(b'\x1c')
+            for seed_data_fingerprint in sorted(element.fingerprint() + seed_data_digest(source, csv_path)
+                                                for element, csv_path, source in self.load_data):
+                digest.update(seed_data_fingerprint)
+            self._fingerprint = digest.digest()
+        return self._fingerprint
+
+
+def iter_change_elements(node):
+    """Yield the elements below a DOM node or SchemaElement in document order, skipping rollback blocks."""
+    for child in node.childNodes:
+        if child.nodeType != child.ELEMENT_NODE or child.tagName in SKIPPED_BLOCK_TAGS:
+            continue
+        yield child
+        yield from iter_change_elements(child)
+
+
+def routine_key(routine):
+    """Return the key of a createProcedure/createFunction element, named from its body if it has no name attribute."""
+    key = object_key(routine, ROUTINE_NAME_ATTRIBUTES[routine.tagName])
+    if key[2]:
+        return key
+    match = ROUTINE_NAME_PATTERN.search(routine.text)
+    if not match:
+        return key
+    parts = [part.strip('"`[]') for part in match.group(1).split('.')]
+    # A schema-qualified name in the body stands in for a missing schemaName
+    schema = key[1] or (parts[-2] if len(parts) > 1 else '')
+    return qualified_key(key[0], schema, parts[-1])
+
+
+def seed_data_digest(source, csv_path):
+    """Return a digest of a seed data file's bytes, hashed straight from its buffer."""
+    if not source.exists(csv_path):
+        return b'missing'
+    with source.open_buffer(csv_path) as buffer:
+        if hasattr(buffer, 'getbuffer'):
+            with buffer.getbuffer() as view:
+                return hashlib.blake2b(view, digest_size=16).digest()
+        return hashlib.blake2b(buffer, digest_size=16).digest()
@@ -0,0 +1,127 @@
+import io
+import mmap
+import os
+import posixpath
+import re
+from contextlib import contextmanager
+
+# Windows paths such as C:\db\changelog.xml must not be mistaken for revision:path specs
+WINDOWS_DRIVE_PATTERN = re.compile(r'^[A-Za-z]:[\\/]')
+
+
+class FileChangelogSource:
+    """Reads changelogs and the files they reference from the local file system."""
+
+    def describe(self, path):
+        return path
+
+    def cache_key(self, path):
+        """Return a key identifying the changelog at path across loads."""
+        return 'file', os.path.abspath(path)
+
+    def stamp(self, path):
+        """Return (modification time, size) of a file, used to tell whether a cached snapshot is stale."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def read_bytes(self, path):
+        with open(path, 'rb') as file:
+            return file.read()
+
+    @contextmanager
+    def open_buffer(self, path):
+        """Yield a memory map of the file; an empty file yields an empty buffer."""
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                yield io.BytesIO(b'')
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+
+    def exists(self, path):
+        return os.path.isfile(path)
+
+    def list_files(self, directory):
+        """Return the files of a directory in the order Liquibase includes them."""
+        return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                      if os.path.isfile(os.path.join(directory, name)))
+
+    def resolve(self, changelog_path, file_name, relative_to_changelog):
+        """Resolve a file referenced from a changelog the way Liquibase does."""
+        changelog_dir = os.path.dirname(os.path.abspath(changelog_path))
+        if relative_to_changelog:
+            return os.path.normpath(os.path.join(changelog_dir, file_name))
+        if os.path.exists(file_name):
+            return file_name
+
+        # Otherwise the path is relative to the search path, usually a parent of the changelog directory
+        directory = changelog_dir
+        while True:
+            candidate = os.path.join(directory, file_name)
+            if os.path.exists(candidate):
+                return os.path.normpath(candidate)
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return os.path.normpath(os.path.join(changelog_dir, file_name))
+            directory = parent
+
+
+class GitChangelogSource:
+    """Reads changelogs and the files they reference from one revision of a git repository.
+
+    Paths are repository-relative and use forward slashes; nothing is checked out.
+    """
+
+    def __init__(self, git_reader, revision):
+        self.git_reader = git_reader
+        self.revision = revision
+
+    def describe(self, path):
+        return f"{self.revision}:{path}"
+
+    def cache_key(self, path):
+        # Keyed by commit id, so a moving ref such as HEAD never returns a stale snapshot
+        return 'git', os.path.abspath(self.git_reader.repo_path), self.git_reader.resolve_commit(self.revision), path
+
+    def stamp(self, path):
+        # Content at a commit never changes
+        return None
+
+    def read_bytes(self, path):
+        return self.git_reader.read_blob(self.revision, path)
+
+    @contextmanager
+    def open_buffer(self, path):
+        yield io.BytesIO(self.read_bytes(path))
+
+    def exists(self, path):
+        return self.git_reader.exists(self.revision, path)
+
+    def list_files(self, directory):
+        return sorted(posixpath.join(directory, name)
+                      for name, is_directory in self.git_reader.list_tree(self.revision, directory)
+                      if not is_directory)
+
+    def resolve(self, changelog_path, file_name, relative_to_changelog):
+        file_name = file_name.replace('\\', '/')
+        if relative_to_changelog:
+            return posixpath.normpath(posixpath.join(posixpath.dirname(changelog_path), file_name))
+
+        # Without relativeToChangelogFile the path is taken from the repository root first
+        repo_path = posixpath.normpath(file_name.lstrip('/'))
+        if self.exists(repo_path):
+            return repo_path
+        return posixpath.normpath(posixpath.join(posixpath.dirname(changelog_path), file_name))
+
+
+def parse_revision_spec(spec):
+    """Split a 'revision:path' spec into (revision, path), or return None for a plain file path."""
+    if ':' not in spec or WINDOWS_DRIVE_PATTERN.match(spec) or os.path.exists(spec):
+        return None
+    revision, path = spec.split(':', 1)
+    if not revision or not path:
+        return None
+    return revision, posixpath.normpath(path.replace('\\', '/').lstrip('/'))
@@ -0,0 +1,211 @@
+import csv
+import hashlib
+import os
+import re
+
+from logics.ChangelogSource import FileChangelogSource
+
+# Buffer size used when streaming CSV seed data to disk
+WRITE_BUFFER_SIZE = 64 * 1024
+
+# Liquibase loads the literal NULL as a database null in loadData files
+CSV_NULL = 'NULL'
+
+# A number that may go into SQL as it is; anything else in a NUMERIC key column is quoted as a string
+NUMERIC_LITERAL_PATTERN = re.compile(r'[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?')
+
+# Maps the value attribute used on an <insert> column to the loadData column type
+INSERT_VALUE_TYPES = (
+    ('value', 'STRING'),
+    ('valueNumeric', 'NUMERIC'),
+    ('valueBoolean', 'BOOLEAN'),
+    ('valueDate', 'DATE'),
+    ('valueComputed', 'COMPUTED'),
+    ('valueBlobFile', 'BLOB'),
+    ('valueClobFile', 'CLOB'),
+)
+
+
+def insert_column_value(column):
+    """Return (value, loadData type) for an <insert> column SchemaElement; value is None for nulls."""
+    for attribute, value_type in INSERT_VALUE_TYPES:
+        if column.hasAttribute(attribute):
+            return column.getAttribute(attribute), value_type
+
+    # <column name="x">text</column> carries its value as text content
+    if column.text:
+        return column.text, 'STRING'
+    return None, None
+
+
+def seed_data_where_clause(key_values, column_types):
+    """Build the SQL where clause matching a seed data row by its key columns.
+
+    Empty key values (empty CSV cells, which loadData loads as nulls) match with IS NULL.
+    NUMERIC values are only written unquoted when they are plain numbers.
+    """
+    conditions = []
+    for column_name, value in key_values.items():
+        if value is None or value == '':
+            conditions.append(f"{column_name} IS NULL")
+        elif column_types.get(column_name) == 'NUMERIC' and NUMERIC_LITERAL_PATTERN.fullmatch(value.strip()):
+            conditions.append(f"{column_name} = {value.strip()}")
+        else:
+            escaped_value = value.replace("'", "''")
+            conditions.append(f"{column_name} = '{escaped_value}'")
+    return ' AND '.join(conditions)
+
+
+class CsvSeedDataWriter:
+    """Stream <insert> rows of one table into a CSV file usable by a Liquibase loadData change."""
+
+    def __init__(self, seed_data_dir, separator=','):
+        self.seed_data_dir = seed_data_dir
+        self.separator = separator
+
+    def write_rows(self, table_name, inserts):
+        """Write the rows to <seed_data_dir>/<table_name>.csv and return (csv path, {column: type})."""
+        # The header is the union of the columns used by any row, in first-seen order
+        column_types = {}
+        for insert in inserts:
+            for column in insert.getElementsByTagName('column'):
+                value, value_type = insert_column_value(column)
+                name = column.getAttribute('name')
+                if value_type and not column_types.get(name):
+                    column_types[name] = value_type
+                else:
+                    column_types.setdefault(name, None)
+
+        def insert_values():
+            for insert in inserts:
+                yield {column.getAttribute('name'): insert_column_value(column)[0]
+                       for column in insert.getElementsByTagName('column')}
+
+        return self.write_value_rows(table_name, column_types, insert_values()), column_types
+
+    def write_value_rows(self, table_name, column_types, rows):
+        """Stream {column: value} rows to <seed_data_dir>/<table_name>.csv and return the csv path."""
+        with self.open_table(table_name, column_types) as table_file:
+            for values in rows:
+                table_file.write_row(values)
+        return table_file.path
+
+    def open_table(self, table_name, column_types):
+        """Open <seed_data_dir>/<table_name>.csv for streaming rows into it, header already written."""
+        os.makedirs(self.seed_data_dir, exist_ok=True)
+        return CsvSeedDataFile(os.path.join(self.seed_data_dir, f"{table_name}.csv"), list(column_types), self.separator)
+
+
+class CsvSeedDataFile:
+    """A CSV seed data file that is being written row by row through a buffered writer."""
+
+    def __init__(self, path, column_names, separator=','):
+        self.path = path
+        self.column_names = column_names
+        self.row_count = 0
+        self.file = open(path, 'w', encoding='utf-8', newline='', buffering=WRITE_BUFFER_SIZE)
+        self.writer = csv.writer(self.file, delimiter=separator)
+        self.writer.writerow(column_names)
+
+    def write_row(self, values):
+        """Write one {column: value} row; missing and None values are written as NULL."""
+        self.writer.writerow([CSV_NULL if values.get(name) is None else values[name] for name in self.column_names])
+        self.row_count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CsvSeedDataReader:
+    """Stream the rows of a loadData CSV file through a memory map, one line at a time."""
+
+    def __init__(self, path, separator=',', quote_char='"', encoding='utf-8', source=None):
+        self.path = path
+        self.separator = separator or ','
+        self.quote_char = quote_char or '"'
+        self.encoding = encoding or 'utf-8'
+        self.source = source or FileChangelogSource()
+
+    def iter_rows(self):
+        """Yield the header once as a list, then every data row as a {column: value} dict."""
+        with self.source.open_buffer(self.path) as buffer:
+            yield from self.iter_buffer_rows(buffer)
+
+    def iter_buffer_rows(self, buffer):
+        """Parse rows out of a bytes-like buffer without decoding it as a whole."""
+        lines = (line.decode(self.encoding) for line in iter(buffer.readline, b''))
+        reader = csv.reader(lines, delimiter=self.separator, quotechar=self.quote_char)
+
+        header = next(reader, None)
+        if header is None:
+            return
+        header = [name.strip() for name in header]
+        if header and header[0].startswith('\ufeff'):
+            header[0] = header[0][1:]
+        yield header
+
+        for row in reader:
+            if not row:
+                continue
+            yield {name: (None if value.upper() == CSV_NULL else value) for name, value in zip(header, row)}
+
+
+def row_digest(row):
+    """Return a compact digest of a row that does not depend on the CSV column order."""
+    digest = hashlib.blake2b(digest_size=16)
+    for name in sorted(row):
+        value = row[name]
+        digest.update(name.encode('utf-8'))
+        digest.update(b'\x1f' if value is None else b'\x1e' + value.encode('utf-8'))
+        digest.update(b'\x1d')
+    return digest.digest()
+
+
+class SeedDataDiff:
+    """Diff two streams of seed data rows by primary key, keeping only digests of the previous rows."""
+
+    def __init__(self, primary_key_columns):
+        self.primary_key_columns = list(primary_key_columns)
+
+    def key_columns(self, header):
+        """Return the key columns for a CSV header; the whole row is the key when no primary key is known."""
+        return tuple(name for name in self.primary_key_columns if name in header) or tuple(header)
+
+    def iter_changes(self, prev_row_streams, curr_row_streams):
+        """Yield ('insert', row), ('update', row) and ('delete', key columns) deltas.
+
+        Each stream is an iterator as produced by CsvSeedDataReader.iter_rows. Only a
+        {key: digest} index of the previous rows is held in memory; current rows are streamed.
+        """
+        prev_digests = {}
+        for stream in prev_row_streams:
+            header = next(stream, None)
+            if header is None:
+                continue
+            key_columns = self.key_columns(header)
+            for row in stream:
+                key = tuple(row.get(name) for name in key_columns)
+                prev_digests[key] = (row_digest(row), key_columns)
+
+        for stream in curr_row_streams:
+            header = next(stream, None)
+            if header is None:
+                continue
+            key_columns = self.key_columns(header)
+            for row in stream:
+                key = tuple(row.get(name) for name in key_columns)
+                prev_entry = prev_digests.pop(key, None)
+                if prev_entry is None:
+                    yield 'insert', row
+                elif prev_entry[0] != row_digest(row):
+                    yield 'update', row
+
+        # Whatever is left in the previous index no longer exists in the current data
+        for key, (_, key_columns) in prev_digests.items():
+            yield 'delete', dict(zip(key_columns, key))
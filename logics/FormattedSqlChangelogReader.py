@@ -0,0 +1,520 @@
+import re
+import sys
+
+from logics.SchemaElement import SchemaElement
+
+# --changeset author:id [attribute:value ...]
+CHANGESET_PATTERN = re.compile(r'--\s*changeset\s+("[^"]*"|[^:\s]+):("[^"]*"|\S+)(.*)$', re.IGNORECASE)
+CHANGESET_ATTRIBUTE_PATTERN = re.compile(r'(\w+):("[^"]*"|\S*)')
+
+# Tokens of a statement: whitespace, string literals, quoted identifiers, numbers, words and punctuation
+TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])
+  | (?P<number>\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$#]*)
+  | (?P<symbol>.)
+""", re.VERBOSE | re.DOTALL)
+
+# Column definition keywords that end the data type
+COLUMN_CONSTRAINT_KEYWORDS = {'NOT', 'NULL', 'PRIMARY', 'UNIQUE', 'DEFAULT', 'REFERENCES', 'CONSTRAINT', 'CHECK',
+                              'AUTO_INCREMENT', 'AUTOINCREMENT', 'GENERATED', 'IDENTITY', 'COLLATE', 'COMMENT'}
+
+# Table-level constraint keywords inside CREATE TABLE (...)
+TABLE_CONSTRAINT_KEYWORDS = {'CONSTRAINT', 'PRIMARY', 'FOREIGN', 'UNIQUE', 'CHECK', 'KEY', 'INDEX'}
+
+# CREATE/ALTER SEQUENCE options taking a value, and the createSequence attribute each sets
+SEQUENCE_OPTION_ATTRIBUTES = {'START': 'startValue', 'INCREMENT': 'incrementBy', 'MINVALUE': 'minValue',
+                              'MAXVALUE': 'maxValue', 'CACHE': 'cacheSize'}
+
+
+class SqlToken:
+    __slots__ = ('kind', 'text', 'start', 'end')
+
+    def __init__(self, kind, text, start, end):
+        self.kind = kind
+        self.text = text
+        self.start = start
+        self.end = end
+
+    @property
+    def keyword(self):
+        return self.text.upper() if self.kind == 'word' else self.text
+
+
+def tokenize(statement):
+    """Split a statement into SqlTokens, whitespace dropped."""
+    return [SqlToken(match.lastgroup, match.group(), match.start(), match.end())
+            for match in TOKEN_PATTERN.finditer(statement) if match.lastgroup != 'space']
+
+
+def unquote_identifier(text):
+    if text[:1] in '"`[':
+        return text[1:-1].replace('""', '"')
+    return text
+
+
+class FormattedSqlChangelogReader:
+    """Read a Liquibase formatted SQL changelog into a databaseChangeLog SchemaElement tree.
+
+    The file is read one line at a time; each statement is tokenized with precompiled
+    patterns and the DDL the snapshot model understands (CREATE/ALTER/DROP TABLE, CREATE/DROP
+    INDEX, INSERT, views, sequences and routines) is turned into the equivalent Liquibase
+    change elements. Any other statement is skipped. A file without the formatted SQL header
+    is read as one changeset; a changeset with splitStatements:false is one statement.
+    """
+
+    def __init__(self, path, table_filter=None):
+        self.path = path
+        self.table_filter = table_filter
+        self.statement_handlers = {
+            ('CREATE', 'TABLE'): self.parse_create_table,
+            ('ALTER', 'TABLE'): self.parse_alter_table,
+            ('DROP', 'TABLE'): self.parse_drop_table,
+            ('CREATE', 'INDEX'): self.parse_create_index,
+            ('CREATE', 'UNIQUE'): self.parse_create_index,
+            ('DROP', 'INDEX'): self.parse_drop_index,
+            ('INSERT', 'INTO'): self.parse_insert,
+            ('CREATE', 'VIEW'): self.parse_create_view,
+            ('CREATE', 'OR'): self.parse_create_or_replace,
+            ('DROP', 'VIEW'): self.parse_drop_view,
+            ('CREATE', 'SEQUENCE'): self.parse_create_sequence,
+            ('ALTER', 'SEQUENCE'): self.parse_alter_sequence,
+            ('DROP', 'SEQUENCE'): self.parse_drop_sequence,
+            ('CREATE', 'PROCEDURE'): self.parse_create_routine,
+            ('CREATE', 'FUNCTION'): self.parse_create_routine,
+            ('DROP', 'PROCEDURE'): self.parse_drop_routine,
+            ('DROP', 'FUNCTION'): self.parse_drop_routine,
+        }
+
+    def read(self, lines):
+        """Parse an iterable of lines (bytes or str) and return the databaseChangeLog element."""
+        root = SchemaElement('databaseChangeLog')
+        changeset = None
+        statement_lines = []
+        end_delimiter = ';'
+        split_statements = True
+
+        for line in lines:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            stripped = line.strip().lstrip('\ufeff')
+
+            match = CHANGESET_PATTERN.match(stripped)
+            if match:
+                self.add_statement(changeset, statement_lines, end_delimiter)
+                changeset = self.create_changeset(match)
+                root.append_child(changeset)
+                end_delimiter = changeset.getAttribute('endDelimiter') or ';'
+                split_statements = changeset.getAttribute('splitStatements').lower() != 'false'
+                continue
+
+            # Comments and directives (--rollback, --comment, --precondition-*) hold nothing to replay
+            if not stripped or stripped.startswith('--'):
+                continue
+
+            if changeset is None:
+                # Plain SQL without the formatted header runs as a single changeset
+                changeset = SchemaElement('changeSet', {'id': self.path, 'author': 'sql'})
+                root.append_child(changeset)
+
+            statement_lines.append(line)
+            if split_statements and stripped.endswith(end_delimiter) and not self.inside_string(statement_lines):
+                self.add_statement(changeset, statement_lines, end_delimiter)
+
+        self.add_statement(changeset, statement_lines, end_delimiter)
+        return root
+
+    def create_changeset(self, match):
+        author, changeset_id, rest = match.groups()
+        attributes = {'id': changeset_id.strip('"'), 'author': author.strip('"')}
+        for name, value in CHANGESET_ATTRIBUTE_PATTERN.findall(rest):
+            attributes[name] = value.strip('"')
+        return SchemaElement('changeSet', attributes)
+
+    def inside_string(self, statement_lines):
+        return sum(line.count("'") for line in statement_lines) % 2 == 1
+
+    def add_statement(self, changeset, statement_lines, end_delimiter=';'):
+        """Parse the collected statement lines into change elements of the changeset."""
+        if not statement_lines:
+            return
+        statement = ''.join(statement_lines).strip()
+        statement_lines.clear()
+        if statement.endswith(end_delimiter):
+            statement = statement[:-len(end_delimiter)]
+
+        tokens = tokenize(statement)
+        if len(tokens) < 2:
+            return
+        handler = self.statement_handlers.get((tokens[0].keyword, tokens[1].keyword))
+        if handler is not None:
+            elements = handler(statement, tokens)
+            if self.table_filter is not None:
+                elements = self.table_filter.prune(elements, changeset)
+            changeset.extend_children(elements)
+
+    def parse_create_table(self, statement, tokens):
+        position = self.skip_keywords(tokens, 2, ('IF', 'NOT', 'EXISTS'))
+        table_attributes, position = self.parse_table_name(tokens, position)
+        if position >= len(tokens) or tokens[position].text != '(':
+            return []
+
+        columns = []
+        columns_by_name = {}
+        for definition in self.split_list(tokens, position):
+            if not definition:
+                continue
+            if definition[0].keyword in TABLE_CONSTRAINT_KEYWORDS:
+                self.apply_table_constraint(statement, definition, columns_by_name)
+            else:
+                column = self.parse_column_definition(statement, definition)
+                columns.append(column)
+                columns_by_name[column.getAttribute('name')] = column
+
+        return [SchemaElement('createTable', table_attributes, columns)]
+
+    def parse_alter_table(self, statement, tokens):
+        table_attributes, position = self.parse_table_name(tokens, self.skip_keywords(tokens, 2, ('IF', 'EXISTS')))
+        changes = []
+        for action in self.split_on_commas(tokens[position:]):
+            if not action:
+                continue
+            keyword = action[0].keyword
+            if keyword == 'ADD':
+                definition = action[2:] if len(action) > 1 and action[1].keyword == 'COLUMN' else action[1:]
+                if definition and definition[0].keyword not in TABLE_CONSTRAINT_KEYWORDS:
+                    column = self.parse_column_definition(statement, definition)
+                    changes.append(SchemaElement('addColumn', dict(table_attributes), [column]))
+            elif keyword == 'DROP':
+                rest = action[2:] if len(action) > 1 and action[1].keyword == 'COLUMN' else action[1:]
+                rest = rest[2:] if len(rest) > 2 and rest[0].keyword == 'IF' else rest
+                if rest and rest[0].keyword not in TABLE_CONSTRAINT_KEYWORDS | {'FOREIGN', 'PRIMARY'}:
+                    changes.append(SchemaElement('dropColumn', dict(table_attributes, columnName=unquote_identifier(rest[0].text))))
+        return changes
+
+    def parse_drop_table(self, statement, tokens):
+        table_attributes, _ = self.parse_table_name(tokens, self.skip_keywords(tokens, 2, ('IF', 'EXISTS')))
+        return [SchemaElement('dropTable', table_attributes)]
+
+    def parse_create_index(self, statement, tokens):
+        unique = tokens[1].keyword == 'UNIQUE'
+        position = 3 if unique else 2
+        position = self.skip_keywords(tokens, position, ('IF', 'NOT', 'EXISTS'))
+        if position + 2 >= len(tokens) or tokens[position + 1].keyword != 'ON':
+            return []
+        index_name = unquote_identifier(tokens[position].text)
+        table_attributes, position = self.parse_table_name(tokens, position + 2)
+        if position >= len(tokens) or tokens[position].text != '(':
+            return []
+
+        columns = []
+        for definition in self.split_list(tokens, position):
+            if definition:
+                attributes = {'name': unquote_identifier(definition[0].text)}
+                if definition[-1].keyword == 'DESC':
+                    attributes['descending'] = 'true'
+                columns.append(SchemaElement('column', attributes))
+
+        attributes = {'indexName': index_name, **table_attributes}
+        if unique:
+            attributes['unique'] = 'true'
+        return [SchemaElement('createIndex', attributes, columns)]
+
+    def parse_drop_index(self, statement, tokens):
+        position = self.skip_keywords(tokens, 2, ('IF', 'EXISTS'))
+        if position >= len(tokens):
+            return []
+        attributes = {'indexName': unquote_identifier(tokens[position].text)}
+        if position + 2 < len(tokens) and tokens[position + 1].keyword == 'ON':
+            table_attributes, _ = self.parse_table_name(tokens, position + 2)
+            attributes.update(table_attributes)
+        return [SchemaElement('dropIndex', attributes)]
+
+    def parse_insert(self, statement, tokens):
+        table_attributes, position = self.parse_table_name(tokens, 2)
+        if position >= len(tokens) or tokens[position].text != '(':
+            return []
+        column_names = [unquote_identifier(definition[0].text) for definition in self.split_list(tokens, position)
+                        if definition]
+        position = self.skip_list(tokens, position)
+        if position >= len(tokens) or tokens[position].keyword != 'VALUES':
+            return []
+
+        inserts = []
+        position += 1
+        while position < len(tokens) and tokens[position].text == '(':
+            values = self.split_list(tokens, position)
+            columns = [self.insert_column(statement, name, value) for name, value in zip(column_names, values)]
+            inserts.append(SchemaElement('insert', dict(table_attributes), columns))
+            position = self.skip_list(tokens, position)
+            if position < len(tokens) and tokens[position].text == ',':
+                position += 1
+        return inserts
+
+    def parse_create_or_replace(self, statement, tokens):
+        if len(tokens) < 4 or tokens[2].keyword != 'REPLACE':
+            return []
+        if tokens[3].keyword == 'VIEW':
+            return self.parse_create_view(statement, tokens[2:], replace=True)
+        if tokens[3].keyword in ('PROCEDURE', 'FUNCTION'):
+            return self.parse_create_routine(statement, tokens[2:])
+        return []
+
+    def parse_create_view(self, statement, tokens, replace=False):
+        """Turn CREATE [OR REPLACE] VIEW name AS query into a createView element holding the query."""
+        attributes, position = self.parse_table_name(tokens, self.skip_keywords(tokens, 2, ('IF', 'NOT', 'EXISTS')))
+        if position < len(tokens) and tokens[position].text == '(':
+            # Column names of the view are part of its query in the snapshot model
+            position = self.skip_list(tokens, position)
+        if position + 1 >= len(tokens) or tokens[position].keyword != 'AS':
+            return []
+        attributes['viewName'] = attributes.pop('tableName')
+        if replace:
+            attributes['replaceIfExists'] = 'true'
+        return [SchemaElement('createView', attributes, text=statement[tokens[position + 1].start:])]
+
+    def parse_drop_view(self, statement, tokens):
+        attributes, _ = self.parse_table_name(tokens, self.skip_keywords(tokens, 2, ('IF', 'EXISTS')))
+        attributes['viewName'] = attributes.pop('tableName')
+        return [SchemaElement('dropView', attributes)]
+
+    def parse_create_sequence(self, statement, tokens):
+        attributes, position = self.parse_table_name(tokens, self.skip_keywords(tokens, 2, ('IF', 'NOT', 'EXISTS')))
+        attributes['sequenceName'] = attributes.pop('tableName')
+        attributes.update(self.parse_sequence_options(tokens, position))
+        return [SchemaElement('createSequence', attributes)]
+
+    def parse_alter_sequence(self, statement, tokens):
+        attributes, position = self.parse_table_name(tokens, self.skip_keywords(tokens, 2, ('IF', 'EXISTS')))
+        attributes['sequenceName'] = attributes.pop('tableName')
+        attributes.update(self.parse_sequence_options(tokens, position))
+        return [SchemaElement('alterSequence', attributes)]
+
+    def parse_drop_sequence(self, statement, tokens):
+        attributes, _ = self.parse_table_name(tokens, self.skip_keywords(tokens, 2, ('IF', 'EXISTS')))
+        attributes['sequenceName'] = attributes.pop('tableName')
+        return [SchemaElement('dropSequence', attributes)]
+
+    def parse_sequence_options(self, tokens, position):
+        """Return the createSequence attributes of START WITH, INCREMENT BY, MINVALUE, ... and CYCLE options."""
+        attributes = {}
+        while position < len(tokens):
+            keyword = tokens[position].keyword
+            if keyword in SEQUENCE_OPTION_ATTRIBUTES:
+                position = self.skip_keywords(tokens, position + 1, ('WITH', 'BY'))
+                sign = ''
+                if position < len(tokens) and tokens[position].text in '+-':
+                    sign = tokens[position].text.strip('+')
+                    position += 1
+                if position < len(tokens) and tokens[position].kind == 'number':
+                    attributes[SEQUENCE_OPTION_ATTRIBUTES[keyword]] = sign + tokens[position].text
+            elif keyword == 'CYCLE':
+                attributes['cycle'] = 'true'
+            elif keyword == 'NOCYCLE' or (keyword == 'NO' and position + 1 < len(tokens)
+                                          and tokens[position + 1].keyword == 'CYCLE'):
+                attributes['cycle'] = 'false'
+                if keyword == 'NO':
+                    position += 1
+            position += 1
+        return attributes
+
+    def parse_create_routine(self, statement, tokens):
+        """Turn CREATE [OR REPLACE] PROCEDURE/FUNCTION into createProcedure/createFunction holding the statement."""
+        kind = tokens[1].keyword
+        if len(tokens) < 3:
+            return []
+        attributes, _ = self.parse_table_name(tokens, 2)
+        attributes[kind.lower() + 'Name'] = attributes.pop('tableName')
+        return [SchemaElement('create' + kind.capitalize(), attributes, text=statement)]
+
+    def parse_drop_routine(self, statement, tokens):
+        kind = tokens[1].keyword
+        attributes, _ = self.parse_table_name(tokens, self.skip_keywords(tokens, 2, ('IF', 'EXISTS')))
+        attributes[kind.lower() + 'Name'] = attributes.pop('tableName')
+        return [SchemaElement('drop' + kind.capitalize(), attributes)]
+
+    def insert_column(self, statement, name, value_tokens):
+        """Return the insert <column> element for a value expression, typed like the XML would be."""
+        attributes = {'name': name}
+        if len(value_tokens) == 1 and value_tokens[0].keyword == 'NULL':
+            return SchemaElement('column', attributes)
+        attribute, value = self.literal_attribute('value', statement, value_tokens)
+        attributes[attribute] = value
+        return SchemaElement('column', attributes)
+
+    def literal_attribute(self, prefix, statement, value_tokens):
+        """Return (attribute name, value) for a literal: value/valueNumeric/valueBoolean/valueComputed."""
+        text = statement[value_tokens[0].start:value_tokens[-1].end]
+        if len(value_tokens) == 1 and value_tokens[0].kind == 'string':
+            return prefix, value_tokens[0].text[1:-1].replace("''", "'")
+        if re.fullmatch(r'-?\s*\d+(?:\.\d+)?(?:[eE][-+]?\d+)?', text):
+            return prefix + 'Numeric', text.replace(' ', '')
+        if text.upper() in ('TRUE', 'FALSE'):
+            return prefix + 'Boolean', text.lower()
+        return prefix + 'Computed', text
+
+    def parse_column_definition(self, statement, definition):
+        """Turn 'name type [constraints...]' tokens into a <column> element."""
+        attributes = {'name': unquote_identifier(definition[0].text)}
+        constraints = {}
+
+        type_end = 1
+        depth = 0
+        while type_end < len(definition):
+            token = definition[type_end]
+            if depth == 0 and token.keyword in COLUMN_CONSTRAINT_KEYWORDS:
+                break
+            depth += (token.text == '(') - (token.text == ')')
+            type_end += 1
+        if type_end > 1:
+            attributes['type'] = sys.intern(statement[definition[1].start:definition[type_end - 1].end])
+
+        position = type_end
+        while position < len(definition):
+            keyword = definition[position].keyword
+            next_keyword = definition[position + 1].keyword if position + 1 < len(definition) else None
+            if keyword == 'NOT' and next_keyword == 'NULL':
+                constraints['nullable'] = 'false'
+                position += 2
+            elif keyword == 'NULL':
+                position += 1
+            elif keyword == 'PRIMARY' and next_keyword == 'KEY':
+                constraints['primaryKey'] = 'true'
+                constraints['nullable'] = 'false'
+                position += 2
+            elif keyword == 'UNIQUE':
+                constraints['unique'] = 'true'
+                position += 1
+            elif keyword in ('AUTO_INCREMENT', 'AUTOINCREMENT', 'IDENTITY'):
+                attributes['autoIncrement'] = 'true'
+                position += 1
+            elif keyword == 'DEFAULT' and position + 1 < len(definition):
+                if next_keyword == 'NULL':
+                    position += 2
+                    continue
+                value_end = self.expression_end(definition, position + 1)
+                attribute, value = self.literal_attribute('defaultValue', statement, definition[position + 1:value_end])
+                attributes[attribute] = value
+                position = value_end
+            elif keyword == 'REFERENCES' and position + 1 < len(definition):
+                referenced_table = unquote_identifier(definition[position + 1].text)
+                position += 2
+                referenced_columns = ''
+                if position < len(definition) and definition[position].text == '(':
+                    referenced_columns = ', '.join(unquote_identifier(tokens[0].text)
+                                                   for tokens in self.split_list(definition, position) if tokens)
+                    position = self.skip_list(definition, position)
+                constraints['references'] = f"{referenced_table}({referenced_columns})"
+            else:
+                position += 1
+
+        if constraints:
+            return SchemaElement('column', attributes, [SchemaElement('constraints', constraints)])
+        return SchemaElement('column', attributes)
+
+    def apply_table_constraint(self, statement, definition, columns_by_name):
+        """Apply PRIMARY KEY / UNIQUE / FOREIGN KEY table constraints to the columns they name."""
+        keywords = [token.keyword for token in definition]
+        constraint_name = ''
+        if keywords[0] == 'CONSTRAINT' and len(definition) > 1:
+            constraint_name = unquote_identifier(definition[1].text)
+        start = next((index for index, token in enumerate(definition) if token.text == '('), None)
+        if start is None:
+            return
+        names = [unquote_identifier(tokens[0].text) for tokens in self.split_list(definition, start) if tokens]
+
+        if 'PRIMARY' in keywords:
+            updates = {'primaryKey': 'true', 'nullable': 'false'}
+        elif 'FOREIGN' in keywords and 'REFERENCES' in keywords:
+            reference_position = keywords.index('REFERENCES')
+            if reference_position + 1 >= len(definition):
+                return
+            referenced_table = unquote_identifier(definition[reference_position + 1].text)
+            referenced_columns = []
+            if reference_position + 2 < len(definition) and definition[reference_position + 2].text == '(':
+                referenced_columns = [unquote_identifier(tokens[0].text)
+                                      for tokens in self.split_list(definition, reference_position + 2) if tokens]
+            updates = {'references': f"{referenced_table}({', '.join(referenced_columns)})"}
+            if constraint_name:
+                updates['foreignKeyName'] = constraint_name
+        elif 'UNIQUE' in keywords:
+            updates = {'unique': 'true'}
+        else:
+            return
+
+        for name in names:
+            column = columns_by_name.get(name)
+            if column is None:
+                continue
+            constraints = column.getElementsByTagName('constraints')
+            if constraints:
+                constraints[0].attributes.update(updates)
+            else:
+                column.append_child(SchemaElement('constraints', dict(updates)))
+
+    def parse_table_name(self, tokens, position):
+        """Return ({'tableName', ['schemaName']}, position after the name) for a possibly qualified name."""
+        parts = [unquote_identifier(tokens[position].text)] if position < len(tokens) else ['']
+        position += 1
+        while position + 1 < len(tokens) and tokens[position].text == '.':
+            parts.append(unquote_identifier(tokens[position + 1].text))
+            position += 2
+
+        attributes = {'tableName': parts[-1]}
+        if len(parts) > 1:
+            attributes['schemaName'] = parts[-2]
+        if len(parts) > 2:
+            attributes['catalogName'] = parts[-3]
+        return attributes, position
+
+    def skip_keywords(self, tokens, position, keywords):
+        while position < len(tokens) and tokens[position].keyword in keywords:
+            position += 1
+        return position
+
+    def split_list(self, tokens, position):
+        """Split the parenthesized list starting at tokens[position] into its comma-separated items."""
+        return self.split_on_commas(tokens[position + 1:self.skip_list(tokens, position) - 1])
+
+    def skip_list(self, tokens, position):
+        """Return the position after the parenthesized list starting at tokens[position]."""
+        depth = 0
+        while position < len(tokens):
+            depth += (tokens[position].text == '(') - (tokens[position].text == ')')
+            position += 1
+            if depth == 0:
+                break
+        return position
+
+    def split_on_commas(self, tokens):
+        items = [[]]
+        depth = 0
+        for token in tokens:
+            if token.text == ',' and depth == 0:
+                items.append([])
+                continue
+            depth += (token.text == '(') - (token.text == ')')
+            items[-1].append(token)
+        return items
+
+    def expression_end(self, tokens, position):
+        """Return where a DEFAULT expression ends: at the next constraint keyword outside parentheses."""
+        depth = 0
+        while position < len(tokens):
+            token = tokens[position]
+            if depth == 0 and token.keyword in COLUMN_CONSTRAINT_KEYWORDS:
+                break
+            depth += (token.text == '(') - (token.text == ')')
+            position += 1
+        return position
+
+
+def is_formatted_sql_changelog(path):
+    return path.lower().endswith('.sql')
+
+
+def parse_formatted_sql_changelog(path, lines, table_filter=None):
+    """Parse the lines of a formatted SQL changelog into a databaseChangeLog SchemaElement tree."""
+    return FormattedSqlChangelogReader(path, table_filter).read(lines)
@@ -0,0 +1,170 @@
+import os
+import subprocess
+import threading
+
+# Last word of the cat-file header for a spec that names no object (the spec itself may contain spaces)
+MISSING_OBJECT_STATUSES = (b'missing', b'ambiguous')
+
+# Bytes of a raw object id in tree entries, by `git rev-parse --show-object-format`
+OBJECT_ID_SIZES = {'sha1': 20, 'sha256': 32}
+
+# Tree entry modes of a subdirectory and of a submodule commit (gitlink)
+TREE_MODE = b'40000'
+GITLINK_MODE = b'160000'
+
+
+class GitObjectNotFound(FileNotFoundError):
+    """Raised when a revision:path spec does not name an object in the repository."""
+
+
+# One reader per repository and process, used when readers are unpickled in worker processes
+_shared_readers = {}
+
+
+def get_shared_reader(repo_path):
+    """Return this process' long-lived reader for a repository."""
+    key = (os.getpid(), repo_path)
+    if key not in _shared_readers:
+        _shared_readers[key] = GitCatFileBatch(repo_path)
+    return _shared_readers[key]
+
+
+class GitCatFileBatch:
+    """Read blobs and trees through a single long-lived `git cat-file --batch` process.
+
+    exists only needs the object header, so it asks a second `git cat-file --batch-check`
+    process, started on first use, rather than reading the whole object. Pickling a reader
+    (e.g. inside a snapshot sent to a worker process) only keeps the repository path; the
+    receiving process shares one reader per repository.
+    """
+
+    def __init__(self, repo_path='.'):
+        self.repo_path = repo_path
+        self.process = None
+        self.check_process = None  # `git cat-file --batch-check`, see exists
+        self.process_owner_pid = None
+        self.object_id_size = None  # see read_object_id_size
+        self.lock = threading.Lock()
+
+    def __reduce__(self):
+        return get_shared_reader, (self.repo_path,)
+
+    def start(self):
+        """Start the cat-file process if it is not running yet."""
+        self.forget_inherited_processes()
+        if self.process is None:
+            self.process_owner_pid = os.getpid()
+            self.process = self.start_cat_file('--batch')
+        return self
+
+    def start_check(self):
+        """Start the cat-file --batch-check process if it is not running yet."""
+        self.forget_inherited_processes()
+        if self.check_process is None:
+            self.process_owner_pid = os.getpid()
+            self.check_process = self.start_cat_file('--batch-check')
+        return self
+
+    def start_cat_file(self, mode):
+        return subprocess.Popen(['git', '-C', self.repo_path, 'cat-file', mode],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def forget_inherited_processes(self):
+        if self.process_owner_pid != os.getpid():
+            # Inherited through fork: the pipes belong to the parent process, which alone may stop them
+            self.process = None
+            self.check_process = None
+
+    def close(self):
+        """Stop the cat-file processes."""
+        self.forget_inherited_processes()
+        for process in (self.process, self.check_process):
+            if process is not None:
+                process.stdin.close()
+                process.wait()
+                process.stdout.close()
+        self.process = None
+        self.check_process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def read_object(self, object_spec):
+        """Return (object type, content bytes) for any spec git understands, e.g. 'v1.2:db/changelog.xml'."""
+        _, object_type, content = self.read_object_with_id(object_spec)
+        return object_type, content
+
+    def read_object_with_id(self, object_spec):
+        """Return (object id, object type, content bytes) for a spec."""
+        with self.lock:
+            self.start()
+            self.process.stdin.write(object_spec.encode('utf-8') + b'\n')
+            self.process.stdin.flush()
+
+            header = self.process.stdout.readline()
+            if not header:
+                raise RuntimeError(f"git cat-file exited while reading '{object_spec}'")
+            fields = header.split()
+            if fields[-1] in MISSING_OBJECT_STATUSES:
+                # "<spec> missing" or "<spec> ambiguous"
+                raise GitObjectNotFound(f"Not found in git repository '{self.repo_path}': {object_spec}")
+
+            object_type = fields[1].decode('ascii')
+            size = int(fields[2])
+            content = self.process.stdout.read(size)
+            self.process.stdout.read(1)  # trailing newline after the content
+            return fields[0].decode('ascii'), object_type, content
+
+    def resolve_commit(self, revision):
+        """Return the commit id a revision (branch, tag, HEAD~3, ...) points at."""
+        object_id, _, _ = self.read_object_with_id(f"{revision}^{{commit}}")
+        return object_id
+
+    def read_blob(self, revision, path):
+        """Return the content of the file at path in the given revision."""
+        object_type, content = self.read_object(f"{revision}:{path}")
+        if object_type != 'blob':
+            raise GitObjectNotFound(f"Not a file at {revision}: {path}")
+        return content
+
+    def exists(self, revision, path):
+        """Return True if the path names an object in the given revision, without reading the object."""
+        with self.lock:
+            self.start_check()
+            self.check_process.stdin.write(f"{revision}:{path}".encode('utf-8') + b'\n')
+            self.check_process.stdin.flush()
+
+            header = self.check_process.stdout.readline()
+            if not header:
+                raise RuntimeError(f"git cat-file exited while checking '{revision}:{path}'")
+            return header.split()[-1] not in MISSING_OBJECT_STATUSES
+
+    def list_tree(self, revision, path):
+        """Return [(name, is_directory)] for the entries of a directory in the given revision."""
+        object_type, content = self.read_object(f"{revision}:{path}" if path else f"{revision}^{{tree}}")
+        if object_type != 'tree':
+            raise GitObjectNotFound(f"Not a directory at {revision}: {path}")
+
+        # Raw tree format: "<mode> <name>\0<object id>" repeated; submodules are not part of the tree
+        object_id_size = self.read_object_id_size()
+        entries = []
+        position = 0
+        while position < len(content):
+            space = content.index(b' ', position)
+            null = content.index(b'\0', space)
+            mode = content[position:space]
+            if mode != GITLINK_MODE:
+                entries.append((content[space + 1:null].decode('utf-8'), mode == TREE_MODE))
+            position = null + 1 + object_id_size
+        return entries
+
+    def read_object_id_size(self):
+        """Return the size in bytes of the repository's object ids: 20 for SHA-1, 32 for SHA-256."""
+        if self.object_id_size is None:
+            object_format = subprocess.run(['git', '-C', self.repo_path, 'rev-parse', '--show-object-format'],
+                                           check=True, capture_output=True, text=True).stdout.strip()
+            self.object_id_size = OBJECT_ID_SIZES[object_format]
+        return self.object_id_size
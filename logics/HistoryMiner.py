@@ -0,0 +1,139 @@
+import os
+import posixpath
+import subprocess
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from logics.ChangeLogComparator import LiquibaseChangelogComparer
+from logics.ChangelogSnapshot import ChangelogSnapshot
+from logics.ChangelogSource import GitChangelogSource
+from logics.GitBlobReader import GitCatFileBatch, GitObjectNotFound
+from logics.XmlChangelogSerializer import XmlChangelogSerializer
+
+# Most worker processes a history run uses; each holds two snapshots of the changelog at a time
+MAX_HISTORY_WORKERS = 8
+
+
+def diff_revision_pair(task):
+    """Worker entry point: diff two snapshots and return (index, changeset count, migration XML)."""
+    index, prev_snapshot, current_snapshot, comparer_options = task
+    comparer = LiquibaseChangelogComparer(prev_snapshot.label, current_snapshot.label, counter_file=None,
+                                          **comparer_options)
+    changes = comparer.diff_snapshots(prev_snapshot, current_snapshot)
+    return index, len(changes), XmlChangelogSerializer().to_string(changes)
+
+
+class HistoryMiningResult:
+    """Summary of a history run: one migration file per consecutive revision pair."""
+
+    def __init__(self):
+        self.migration_files = []  # (pair index, from revision, to revision, path or None, changeset count)
+        self.skipped_revisions = []  # (revision, error message) of revisions whose changelog could not be parsed
+        self.revision_count = 0
+        self.elapsed_seconds = 0.0
+
+    @property
+    def revisions_per_second(self):
+        return self.revision_count / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+class ChangelogHistoryMiner:
+    """Generate a migration for every consecutive pair of revisions of a changelog.
+
+    Every revision is read through one cat-file process and parsed exactly once; only a
+    sliding window of snapshots is kept while the pairwise diffs run in worker processes
+    (max_workers, by default one per CPU, at most MAX_HISTORY_WORKERS). A revision whose
+    changelog cannot be parsed is skipped like one without the changelog.
+    """
+
+    def __init__(self, repo_path, changelog_path, max_workers=None, comparer_options=None):
+        self.repo_path = repo_path
+        self.changelog_path = posixpath.normpath(changelog_path.replace('\\', '/').lstrip('/'))
+        self.max_workers = min(max_workers or os.cpu_count() or 1, MAX_HISTORY_WORKERS)
+        self.comparer_options = comparer_options or {}
+
+    def list_revisions(self, revision_range):
+        """Return the first-parent commits of the range, oldest first, that touch the changelog's directory.
+
+        For an 'A..B' range, A itself is the first revision so the first pair diffs against it.
+        """
+        changelog_dir = posixpath.dirname(self.changelog_path) or '.'
+        revisions = self.run_git('rev-list', '--reverse', '--first-parent', revision_range, '--', changelog_dir).split()
+
+        if '..' in revision_range and not revision_range.startswith('..'):
+            start_revision = revision_range.split('..')[0]
+            revisions.insert(0, self.run_git('rev-parse', '--verify', f"{start_revision}^{{commit}}").strip())
+        return revisions
+
+    def run_git(self, *args):
+        return subprocess.run(['git', '-C', self.repo_path, *args], check=True, capture_output=True, text=True).stdout
+
+    def iter_snapshots(self, revisions, git_reader, result):
+        """Yield (revision, snapshot) for every revision, parsing each exactly once.
+
+        The snapshot is None for a revision without the changelog, and for one whose changelog
+        fails to parse; those are recorded in result.skipped_revisions.
+        """
+        for revision in revisions:
+            source = GitChangelogSource(git_reader, revision)
+            try:
+                snapshot = ChangelogSnapshot.load(source, self.changelog_path,
+                                                  label=f"{revision}:{self.changelog_path}",
+                                                  table_filter=self.comparer_options.get('table_filter'))
+            except GitObjectNotFound:
+                # The changelog does not exist in this revision; the next pair starts after it
+                snapshot = None
+            except Exception as e:
+                # A malformed changelog (XML, YAML, JSON or SQL) only costs the pairs of its revision
+                result.skipped_revisions.append((revision, str(e)))
+                snapshot = None
+            yield revision, snapshot
+
+    def mine(self, revision_range, output_dir):
+        """Write one migration file per consecutive revision pair into output_dir and return a summary."""
+        os.makedirs(output_dir, exist_ok=True)
+        revisions = self.list_revisions(revision_range)
+        result = HistoryMiningResult()
+        start = time.perf_counter()
+
+        pairs = {}
+        with GitCatFileBatch(self.repo_path) as git_reader, \
+                ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = set()
+            prev_revision, prev_snapshot = None, None
+
+            for index, (revision, snapshot) in enumerate(self.iter_snapshots(revisions, git_reader, result)):
+                result.revision_count += 1
+
+                if prev_snapshot is not None and snapshot is not None:
+                    pairs[index] = (prev_revision, revision)
+                    pending.add(executor.submit(diff_revision_pair,
+                                                (index, prev_snapshot, snapshot, self.comparer_options)))
+
+                # Keep the window small: at most two tasks per worker are in flight
+                if len(pending) >= 2 * self.max_workers:
+                    pending = self.collect(pending, pairs, output_dir, result, wait_for_one=True)
+
+                prev_revision, prev_snapshot = revision, snapshot
+
+            self.collect(pending, pairs, output_dir, result, wait_for_one=False)
+
+        result.migration_files.sort()
+        result.elapsed_seconds = time.perf_counter() - start
+        return result
+
+    def collect(self, pending, pairs, output_dir, result, wait_for_one):
+        """Write finished migrations to disk and return the futures that are still running."""
+        done, not_done = wait(pending, return_when=FIRST_COMPLETED if wait_for_one else ALL_COMPLETED)
+        for future in done:
+            index, change_set_count, migration_xml = future.result()
+            prev_revision, revision = pairs.pop(index)
+
+            path = None
+            if change_set_count:
+                # Revision pairs without schema changes do not get a migration file
+                path = os.path.join(output_dir, f"{index:05d}-{prev_revision[:10]}-{revision[:10]}.xml")
+                with open(path, 'w', encoding='utf-8') as file:
+                    file.write(migration_xml)
+            result.migration_files.append((index, prev_revision, revision, path, change_set_count))
+        return not_done
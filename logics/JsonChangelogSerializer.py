@@ -0,0 +1,18 @@
+import json
+
+from logics.ChangeSerializer import ChangeSerializer
+
+
+class JsonChangelogSerializer(ChangeSerializer):
+    """Write a change list as a Liquibase JSON changelog, one changeSet per line."""
+
+    format_name = 'json'
+    file_extension = '.json'
+
+    def write(self, changes, file):
+        file.write('{"databaseChangeLog": [')
+        separator = '\n  '
+        for change in changes:
+            file.write(separator + json.dumps(self.changeset_mapping(change), ensure_ascii=False))
+            separator = ',\n  '
+        file.write('\n]}\n' if separator != '\n  ' else ']}\n')
@@ -0,0 +1,149 @@
+import json
+
+from logics.ChangeModel import (AddColumnChange, AlterSequenceChange, CreateIndexChange, CreateRoutineChange,
+                                CreateSequenceChange, CreateTableChange, CreateViewChange, DropColumnChange,
+                                DropIndexChange, DropRoutineChange, DropSequenceChange, DropTableChange,
+                                DropViewChange, InsertChange, LoadDataChange, SeedDataChange)
+
+# Name key of the report entries of views, sequences and routines, which belong to no table
+OBJECT_NAME_KEYS = {
+    CreateViewChange: 'viewName',
+    DropViewChange: 'viewName',
+    CreateSequenceChange: 'sequenceName',
+    AlterSequenceChange: 'sequenceName',
+    DropSequenceChange: 'sequenceName',
+    CreateRoutineChange: 'name',
+    DropRoutineChange: 'name',
+}
+
+
+class JsonDiffReport:
+    """Stream a machine-readable report of a change list as JSON.
+
+    Changes are written one per line as they are consumed, so the report of a large diff
+    never has to be held in memory as a whole; a summary with counts and the names of
+    added/dropped tables and changed indexes closes the document.
+    """
+
+    def __init__(self, previous_label='', current_label=''):
+        self.previous_label = previous_label
+        self.current_label = current_label
+
+    def write(self, changes, file):
+        """Write the report for the changes to a text file object and return the summary dict."""
+        summary = {
+            'changesets': 0,
+            'tables_added': 0,
+            'tables_dropped': 0,
+            'columns_added': 0,
+            'columns_dropped': 0,
+            'indexes_created': 0,
+            'indexes_dropped': 0,
+            'rows_inserted': 0,
+            'rows_updated': 0,
+            'rows_deleted': 0,
+            'views_created': 0,
+            'views_replaced': 0,
+            'views_dropped': 0,
+            'sequences_created': 0,
+            'sequences_altered': 0,
+            'sequences_dropped': 0,
+            'routines_created': 0,
+            'routines_replaced': 0,
+            'routines_dropped': 0,
+        }
+        names = {
+            'added_tables': [],
+            'dropped_tables': [],
+            'tables_with_column_changes': [],
+            'created_indexes': [],
+            'dropped_indexes': [],
+        }
+
+        file.write('{\n')
+        file.write(f'  "previous": {json.dumps(self.previous_label)},\n')
+        file.write(f'  "current": {json.dumps(self.current_label)},\n')
+        file.write('  "changes": [')
+        separator = '\n    '
+        for change in changes:
+            file.write(separator + json.dumps(self.describe(change), ensure_ascii=False))
+            separator = ',\n    '
+            self.count(change, summary, names)
+        file.write('\n  ],\n')
+
+        summary.update(names)
+        file.write(f'  "summary": {json.dumps(summary, ensure_ascii=False)}\n')
+        file.write('}\n')
+        return summary
+
+    def write_file(self, changes, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            return self.write(changes, file)
+
+    def describe(self, change):
+        """Return the JSON-ready dict of one change."""
+        entry = {'id': change.changeset_id, 'change': change.change_type, **change.qualifiers,
+                 OBJECT_NAME_KEYS.get(type(change), 'tableName'): change.table_name}
+        if isinstance(change, AddColumnChange):
+            entry['columns'] = [column.getAttribute('name') for column in change.columns]
+        elif isinstance(change, DropColumnChange):
+            entry['columns'] = list(change.column_names)
+        elif isinstance(change, CreateTableChange):
+            entry['columns'] = [column.getAttribute('name') for column in change.table.getElementsByTagName('column')]
+        elif isinstance(change, (CreateIndexChange, DropIndexChange)):
+            entry['indexName'] = change.index_name
+        elif isinstance(change, (InsertChange, SeedDataChange)):
+            entry['rows'] = len(change.rows)
+        elif isinstance(change, LoadDataChange):
+            entry['rows'] = change.row_count
+            entry['file'] = change.file
+        elif isinstance(change, (CreateViewChange, CreateRoutineChange)):
+            entry['replace'] = change.replace
+        elif isinstance(change, AlterSequenceChange):
+            entry['attributes'] = dict(change.attributes)
+        return entry
+
+    def count(self, change, summary, names):
+        summary['changesets'] += 1
+        if isinstance(change, CreateTableChange):
+            summary['tables_added'] += 1
+            names['added_tables'].append(qualified_name(change))
+        elif isinstance(change, DropTableChange):
+            summary['tables_dropped'] += 1
+            names['dropped_tables'].append(qualified_name(change))
+        elif isinstance(change, (AddColumnChange, DropColumnChange)):
+            if isinstance(change, AddColumnChange):
+                summary['columns_added'] += len(change.columns)
+            else:
+                summary['columns_dropped'] += len(change.column_names)
+            if qualified_name(change) not in names['tables_with_column_changes']:
+                names['tables_with_column_changes'].append(qualified_name(change))
+        elif isinstance(change, CreateIndexChange):
+            summary['indexes_created'] += 1
+            names['created_indexes'].append(change.index_name)
+        elif isinstance(change, DropIndexChange):
+            summary['indexes_dropped'] += 1
+            names['dropped_indexes'].append(change.index_name)
+        elif isinstance(change, (InsertChange, LoadDataChange)):
+            summary['rows_inserted'] += change.row_count if isinstance(change, LoadDataChange) else len(change.rows)
+        elif isinstance(change, SeedDataChange):
+            summary[{'insert': 'rows_inserted', 'update': 'rows_updated', 'delete': 'rows_deleted'}[change.kind]] += \
+                len(change.rows)
+        elif isinstance(change, (CreateViewChange, CreateRoutineChange)):
+            kind = 'views' if isinstance(change, CreateViewChange) else 'routines'
+            summary[f"{kind}_{'replaced' if change.replace else 'created'}"] += 1
+        elif isinstance(change, DropViewChange):
+            summary['views_dropped'] += 1
+        elif isinstance(change, DropRoutineChange):
+            summary['routines_dropped'] += 1
+        elif isinstance(change, CreateSequenceChange):
+            summary['sequences_created'] += 1
+        elif isinstance(change, AlterSequenceChange):
+            summary['sequences_altered'] += 1
+        elif isinstance(change, DropSequenceChange):
+            summary['sequences_dropped'] += 1
+
+
+def qualified_name(change):
+    """Return the change's object name with its catalog and schema in front, e.g. 'accounting.m_loan'."""
+    return '.'.join([*change.qualifiers.values(), change.table_name])
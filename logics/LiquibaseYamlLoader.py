@@ -0,0 +1,242 @@
+import json
+import re
+
+# Block scalar indicators: literal (|) or folded (>), optionally with a chomping indicator
+BLOCK_SCALAR_PATTERN = re.compile(r'([|>])([+-]?)$')
+
+# A mapping key followed by ':' and either the end of the line or a space
+MAPPING_KEY_PATTERN = re.compile(r'''("(?:[^"\\]|\\.)*"|'(?:[^']|'')*'|[^\s'"#][^:#]*?)\s*:(?:\s+|$)''')
+
+# ' #' starts a comment outside of quotes
+COMMENT_PATTERN = re.compile(r'''("(?:[^"\\]|\\.)*"|'(?:[^']|'')*'|[^'"#])*?(\s+#.*)?$''')
+
+
+class YamlSyntaxError(ValueError):
+    """Raised for YAML the restricted loader does not understand."""
+
+
+class LiquibaseYamlLoader:
+    """Restricted YAML loader for the subset Liquibase changelogs use.
+
+    Supports block mappings and sequences, plain, single- and double-quoted scalars, literal
+    and folded block scalars, single-line flow sequences and mappings of scalars, and
+    comments. Anchors, aliases, tags and nested or multi-line flow collections are rejected
+    with a YamlSyntaxError. Scalars are returned as strings (null and ~ as None, booleans
+    as 'true'/'false'), which is what the XML form of the same changelog would carry.
+
+    Lines are scanned once, in order, without building a token stream first.
+    """
+
+    def __init__(self, text):
+        self.lines = text.splitlines()
+        self.position = 0
+        # (position, result) of the last peek; most lines are peeked more than once
+        self.peeked = (None, None)
+
+    def load(self):
+        """Return the document as nested dicts, lists and strings; an empty document is None."""
+        line = self.peek()
+        if line is None:
+            return None
+        value = self.parse_block(line[0])
+        if self.peek() is not None:
+            raise self.error("unexpected content after the document")
+        return value
+
+    def peek(self):
+        """Return (indent, content) of the next significant line without consuming it, or None at the end."""
+        if self.peeked[0] == self.position:
+            return self.peeked[1]
+        while self.position < len(self.lines):
+            raw = self.lines[self.position]
+            stripped = raw.strip()
+            if not stripped or stripped.startswith('#') or stripped in ('---', '...') or stripped.startswith('%'):
+                self.position += 1
+                continue
+            if '\t' in raw[:len(raw) - len(raw.lstrip())]:
+                raise self.error("tabs are not allowed in indentation")
+            line = len(raw) - len(raw.lstrip(' ')), strip_comment(stripped)
+            self.peeked = (self.position, line)
+            return line
+        return None
+
+    def parse_block(self, indent):
+        line = self.peek()
+        if is_sequence_item(line[1]):
+            return self.parse_sequence(indent)
+        if MAPPING_KEY_PATTERN.match(line[1]):
+            return self.parse_mapping(indent)
+        self.position += 1
+        return self.parse_scalar(line[1])
+
+    def parse_sequence(self, indent):
+        items = []
+        while True:
+            line = self.peek()
+            if line is None or line[0] != indent or not is_sequence_item(line[1]):
+                return items
+
+            rest = line[1][1:].lstrip(' ')
+            if not rest:
+                self.position += 1
+                items.append(self.parse_nested(indent))
+            elif MAPPING_KEY_PATTERN.match(rest) or is_sequence_item(rest):
+                # "- key: value" starts a mapping indented to where the key is
+                item_indent = indent + len(line[1]) - len(rest)
+                self.lines[self.position] = ' ' * item_indent + rest
+                self.peeked = (None, None)
+                items.append(self.parse_block(item_indent))
+            else:
+                self.position += 1
+                items.append(self.parse_value(rest, indent))
+
+    def parse_mapping(self, indent):
+        mapping = {}
+        while True:
+            line = self.peek()
+            if line is None or line[0] != indent or is_sequence_item(line[1]):
+                return mapping
+
+            match = MAPPING_KEY_PATTERN.match(line[1])
+            if match is None:
+                raise self.error(f"expected 'key: value', got '{line[1]}'")
+            key = self.parse_scalar(match.group(1))
+            rest = line[1][match.end():]
+            self.position += 1
+
+            if not rest:
+                next_line = self.peek()
+                # A sequence may sit at the same indent as its key
+                if next_line is not None and next_line[0] == indent and is_sequence_item(next_line[1]):
+                    mapping[key] = self.parse_sequence(indent)
+                else:
+                    mapping[key] = self.parse_nested(indent)
+            else:
+                mapping[key] = self.parse_value(rest, indent)
+
+    def parse_nested(self, parent_indent):
+        """Parse the block indented below a key or dash, or return None if there is none."""
+        line = self.peek()
+        if line is None or line[0] <= parent_indent:
+            return None
+        return self.parse_block(line[0])
+
+    def parse_value(self, text, parent_indent):
+        block_scalar = BLOCK_SCALAR_PATTERN.match(text)
+        if block_scalar:
+            return self.parse_block_scalar(block_scalar.group(1), block_scalar.group(2), parent_indent)
+        return self.parse_scalar(text)
+
+    def parse_block_scalar(self, style, chomping, parent_indent):
+        """Read the raw lines of a literal or folded block scalar."""
+        block_lines = []
+        block_indent = None
+        while self.position < len(self.lines):
+            raw = self.lines[self.position]
+            if raw.strip():
+                indent = len(raw) - len(raw.lstrip(' '))
+                if indent <= parent_indent:
+                    break
+                if block_indent is None:
+                    block_indent = indent
+                elif indent < block_indent:
+                    break
+                block_lines.append(raw[block_indent:])
+            else:
+                block_lines.append('')
+            self.position += 1
+
+        trailing_blank_lines = 0
+        while block_lines and not block_lines[-1]:
+            block_lines.pop()
+            trailing_blank_lines += 1
+
+        if style == '|':
+            text = '\n'.join(block_lines)
+        else:
+            # Folded: single line breaks become spaces, blank lines become line breaks
+            text = re.sub(r'(?<!\n)\n(?!\n)', ' ', '\n'.join(block_lines)).replace('\n\n', '\n')
+
+        if not text or chomping == '-':
+            return text
+        if chomping == '+':
+            return text + '\n' * (trailing_blank_lines + 1)
+        return text + '\n'
+
+    def parse_scalar(self, text):
+        if text.startswith(('&', '*', '!')):
+            raise self.error(f"anchors, aliases and tags are not supported: '{text}'")
+        if text.startswith('"'):
+            try:
+                return json.loads(text)
+            except ValueError:
+                raise self.error(f"invalid double-quoted scalar: {text}") from None
+        if text.startswith("'"):
+            if len(text) < 2 or not text.endswith("'"):
+                raise self.error(f"invalid single-quoted scalar: {text}")
+            return text[1:-1].replace("''", "'")
+        if text.startswith('['):
+            if not text.endswith(']'):
+                raise self.error("multi-line flow sequences are not supported")
+            return [self.parse_scalar(item.strip()) for item in split_flow_items(text[1:-1]) if item.strip()]
+        if text.startswith('{'):
+            if not text.endswith('}'):
+                raise self.error("multi-line flow mappings are not supported")
+            mapping = {}
+            for item in split_flow_items(text[1:-1]):
+                key, separator, value = item.partition(':')
+                if not separator:
+                    raise self.error(f"expected 'key: value' in flow mapping, got '{item.strip()}'")
+                mapping[self.parse_scalar(key.strip())] = self.parse_scalar(value.strip()) if value.strip() else None
+            return mapping
+        if text in ('null', 'Null', 'NULL', '~'):
+            return None
+        if text in ('true', 'True', 'TRUE', 'false', 'False', 'FALSE'):
+            return text.lower()
+        return text
+
+    def error(self, message):
+        return YamlSyntaxError(f"line {self.position + 1}: {message}")
+
+
+def is_sequence_item(content):
+    return content == '-' or content.startswith('- ')
+
+
+def strip_comment(content):
+    if '#' not in content:
+        return content
+    match = COMMENT_PATTERN.match(content)
+    if match and match.group(2):
+        return content[:match.start(2)]
+    return content
+
+
+def split_flow_items(text):
+    """Split the inside of a flow sequence on commas outside of quotes."""
+    items = []
+    current = []
+    quote = None
+    for char in text:
+        if quote:
+            current.append(char)
+            if char == quote:
+                quote = None
+        elif char in '[{':
+            raise YamlSyntaxError("nested flow collections are not supported")
+        elif char in '"\'':
+            quote = char
+            current.append(char)
+        elif char == ',':
+            items.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    if ''.join(current).strip():
+        items.append(''.join(current))
+    return items
+
+
+def load_yaml(text):
+    """Parse a Liquibase YAML changelog's text into nested dicts, lists and strings."""
+    return LiquibaseYamlLoader(text).load()
@@ -0,0 +1,54 @@
+import gc
+import os
+import time
+import tracemalloc
+from xml.dom import minidom
+
+from logics.XmlChangelogReader import parse_xml_changelog
+
+
+def measure_changelog_memory(path):
+    """Measure the memory an XML changelog takes as a minidom document and as SchemaElements.
+
+    Each representation is built on its own while tracemalloc traces allocations, and is kept
+    alive until its size has been read, so the figures are what a loaded snapshot holds (not
+    the peak while parsing). Returns a dict with the totals, the bytes per <column> element and
+    how many times smaller the element model is.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+
+    dom_bytes, dom_seconds, columns = traced_size(lambda: minidom.parseString(data),
+                                                  lambda dom: len(dom.getElementsByTagName('column')))
+    model_bytes, model_seconds, _ = traced_size(
+        lambda: parse_xml_changelog(data, span_path=os.path.abspath(path)), lambda root: None)
+
+    per_column = max(columns, 1)
+    return {
+        'changelog': path,
+        'columns': columns,
+        'dom_bytes': dom_bytes,
+        'model_bytes': model_bytes,
+        'dom_bytes_per_column': round(dom_bytes / per_column, 1),
+        'model_bytes_per_column': round(model_bytes / per_column, 1),
+        'reduction': round(dom_bytes / model_bytes, 1) if model_bytes else None,
+        'dom_seconds': round(dom_seconds, 3),
+        'model_seconds': round(model_seconds, 3),
+    }
+
+
+def traced_size(build, inspect):
+    """Return (bytes still allocated by build(), seconds it took, inspect(result))."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        result = build()
+        elapsed = time.perf_counter() - started
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    # Inspected after tracing stopped, so walking the result is not counted
+    return size, elapsed, inspect(result)
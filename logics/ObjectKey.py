@@ -0,0 +1,37 @@
+import sys
+
+# Attributes qualifying an object name, outermost first
+QUALIFIER_ATTRIBUTES = ('catalogName', 'schemaName')
+
+# Interned keys by themselves, so equal keys are one shared tuple
+_keys = {}
+
+
+def qualified_key(catalog, schema, name):
+    """Return the interned (catalog, schema, name) key; parts that are not given are ''."""
+    key = (catalog, schema, name)
+    interned = _keys.get(key)
+    if interned is None:
+        interned = _keys[key] = (sys.intern(catalog), sys.intern(schema), sys.intern(name))
+    return interned
+
+
+def object_key(element, name_attribute='tableName'):
+    """Return the interned (catalogName, schemaName, name) key of the object an element names."""
+    return qualified_key(element.getAttribute('catalogName'), element.getAttribute('schemaName'),
+                         element.getAttribute(name_attribute))
+
+
+def schema_key(key):
+    """Return the interned (catalog, schema, '') key of the schema an object key belongs to."""
+    return qualified_key(key[0], key[1], '')
+
+
+def key_qualifiers(key):
+    """Return the catalogName/schemaName attributes of a key, leaving out parts that are not given."""
+    return {name: value for name, value in zip(QUALIFIER_ATTRIBUTES, key) if value}
+
+
+def format_key(key):
+    """Return a key as 'catalog.schema.name', leaving out parts that are not given."""
+    return '.'.join(part for part in key if part)
@@ -0,0 +1,181 @@
+import hashlib
+from xml.dom import Node
+
+# Children of elements that have none; shared, so leaf elements such as columns carry no list of their own
+NO_CHILDREN = ()
+
+
+class SchemaElement:
+    """Lightweight, picklable copy of a changelog element.
+
+    It mirrors the read-only part of the minidom Element API the comparer relies on
+    (tagName, getAttribute, hasAttribute, getElementsByTagName), so a snapshot can be
+    parsed once and handed to other processes without dragging a whole DOM along.
+
+    Instances have __slots__ and elements without children share NO_CHILDREN, so a column
+    costs little more than its attribute dict; the readers intern tag and attribute names
+    and values, so repeated names and type strings are stored once. Add children with
+    append_child/extend_children rather than mutating children in place.
+    """
+
+    __slots__ = ('tagName', 'attributes', 'children', '_text', '_fingerprint', '_definition_fingerprint',
+                 'span', 'text_source')
+
+    nodeType = Node.ELEMENT_NODE
+    ELEMENT_NODE = Node.ELEMENT_NODE
+
+    def __init__(self, tag_name, attributes=None, children=None, text=''):
+        self.tagName = tag_name
+        self.attributes = attributes or {}
+        self.children = children or NO_CHILDREN
+        self._text = text
+        self._fingerprint = None
+        # Digest of the normalized definition, see definition_fingerprint
+        self._definition_fingerprint = None
+        # (file path, start, end, file stamp) byte range of the element's markup, when read from a local XML
+        # file; elements read from a SnapshotHistoryStore carry (markup bytes, start, end) instead
+        self.span = None
+        # (file path, offset, length, digest) of the markup of an element whose text is read on first use
+        self.text_source = None
+
+    @property
+    def text(self):
+        if self._text is None:
+            # Imported here: the XML reader builds SchemaElements itself
+            from logics.XmlChangelogReader import read_element_text
+            self._text = read_element_text(self.text_source)
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        self._text = text
+
+    def set_text_source(self, text_source):
+        """Leave the text unloaded until it is first read, then load it from text_source."""
+        self.text_source = text_source
+        self._text = None
+
+    def append_child(self, child):
+        if self.children:
+            self.children.append(child)
+        else:
+            self.children = [child]
+
+    def extend_children(self, children):
+        if self.children:
+            self.children.extend(children)
+        else:
+            self.children = list(children)
+
+    @classmethod
+    def from_dom(cls, element):
+        """Copy a minidom element and its element children; whitespace-only text is dropped.
+
+        Elements read from YAML/JSON changelogs already are SchemaElements and are returned as they are.
+        """
+        if isinstance(element, cls):
+            return element
+        children = []
+        text_parts = []
+        for node in element.childNodes:
+            if node.nodeType == Node.ELEMENT_NODE:
+                children.append(cls.from_dom(node))
+            elif node.nodeType in (Node.TEXT_NODE, Node.CDATA_SECTION_NODE):
+                text_parts.append(node.data)
+
+        text = ''.join(text_parts)
+        return cls(element.tagName, dict(element.attributes.items()), children, text if text.strip() else '')
+
+    @property
+    def childNodes(self):
+        return self.children
+
+    def getAttribute(self, name):
+        return self.attributes.get(name, '')
+
+    def hasAttribute(self, name):
+        return name in self.attributes
+
+    def getElementsByTagName(self, tag_name):
+        """Return all descendant elements with the tag name ('*' for all), in document order."""
+        found = []
+        for child in self.children:
+            if tag_name == '*' or child.tagName == tag_name:
+                found.append(child)
+            found.extend(child.getElementsByTagName(tag_name))
+        return found
+
+    def fingerprint(self):
+        """Return a digest of the element's canonical form: tag, sorted attributes, text and children.
+
+        Computed once per element; equal definitions have equal fingerprints regardless of
+        attribute order or formatting in the source file (except for unloaded text, see
+        text_source, which is hashed as written).
+        """
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(self.tagName.encode('utf-8'))
+            for name in sorted(self.attributes):
+                digest.update(f"\x1f{name}\x1e{self.attributes[name]}".encode('utf-8'))
+            if self._text is None:
+                # Unloaded text is represented by the digest of its markup, which leaves it unloaded
+                digest.update(b'\x1d' + self.text_source[3])
+            else:
+                digest.update(f"\x1d{self._text.strip()}".encode('utf-8'))
+            for child in self.children:
+                digest.update(child.fingerprint())
+            digest.update(b'\x1c')
+            self._fingerprint = digest.digest()
+        return self._fingerprint
+
+    def definition_fingerprint(self):
+        """Return a digest of the element as a database object definition, computed once.
+
+        Unlike fingerprint, the text is compared with whitespace collapsed, case folded and a
+        trailing ';' dropped, and replaceIfExists is left out, so a view or routine that was
+        only reformatted or re-created with replaceIfExists keeps its definition fingerprint.
+        """
+        if self._definition_fingerprint is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(self.tagName.encode('utf-8'))
+            for name in sorted(self.attributes):
+                if name != 'replaceIfExists':
+                    digest.update(f"\x1f{name}\x1e{self.attributes[name]}".encode('utf-8'))
+            digest.update(f"\x1d{normalize_definition(self.text)}".encode('utf-8'))
+            for child in self.children:
+                digest.update(child.definition_fingerprint())
+            digest.update(b'\x1c')
+            self._definition_fingerprint = digest.digest()
+        return self._definition_fingerprint
+
+    def with_attributes(self, **attributes):
+        """Return a copy with some attributes set; children are shared and unloaded text stays unloaded."""
+        element = SchemaElement(self.tagName, dict(self.attributes, **attributes), self.children, self._text)
+        if self._text is None:
+            element.set_text_source(self.text_source)
+        return element
+
+    def detached(self):
+        """Return the element without references to its changelog file: text loaded, no span.
+
+        Only change elements carry those, so children are shared as they are.
+        """
+        if self.span is None and self.text_source is None:
+            return self
+        return SchemaElement(self.tagName, self.attributes, self.children, self.text)
+
+    def to_dom(self, document):
+        """Create a minidom element for this element and its children in the given document."""
+        element = document.createElement(self.tagName)
+        for name, value in self.attributes.items():
+            element.setAttribute(name, value)
+        if self.text:
+            element.appendChild(document.createTextNode(self.text))
+        for child in self.children:
+            element.appendChild(child.to_dom(document))
+        return element
+
+
+def normalize_definition(text):
+    """Return SQL text with whitespace runs collapsed, case folded and any trailing ';' removed."""
+    return ' '.join(text.casefold().split()).rstrip(';').rstrip()
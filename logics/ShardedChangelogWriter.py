@@ -0,0 +1,252 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from xml.dom import minidom
+from xml.sax.saxutils import quoteattr
+
+from logics.ObjectKey import format_key, qualified_key
+from logics.XmlChangelogSerializer import ROOT_ATTRIBUTES, SourceMarkup, XmlChangelogSerializer
+
+# Buffer size used for every shard writer, so large shards are flushed in chunks
+WRITE_BUFFER_SIZE = 64 * 1024
+
+SHARD_BY_TABLE = 'table'
+SHARD_BY_CHANGESET = 'changeset'
+
+# Changes to objects other than tables and the group they are written in: views and routines are dropped
+# before the tables they read change and created after them, sequences are created before the tables whose
+# defaults use them and dropped after those tables are gone
+DROP_VIEW_AND_ROUTINE_CHANGE_TAGS = ('dropView', 'dropProcedure', 'dropFunction')
+SEQUENCE_CHANGE_TAGS = ('createSequence', 'alterSequence')
+VIEW_AND_ROUTINE_CHANGE_TAGS = ('createView', 'createProcedure', 'createFunction')
+DROP_SEQUENCE_CHANGE_TAGS = ('dropSequence',)
+# Changes whose elements can hold foreign key constraints, the only ones looked into for table dependencies
+FOREIGN_KEY_CHANGE_TAGS = ('createTable', 'addColumn')
+
+
+class CountingWriter:
+    """Minimal file wrapper that counts the characters written through it."""
+
+    def __init__(self, file):
+        self.file = file
+        self.count = 0
+
+    def write(self, text):
+        self.count += len(text)
+        self.file.write(text)
+
+
+class ShardedChangelogWriter:
+    """Write the change records of a migration into XML shard files plus a master changelog.
+
+    Each change is streamed into its shard as one changeSet (see XmlChangelogSerializer.write),
+    so the migration is never built as a whole document. Changes are grouped per table
+    (shard_by='table') or kept as one ordered stream (shard_by='changeset'). Each group is then split by max_changesets_per_shard and rolled
+    over to a new file whenever max_bytes_per_shard is exceeded. The master changelog
+    includes the shards in dependency order: dropped views and routines first, new and
+    changed sequences, then referenced tables before the tables pointing at them, new and
+    changed views and routines, dropped tables and dropped sequences last.
+    """
+
+    def __init__(self, output_dir, shard_by=SHARD_BY_TABLE, max_changesets_per_shard=None,
+                 max_bytes_per_shard=None, max_workers=None, master_file_name='changelog-master.xml',
+                 serializer=None):
+        if shard_by not in (SHARD_BY_TABLE, SHARD_BY_CHANGESET):
+            raise ValueError(f"Unknown shard mode '{shard_by}', expected '{SHARD_BY_TABLE}' or '{SHARD_BY_CHANGESET}'")
+
+        self.output_dir = output_dir
+        self.shard_by = shard_by
+        self.max_changesets_per_shard = max_changesets_per_shard
+        self.max_bytes_per_shard = max_bytes_per_shard
+        self.max_workers = max_workers
+        self.master_file_name = master_file_name
+        self.serializer = serializer or XmlChangelogSerializer()
+
+    def write(self, changes):
+        """Write all shards of the change records concurrently and return the master changelog path."""
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        root_attributes = list(ROOT_ATTRIBUTES)
+        groups = self.plan_shards(changes)
+
+        # Each group is written by its own worker; a group may roll over into several files
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.write_group, index, name, group, root_attributes)
+                       for index, (name, group) in enumerate(groups, start=1)]
+            shard_files = [file_name for future in futures for file_name in future.result()]
+
+        master_path = os.path.join(self.output_dir, self.master_file_name)
+        self.write_master_changelog(master_path, shard_files, root_attributes)
+        return master_path
+
+    def plan_shards(self, changes):
+        """Group changes into ordered (name, changes) shards before anything is written."""
+        if self.shard_by == SHARD_BY_TABLE:
+            groups = self.group_by_table(changes)
+        else:
+            groups = [('changesets', list(changes))] if changes else []
+
+        if not self.max_changesets_per_shard:
+            return groups
+
+        # Split every group into parts of at most max_changesets_per_shard changesets
+        limit = self.max_changesets_per_shard
+        split_groups = []
+        for name, group in groups:
+            if len(group) <= limit:
+                split_groups.append((name, group))
+                continue
+            for part, start in enumerate(range(0, len(group), limit), start=1):
+                split_groups.append((f"{name}-part{part}", group[start:start + limit]))
+        return split_groups
+
+    def group_by_table(self, changes):
+        """Group changes per table and order the groups by their foreign key dependencies."""
+        table_groups = {}
+        drop_group = []
+        drop_view_group = []
+        sequence_group = []
+        view_group = []
+        drop_sequence_group = []
+        references = {}
+
+        for change in changes:
+            change_type = change.change_type
+            if change_type == 'dropTable':
+                # Dropped tables go last so nothing created in this migration still needs them
+                drop_group.append(change)
+                continue
+            if change_type in DROP_VIEW_AND_ROUTINE_CHANGE_TAGS:
+                drop_view_group.append(change)
+                continue
+            if change_type in SEQUENCE_CHANGE_TAGS:
+                sequence_group.append(change)
+                continue
+            if change_type in VIEW_AND_ROUTINE_CHANGE_TAGS:
+                view_group.append(change)
+                continue
+            if change_type in DROP_SEQUENCE_CHANGE_TAGS:
+                drop_sequence_group.append(change)
+                continue
+
+            # Tables of the same name in different schemas get shards of their own
+            table_name = format_key(qualified_key(change.qualifiers.get('catalogName', ''),
+                                                  change.qualifiers.get('schemaName', ''), change.table_name))
+            table_groups.setdefault(table_name, []).append(change)
+            references.setdefault(table_name, set()).update(self.referenced_tables(change))
+
+        groups = [('drop-views-and-routines', drop_view_group), ('sequences', sequence_group)]
+        groups.extend((table_name, table_groups[table_name])
+                      for table_name in self.dependency_order(list(table_groups), references))
+        groups.extend([('views-and-routines', view_group), ('drop-tables', drop_group),
+                       ('drop-sequences', drop_sequence_group)])
+        return [(name, group) for name, group in groups if group]
+
+    def dependency_order(self, table_names, references):
+        """Topologically sort tables so referenced tables come first, keeping generation order otherwise."""
+        ordered = []
+        visited = set()
+        in_progress = set()
+
+        def visit(table_name):
+            if table_name in visited or table_name in in_progress:
+                # Already placed, or a reference cycle: keep generation order
+                return
+            in_progress.add(table_name)
+            for referenced in sorted(references.get(table_name, ())):
+                if referenced in references and referenced != table_name:
+                    visit(referenced)
+            in_progress.discard(table_name)
+            visited.add(table_name)
+            ordered.append(table_name)
+
+        for table_name in table_names:
+            visit(table_name)
+        return ordered
+
+    def referenced_tables(self, change):
+        """Return the names of the tables a change points at through foreign keys."""
+        referenced = set()
+        if change.change_type not in FOREIGN_KEY_CHANGE_TAGS:
+            return referenced
+        for element in self.serializer.change_elements(change):
+            for constraints in element.getElementsByTagName('constraints'):
+                if constraints.getAttribute('referencedTableName'):
+                    referenced.add(referenced_table_name(constraints))
+                elif constraints.getAttribute('references'):
+                    # references="other_table(id)" or "schema.other_table(id)"
+                    referenced.add(constraints.getAttribute('references').split('(')[0].strip())
+        return referenced
+
+    def write_group(self, index, name, changes, root_attributes):
+        """Stream one group of changes to disk and return the shard file names that were written."""
+        base_name = f"{index:03d}-{self.safe_file_name(name)}"
+        file_names = []
+        part = 0
+        file = None
+        written = 0
+        # Used only to create the changeSet elements; each worker has its own
+        document = minidom.Document()
+
+        try:
+            with SourceMarkup() as source_markup:
+                for change in changes:
+                    if file is None or (self.max_bytes_per_shard and written >= self.max_bytes_per_shard):
+                        # Roll over to the next file once the current one reached the size cap
+                        if file is not None:
+                            self.write_footer(file)
+                            file.close()
+                        part += 1
+                        file_name = f"{base_name}.xml" if part == 1 else f"{base_name}-{part}.xml"
+                        file_names.append(file_name)
+                        file = open(os.path.join(self.output_dir, file_name), 'w', encoding='utf-8',
+                                    buffering=WRITE_BUFFER_SIZE)
+                        self.write_header(file, root_attributes)
+                        written = 0
+
+                    counting_file = CountingWriter(file)
+                    self.serializer.write_changeset(document, change, counting_file, source_markup)
+                    written += counting_file.count
+        finally:
+            if file is not None:
+                self.write_footer(file)
+                file.close()
+
+        # Rename the first file when the group rolled over, so the parts sort and read consistently
+        if len(file_names) > 1:
+            first_name = f"{base_name}-1.xml"
+            os.replace(os.path.join(self.output_dir, file_names[0]), os.path.join(self.output_dir, first_name))
+            file_names[0] = first_name
+
+        return file_names
+
+    def write_master_changelog(self, master_path, shard_files, root_attributes):
+        """Write the master changelog including every shard in order."""
+        with open(master_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as file:
+            self.write_header(file, root_attributes)
+            for file_name in shard_files:
+                file.write(f'  <include file={quoteattr(file_name)} relativeToChangelogFile="true"/>\n')
+            self.write_footer(file)
+
+    def write_header(self, file, root_attributes):
+        """Write the XML declaration and the opening databaseChangeLog tag."""
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        file.write('<databaseChangeLog')
+        for name, value in root_attributes:
+            file.write(f' {name}={quoteattr(value)}')
+        file.write('>\n')
+
+    def write_footer(self, file):
+        """Close the databaseChangeLog root element."""
+        file.write('</databaseChangeLog>\n')
+
+    def safe_file_name(self, name):
+        """Turn a table or group name into something usable as a file name."""
+        return re.sub(r'[^A-Za-z0-9_.-]+', '_', name) or 'unnamed'
+
+
+def referenced_table_name(element):
+    """Return the table a foreign key points at, prefixed with its catalog and schema like the shard names."""
+    return format_key(qualified_key(element.getAttribute('referencedTableCatalogName'),
+                                    element.getAttribute('referencedTableSchemaName'),
+                                    element.getAttribute('referencedTableName')))
@@ -0,0 +1,31 @@
+from collections import OrderedDict
+
+
+class SnapshotCache:
+    """In-process LRU cache of parsed snapshots.
+
+    Entries are keyed by the source's cache key of the root changelog (absolute path, or
+    repository + commit id + path) and dropped when any parsed changelog file changed.
+    """
+
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        """Return the cached snapshot for key, or None if there is none or it is stale."""
+        snapshot = self.entries.get(key)
+        if snapshot is None:
+            return None
+        if snapshot.is_stale():
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+        return snapshot
+
+    def put(self, key, snapshot):
+        self.entries[key] = snapshot
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
@@ -0,0 +1,326 @@
+import hashlib
+import io
+import json
+import os
+import pickle
+import sqlite3
+import zlib
+from contextlib import contextmanager
+
+from logics.ChangelogSnapshot import ChangelogSnapshot, seed_data_digest
+from logics.ObjectKey import object_key, qualified_key
+
+# Prefix of changelog specs naming a version saved in a SnapshotHistoryStore, e.g. stored:1.8.0
+STORED_SPEC_PREFIX = 'stored:'
+
+# Layout version, kept in PRAGMA user_version; a store written with another layout is refused
+HISTORY_STORE_VERSION = 1
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versions (
+    name TEXT PRIMARY KEY,
+    label TEXT NOT NULL,
+    includes_data INTEGER NOT NULL,
+    manifest BLOB NOT NULL
+);
+"""
+
+# Groups of a version's manifest. Each entry is one string: the key fields, KEY_END, then the
+# hash of the element and, for load_data, the hash of the CSV content ('' when missing) and the CSV path:
+#   tables, inserts, views, sequences: catalog, schema, name
+#   indexes: catalog, schema, table, indexName
+#   routines: tag, catalog, schema, name
+#   load_data: catalog, schema, table
+MANIFEST_GROUPS = ('tables', 'indexes', 'inserts', 'views', 'sequences', 'routines', 'load_data')
+FIELD_SEPARATOR = '\x1f'
+KEY_END = '\x1e'
+
+# Hashes looked up per query when objects are read back
+FETCH_BATCH_SIZE = 500
+
+
+def is_stored_spec(spec):
+    return spec.startswith(STORED_SPEC_PREFIX)
+
+
+def stored_version_name(spec):
+    return spec[len(STORED_SPEC_PREFIX):]
+
+
+class SnapshotHistoryStore:
+    """Parsed snapshots of many changelog versions, kept content-addressed in one SQLite file.
+
+    Every table, index, insert, view, sequence, routine and seed data element is stored
+    once under the hex digest of its fingerprint (see SchemaElement.fingerprint) and of
+    its markup, as a compressed pickle; seed data files are stored once under the digest of
+    their bytes. A version is only a manifest listing, in changelog order, the key and hash
+    of each of its elements, so saving a version that differs from earlier ones in a few
+    tables adds those tables and a manifest.
+
+    Two versions are diffed by comparing their manifests: keys whose hashes are equal on
+    both sides cannot produce a change and are left out, and only the elements of the
+    remaining keys are read back into small snapshots for the comparer. Objects are never
+    deleted; saving a version under an existing name replaces its manifest.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version == 0:
+            self.connection.execute(f'PRAGMA user_version = {HISTORY_STORE_VERSION}')
+        elif version != HISTORY_STORE_VERSION:
+            self.connection.close()
+            raise ValueError(f"{path} is not a snapshot history store of version {HISTORY_STORE_VERSION}")
+        self.connection.executescript(HISTORY_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def version_names(self):
+        return [name for (name,) in self.connection.execute('SELECT name FROM versions ORDER BY name')]
+
+    def save_version(self, name, snapshot):
+        """Save a ChangelogSnapshot as version name and return a summary of what was written.
+
+        Elements and files the store already holds are not written again.
+        """
+        saved = {'version': name, 'elements': 0, 'new_elements': 0, 'new_files': 0, 'new_bytes': 0}
+        known = set()
+
+        def store(table, digest, data):
+            if digest in known:
+                return
+            known.add(digest)
+            if self.connection.execute(f'SELECT 1 FROM {table} WHERE hash = ?', (digest,)).fetchone():
+                return
+            data = zlib.compress(data())
+            self.connection.execute(f'INSERT INTO {table} VALUES (?, ?)', (digest, data))
+            saved['new_elements' if table == 'objects' else 'new_files'] += 1
+            saved['new_bytes'] += len(data)
+
+        file_data = {}
+
+        def address(element):
+            detached = element.detached()
+            digest = detached.fingerprint()
+            if element.span is not None:
+                detached.span = embedded_span(element.span, file_data)
+            if detached.span is not None:
+                digest = hashlib.blake2b(digest + detached.span[0], digest_size=16).digest()
+            digest = digest.hex()
+            store('objects', digest, lambda: pickle.dumps(detached, pickle.HIGHEST_PROTOCOL))
+            saved['elements'] += 1
+            return digest
+
+        def address_file(source, csv_path):
+            if not source.exists(csv_path):
+                return None
+            digest = seed_data_digest(source, csv_path).hex()
+            store('files', digest, lambda: source.read_bytes(csv_path))
+            return digest
+
+        with self.connection:
+            manifest = {
+                'tables': [manifest_entry(object_key(table), address(table)) for table in snapshot.tables],
+                'indexes': [manifest_entry((*object_key(index), index.getAttribute('indexName')), address(index))
+                            for index in snapshot.indexes],
+                'inserts': [manifest_entry(object_key(insert), address(insert)) for insert in snapshot.inserts],
+                'views': [manifest_entry(key, address(view)) for key, view in snapshot.views.items()],
+                'sequences': [manifest_entry(key, address(sequence)) for key, sequence in snapshot.sequences.items()],
+                'routines': [manifest_entry((tag, *key), address(routine))
+                             for (tag, key), routine in snapshot.routines.items()],
+                'load_data': [manifest_entry(object_key(element), address(element),
+                                             address_file(source, csv_path) or '', csv_path)
+                              for element, csv_path, source in snapshot.load_data],
+            }
+            # Groups where a key has more than one entry, which narrow_entries compares key by key
+            manifest['repeated'] = [group for group in MANIFEST_GROUPS
+                                    if len(set(map(entry_key, manifest[group]))) < len(manifest[group])]
+            self.connection.execute('INSERT OR REPLACE INTO versions VALUES (?, ?, ?, ?)',
+                                    (name, snapshot.label, int(snapshot.includes_data),
+                                     zlib.compress(json.dumps(manifest).encode('utf-8'))))
+        saved['tables'] = len(snapshot.tables)
+        return saved
+
+    def read_manifest(self, name):
+        """Return (includes data, manifest) of a saved version."""
+        row = self.connection.execute('SELECT includes_data, manifest FROM versions WHERE name = ?',
+                                      (name,)).fetchone()
+        if row is None:
+            raise ValueError(f"No version '{name}' in snapshot history store {self.path}")
+        return bool(row[0]), json.loads(zlib.decompress(row[1]))
+
+    def load_snapshot(self, name, label=None):
+        """Return the full ChangelogSnapshot of a saved version."""
+        includes_data, manifest = self.read_manifest(name)
+        return self.build_snapshot(manifest, includes_data, label or STORED_SPEC_PREFIX + name)
+
+    def narrowed_snapshots(self, previous_name, current_name, previous_label=None, current_label=None):
+        """Return (previous, current) snapshots of two saved versions holding only what may differ.
+
+        A key is kept on both sides when its entries (element hashes, in order) differ;
+        diffing the narrowed snapshots gives the same changes as diffing the full ones. The
+        tables of keys with changed seed data are kept too, as the comparer reads their
+        primary keys to match rows.
+        """
+        prev_includes_data, prev_manifest = self.read_manifest(previous_name)
+        current_includes_data, current_manifest = self.read_manifest(current_name)
+        repeated = {*prev_manifest['repeated'], *current_manifest['repeated']}
+        prev_narrowed, current_narrowed = {}, {}
+        for group in MANIFEST_GROUPS:
+            prev_narrowed[group], current_narrowed[group] = narrow_entries(
+                prev_manifest[group], current_manifest[group], group in repeated)
+
+        seed_data_keys = set(map(entry_key, current_narrowed['load_data']))
+        if seed_data_keys:
+            prev_narrowed['tables'], current_narrowed['tables'] = narrow_entries(
+                prev_manifest['tables'], current_manifest['tables'], 'tables' in repeated, seed_data_keys)
+
+        return (self.build_snapshot(prev_narrowed, prev_includes_data,
+                                    previous_label or STORED_SPEC_PREFIX + previous_name),
+                self.build_snapshot(current_narrowed, current_includes_data,
+                                    current_label or STORED_SPEC_PREFIX + current_name))
+
+    def build_snapshot(self, manifest, includes_data, label):
+        """Read the elements a manifest lists back into a ChangelogSnapshot."""
+        entries = {group: [split_entry(entry) for entry in manifest[group]] for group in MANIFEST_GROUPS}
+        elements = self.fetch_elements({values[0] for group in entries.values() for _, values in group})
+        snapshot = ChangelogSnapshot(label)
+        snapshot.includes_data = includes_data
+        snapshot.source = StoredFileSource(self.path, {values[2]: values[1] for _, values in entries['load_data']})
+        snapshot.tables = [elements[values[0]] for _, values in entries['tables']]
+        snapshot.indexes = [elements[values[0]] for _, values in entries['indexes']]
+        snapshot.inserts = [elements[values[0]] for _, values in entries['inserts']]
+        snapshot.views = {qualified_key(*key): elements[values[0]] for key, values in entries['views']}
+        snapshot.sequences = {qualified_key(*key): elements[values[0]] for key, values in entries['sequences']}
+        snapshot.routines = {(key[0], qualified_key(*key[1:])): elements[values[0]]
+                             for key, values in entries['routines']}
+        snapshot.load_data = [(elements[values[0]], values[2], snapshot.source) for _, values in entries['load_data']]
+        return snapshot
+
+    def fetch_elements(self, digests):
+        """Return {hash: element} for the given object hashes."""
+        digests = list(digests)
+        elements = {}
+        for start in range(0, len(digests), FETCH_BATCH_SIZE):
+            batch = digests[start:start + FETCH_BATCH_SIZE]
+            placeholders = ','.join('?' * len(batch))
+            rows = self.connection.execute(f'SELECT hash, data FROM objects WHERE hash IN ({placeholders})', batch)
+            for digest, data in rows:
+                elements[digest] = pickle.loads(zlib.decompress(data))
+        return elements
+
+
+def embedded_span(span, file_data):
+    """Return the span of an element with its markup in place of the file path, from the start of its line.
+
+    XmlChangelogSerializer copies markup from such a span as from a file, so saved versions
+    keep the formatting of their changelogs after the files changed. Returns None when the
+    file changed since the span was read (its stamp differs).
+    """
+    path, start, end, stamp = span
+    if (path, stamp) not in file_data:
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            file_data[path, stamp] = file.read() if (stat.st_mtime_ns, stat.st_size) == stamp else None
+    data = file_data[path, stamp]
+    if data is None:
+        return None
+    line_start = data.rfind(b'\n', 0, start) + 1
+    return data[line_start:end], start - line_start, end - line_start
+
+
+def manifest_entry(key, *values):
+    return FIELD_SEPARATOR.join(key) + KEY_END + FIELD_SEPARATOR.join(values)
+
+
+def entry_key(entry):
+    return entry.partition(KEY_END)[0]
+
+
+def split_entry(entry):
+    """Return ([key fields], [values]) of a manifest entry."""
+    key, _, values = entry.partition(KEY_END)
+    return key.split(FIELD_SEPARATOR), values.split(FIELD_SEPARATOR)
+
+
+def narrow_entries(prev_entries, current_entries, repeated, keep=()):
+    """Return the entries of both sides whose key has different entries on each side, or is in keep.
+
+    Entries are compared whole, as strings; only when a key may have several entries (repeated)
+    are the entries of the changed keys compared in order.
+    """
+    if prev_entries == current_entries and not keep:
+        return [], []
+    changed_entries = set(prev_entries).symmetric_difference(current_entries)
+    if not repeated and not keep:
+        # Each key has at most one entry per side, so the entries of changed keys are the changed entries
+        return ([entry for entry in prev_entries if entry in changed_entries],
+                [entry for entry in current_entries if entry in changed_entries])
+
+    changed = {*map(entry_key, changed_entries), *keep}
+    if repeated:
+        prev_groups = group_entries(prev_entries)
+        current_groups = group_entries(current_entries)
+        changed.update(key for key in prev_groups.keys() | current_groups.keys()
+                       if prev_groups.get(key) != current_groups.get(key))
+    return ([entry for entry in prev_entries if entry_key(entry) in changed],
+            [entry for entry in current_entries if entry_key(entry) in changed])
+
+
+def group_entries(entries):
+    """Group manifest entries by key, in order."""
+    groups = {}
+    for entry in entries:
+        groups.setdefault(entry_key(entry), []).append(entry)
+    return groups
+
+
+class StoredFileSource:
+    """Reads the seed data files saved with a version back out of a SnapshotHistoryStore file.
+
+    It holds only the store path and the {CSV path: content hash} of the version, so the
+    snapshots it belongs to can still be sent to worker processes.
+    """
+
+    def __init__(self, store_path, files):
+        self.store_path = store_path
+        self.files = files
+
+    def describe(self, path):
+        return path
+
+    def stamp(self, path):
+        return self.files.get(path)
+
+    def exists(self, path):
+        return self.files.get(path) is not None
+
+    def read_bytes(self, path):
+        connection = sqlite3.connect(self.store_path)
+        try:
+            row = connection.execute('SELECT data FROM files WHERE hash = ?', (self.files.get(path),)).fetchone()
+        finally:
+            connection.close()
+        if row is None:
+            raise FileNotFoundError(f"Seed data file not saved in {self.store_path}: {path}")
+        return zlib.decompress(row[0])
+
+    @contextmanager
+    def open_buffer(self, path):
+        yield io.BytesIO(self.read_bytes(path))
@@ -0,0 +1,334 @@
+import re
+
+from logics.ChangeModel import (AddColumnChange, AlterSequenceChange, CreateIndexChange, CreateRoutineChange,
+                                CreateSequenceChange, CreateTableChange, CreateViewChange, DropColumnChange,
+                                DropIndexChange, DropRoutineChange, DropSequenceChange, DropTableChange,
+                                DropViewChange, InsertChange, LoadDataChange, SeedDataChange)
+from logics.ChangeSerializer import ChangeSerializer, StringWriter
+from logics.CsvSeedData import insert_column_value, seed_data_where_clause
+from logics.ObjectKey import QUALIFIER_ATTRIBUTES
+from logics.SqlDialect import get_dialect
+
+# loadData/insert value types written as SQL literals without quotes
+UNQUOTED_VALUE_TYPES = {'NUMERIC', 'BOOLEAN', 'COMPUTED'}
+
+# Column attributes holding a default value, with the value type of each
+DEFAULT_VALUE_ATTRIBUTES = (('defaultValue', 'STRING'), ('defaultValueNumeric', 'NUMERIC'),
+                            ('defaultValueBoolean', 'BOOLEAN'), ('defaultValueDate', 'DATE'),
+                            ('defaultValueComputed', 'COMPUTED'))
+
+# createSequence/alterSequence settings and the clause each is written as, in output order
+SEQUENCE_OPTION_CLAUSES = (('startValue', ' START WITH '), ('incrementBy', ' INCREMENT BY '),
+                           ('minValue', ' MINVALUE '), ('maxValue', ' MAXVALUE '), ('cacheSize', ' CACHE '))
+
+# A routine body that replaces an existing routine by itself
+CREATE_OR_REPLACE_PATTERN = re.compile(r'\s*create\s+or\s+replace\b', re.IGNORECASE)
+
+
+def sql_literal(value, value_type, dialect=None):
+    """Return a value as an SQL literal; None is NULL, strings are quoted."""
+    if value is None:
+        return 'NULL'
+    if value_type == 'BOOLEAN' and dialect is not None:
+        return dialect.boolean_literal(value)
+    if value_type in UNQUOTED_VALUE_TYPES:
+        return value
+    escaped_value = value.replace("'", "''")
+    return f"'{escaped_value}'"
+
+
+class SqlStatement:
+    """One statement of a change, before it is spelled for a dialect.
+
+    values holds the template fields that read the same on every dialect. literals maps a
+    field to (prefix, value, type) items whose literals differ between dialects, and columns
+    holds the column elements rendered into the 'definitions' field, after which constraints
+    (primary and foreign keys) follow. options holds the settings of a sequence, rendered
+    into the 'options' field.
+    """
+
+    __slots__ = ('template', 'values', 'literals', 'columns', 'constraints', 'options')
+
+    def __init__(self, template, values, literals=None, columns=None, constraints=(), options=None):
+        self.template = template
+        self.values = values
+        self.literals = literals
+        self.columns = columns
+        self.constraints = constraints
+        self.options = options
+
+
+class SqlChangelogSerializer(ChangeSerializer):
+    """Write a change list as a Liquibase formatted SQL changelog in one SQL dialect.
+
+    Each change record becomes a '--changeset author:id' block with its statements, taken
+    from the dialect's templates (see SqlDialect). loadData has no SQL equivalent and is
+    written as a comment pointing at the CSV file.
+
+    The statements of a change are built once, dialect-neutral, so write_dialects can render
+    the same change list for several dialects in a single pass.
+    """
+
+    format_name = 'sql'
+    file_extension = '.sql'
+
+    def __init__(self, author='migration', dialect='generic', qualify_names=True):
+        super().__init__(author)
+        self.dialect = get_dialect(dialect)
+        # False writes bare object names, for databases without schemas such as SQLite
+        self.qualify_names = qualify_names
+        self.statement_builders = {
+            CreateTableChange: self.create_table_statements,
+            DropTableChange: self.drop_table_statements,
+            AddColumnChange: self.add_column_statements,
+            DropColumnChange: self.drop_column_statements,
+            InsertChange: self.insert_statements,
+            SeedDataChange: self.seed_data_statements,
+            LoadDataChange: self.load_data_statements,
+            CreateIndexChange: self.create_index_statements,
+            DropIndexChange: self.drop_index_statements,
+            CreateViewChange: self.create_view_statements,
+            DropViewChange: self.drop_view_statements,
+            CreateSequenceChange: self.create_sequence_statements,
+            AlterSequenceChange: self.alter_sequence_statements,
+            DropSequenceChange: self.drop_sequence_statements,
+            CreateRoutineChange: self.create_routine_statements,
+            DropRoutineChange: self.drop_routine_statements,
+        }
+
+    def write(self, changes, file):
+        self.write_dialects(changes, {self.dialect.name: file})
+
+    def write_dialects(self, changes, files):
+        """Write the changelog once per dialect, {dialect name: text file}, in a single pass over the changes."""
+        targets = [(get_dialect(name), file) for name, file in files.items()]
+        for _, file in targets:
+            file.write('--liquibase formatted sql\n')
+
+        for change in changes:
+            statements = self.change_statements(change)
+            for dialect, file in targets:
+                file.write(self.changeset_header(change, dialect))
+                for statement in statements:
+                    file.write(self.render_statement(statement, dialect) + '\n')
+
+    def render_dialects(self, changes, dialect_names):
+        """Return {dialect name: changelog text} for the dialects, rendered in a single pass."""
+        chunks = {name: [] for name in dialect_names}
+        self.write_dialects(changes, {name: StringWriter(chunks[name]) for name in dialect_names})
+        return {name: ''.join(dialect_chunks) for name, dialect_chunks in chunks.items()}
+
+    def changeset_header(self, change, dialect):
+        # Anything but generic SQL is only meant to run on its own database
+        dbms = f" dbms:{dialect.name}" if dialect.name != 'generic' else ''
+        # A routine body holds ';' of its own, so its statements end at a '/' line instead
+        delimiter = ' endDelimiter:/' if isinstance(change, CreateRoutineChange) else ''
+        return f"\n--changeset {self.author}:{change.changeset_id}{dbms}{delimiter}\n"
+
+    def change_statements(self, change):
+        """Return the dialect-neutral SqlStatements of a change."""
+        return self.statement_builders[type(change)](change)
+
+    def render_statement(self, statement, dialect):
+        """Spell a statement in a dialect: one terminated SQL statement (or a comment)."""
+        values = statement.values
+        if statement.literals or statement.columns is not None or statement.options is not None:
+            values = dict(values)
+            for field, items in (statement.literals or {}).items():
+                values[field] = ', '.join(prefix + sql_literal(value, value_type, dialect)
+                                          for prefix, value, value_type in items)
+            if statement.columns is not None:
+                values['definitions'] = ',\n    '.join(
+                    [self.column_definition(column, dialect, adding=statement.template == 'add_column')
+                     for column in statement.columns]
+                    + list(statement.constraints))
+            if statement.options is not None:
+                values['options'] = self.sequence_options(statement.options, dialect)
+        return dialect.render(statement.template, values)
+
+    def sequence_options(self, attributes, dialect):
+        """Return the ' START WITH 1 INCREMENT BY 1 ...' clauses of sequence settings; ordered is not written."""
+        options = ''.join(clause + attributes[name] for name, clause in SEQUENCE_OPTION_CLAUSES if attributes.get(name))
+        if attributes.get('cycle') == 'true':
+            options += ' CYCLE'
+        elif attributes.get('cycle') == 'false':
+            options += dialect.no_cycle
+        return options
+
+    def column_definition(self, column, dialect=None, adding=False):
+        """Return '<name> <type> [DEFAULT ...] [NOT NULL] [UNIQUE]' for a column element.
+
+        adding marks a column of ALTER TABLE ... ADD, where some dialects cannot take every constraint.
+        """
+        dialect = dialect or self.dialect
+        type_text = column.getAttribute('type')
+        values = {
+            'name': column.getAttribute('name'),
+            'type': ' ' + dialect.data_type(type_text) if type_text else '',
+            'auto_increment': dialect.auto_increment if column.getAttribute('autoIncrement') == 'true' else '',
+            'default': '',
+            'not_null': '',
+            'unique': '',
+        }
+
+        for attribute, value_type in DEFAULT_VALUE_ATTRIBUTES:
+            if column.hasAttribute(attribute):
+                values['default'] = f" DEFAULT {sql_literal(column.getAttribute(attribute), value_type, dialect)}"
+                break
+
+        for constraints in column.getElementsByTagName('constraints'):
+            if constraints.getAttribute('nullable') == 'false' or constraints.getAttribute('primaryKey') == 'true':
+                values['not_null'] = ' NOT NULL'
+            if constraints.getAttribute('unique') == 'true':
+                values['unique'] = ' UNIQUE'
+
+        if adding and not dialect.add_column_constraints:
+            values['unique'] = ''
+            if not values['default']:
+                values['not_null'] = ''
+        return dialect.render('column_definition', values)
+
+    def qualified_name(self, change):
+        """Return the change's object name prefixed with its catalog and schema, e.g. 'accounting.m_loan'."""
+        return self.schema_prefix(change) + change.table_name
+
+    def schema_prefix(self, change):
+        if not change.qualifiers or not self.qualify_names:
+            return ''
+        return ''.join(change.qualifiers[name] + '.' for name in QUALIFIER_ATTRIBUTES if name in change.qualifiers)
+
+    def index_name(self, change):
+        return change.index_name
+
+    def create_table_statements(self, change):
+        columns = change.table.getElementsByTagName('column')
+        primary_key_columns = []
+        foreign_keys = []
+        for column in columns:
+            for constraints in column.getElementsByTagName('constraints'):
+                if constraints.getAttribute('primaryKey') == 'true':
+                    primary_key_columns.append(column.getAttribute('name'))
+                reference = self.foreign_key_reference(constraints)
+                if reference:
+                    foreign_keys.append(f"FOREIGN KEY ({column.getAttribute('name')}) REFERENCES {reference}")
+
+        constraints = []
+        if primary_key_columns:
+            constraints.append(f"PRIMARY KEY ({', '.join(primary_key_columns)})")
+        constraints.extend(foreign_keys)
+        return [SqlStatement('create_table', {'table': self.qualified_name(change)}, columns=columns,
+                             constraints=constraints)]
+
+    def foreign_key_reference(self, constraints):
+        """Return 'table(columns)' for a column's foreign key constraint, or ''."""
+        if constraints.getAttribute('references'):
+            return constraints.getAttribute('references')
+        if constraints.getAttribute('referencedTableName'):
+            return (f"{constraints.getAttribute('referencedTableName')}"
+                    f"({constraints.getAttribute('referencedColumnNames')})")
+        return ''
+
+    def drop_table_statements(self, change):
+        return [SqlStatement('drop_table', {'table': self.qualified_name(change)})]
+
+    def add_column_statements(self, change):
+        table = self.qualified_name(change)
+        return [SqlStatement('add_column', {'table': table}, columns=[column]) for column in change.columns]
+
+    def drop_column_statements(self, change):
+        table = self.qualified_name(change)
+        return [SqlStatement('drop_column', {'table': table, 'column': column_name})
+                for column_name in change.column_names]
+
+    def insert_statements(self, change):
+        table = self.qualified_name(change)
+        statements = []
+        for row in change.rows:
+            names = []
+            values = []
+            for column in row.getElementsByTagName('column'):
+                value, value_type = insert_column_value(column)
+                names.append(column.getAttribute('name'))
+                values.append(('', value, value_type))
+            statements.append(SqlStatement('insert', {'table': table, 'columns': ', '.join(names)},
+                                           literals={'values': values}))
+        return statements
+
+    def seed_data_statements(self, change):
+        table = self.qualified_name(change)
+        statements = []
+        for row in change.rows:
+            if change.kind == 'delete':
+                statements.append(SqlStatement('delete', {
+                    'table': table, 'where': seed_data_where_clause(row, change.column_types)}))
+                continue
+
+            columns = [(name, value) for name, value in row.items() if change.column_types.get(name) != 'SKIP']
+            if change.kind == 'insert':
+                columns = [(name, value) for name, value in columns if value is not None]
+                statements.append(SqlStatement(
+                    'insert', {'table': table, 'columns': ', '.join(name for name, _ in columns)},
+                    literals={'values': [('', value, change.column_types.get(name)) for name, value in columns]}))
+            else:
+                assignments = [(f"{name} = ", value, change.column_types.get(name))
+                               for name, value in columns if name not in change.primary_key_columns]
+                key_columns = {name: row.get(name) for name in change.primary_key_columns or row}
+                statements.append(SqlStatement(
+                    'update', {'table': table,
+                               'where': seed_data_where_clause(key_columns, change.column_types)},
+                    literals={'assignments': assignments}))
+        return statements
+
+    def load_data_statements(self, change):
+        return [SqlStatement('load_data', {'table': self.qualified_name(change), 'file': change.file,
+                                           'row_count': str(change.row_count)})]
+
+    def create_index_statements(self, change):
+        columns = []
+        for column in change.index.getElementsByTagName('column'):
+            descending = ' DESC' if column.getAttribute('descending') == 'true' else ''
+            columns.append(column.getAttribute('name') + descending)
+        unique = 'UNIQUE ' if change.index.getAttribute('unique') == 'true' else ''
+        return [SqlStatement('create_index', {'table': self.qualified_name(change), 'index': self.index_name(change),
+                                              'unique': unique, 'columns': ', '.join(columns)})]
+
+    def drop_index_statements(self, change):
+        return [SqlStatement('drop_index', {'table': self.qualified_name(change), 'index': self.index_name(change),
+                                            'schema': self.schema_prefix(change)})]
+
+    def create_view_statements(self, change):
+        view = change.view
+        if view.getAttribute('fullDefinition') == 'true':
+            return [SqlStatement('view_definition', {'body': view.text.strip()})]
+        template = 'replace_view' if change.replace or view.getAttribute('replaceIfExists') == 'true' else 'create_view'
+        return [SqlStatement(template, {'view': self.qualified_name(change),
+                                        'query': view.text.strip().rstrip(';').rstrip()})]
+
+    def drop_view_statements(self, change):
+        return [SqlStatement('drop_view', {'view': self.qualified_name(change)})]
+
+    def create_sequence_statements(self, change):
+        return [SqlStatement('create_sequence', {'sequence': self.qualified_name(change)},
+                             options=change.sequence.attributes)]
+
+    def alter_sequence_statements(self, change):
+        return [SqlStatement('alter_sequence', {'sequence': self.qualified_name(change)}, options=change.attributes)]
+
+    def drop_sequence_statements(self, change):
+        return [SqlStatement('drop_sequence', {'sequence': self.qualified_name(change)})]
+
+    def create_routine_statements(self, change):
+        """Write the routine body as it is; a changed routine is dropped first unless its body replaces it."""
+        values = self.routine_values(change)
+        values['body'] = change.routine.text.strip()
+        statements = []
+        if change.replace and not CREATE_OR_REPLACE_PATTERN.match(values['body']):
+            statements.append(SqlStatement('replace_routine_drop', values))
+        statements.append(SqlStatement('create_routine', values))
+        return statements
+
+    def drop_routine_statements(self, change):
+        return [SqlStatement('drop_routine', self.routine_values(change))]
+
+    def routine_values(self, change):
+        return {'kind': change.routine.tagName[len('create'):].upper(), 'name': self.qualified_name(change)}
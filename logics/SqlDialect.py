@@ -0,0 +1,146 @@
+import re
+import string
+from functools import lru_cache
+
+# Data type name and optional arguments, e.g. 'DECIMAL(19, 6)' -> ('DECIMAL', '(19, 6)')
+DATA_TYPE_PATTERN = re.compile(r'\s*([A-Za-z][A-Za-z0-9_ ]*?)\s*(\(.*\))?\s*$')
+
+# Statement templates shared by all dialects; a dialect overrides the ones its SQL differs in
+BASE_TEMPLATES = {
+    'create_table': "CREATE TABLE {table} (\n    {definitions}\n);",
+    'drop_table': "DROP TABLE {table};",
+    'add_column': "ALTER TABLE {table} ADD {definitions};",
+    'drop_column': "ALTER TABLE {table} DROP COLUMN {column};",
+    'insert': "INSERT INTO {table} ({columns}) VALUES ({values});",
+    'update': "UPDATE {table} SET {assignments} WHERE {where};",
+    'delete': "DELETE FROM {table} WHERE {where};",
+    'load_data': "-- loadData: {row_count} rows of {file} into {table}",
+    'create_index': "CREATE {unique}INDEX {index} ON {table} ({columns});",
+    'drop_index': "DROP INDEX {schema}{index};",
+    'create_view': "CREATE VIEW {view} AS {query};",
+    'replace_view': "CREATE OR REPLACE VIEW {view} AS {query};",
+    'drop_view': "DROP VIEW {view};",
+    # Routine bodies and views with fullDefinition are whole CREATE statements, written as they are
+    'view_definition': "{body}",
+    # Routine changeSets end their statements with a '/' line, as their bodies hold ';'
+    'create_routine': "{body}\n/",
+    'replace_routine_drop': "DROP {kind} {name}\n/",
+    'drop_routine': "DROP {kind} {name};",
+    'create_sequence': "CREATE SEQUENCE {sequence}{options};",
+    'alter_sequence': "ALTER SEQUENCE {sequence}{options};",
+    'drop_sequence': "DROP SEQUENCE {sequence};",
+    # Every field after the name is either empty or starts with a space
+    'column_definition': "{name}{type}{auto_increment}{default}{not_null}{unique}",
+}
+
+
+class CompiledTemplate:
+    """A statement template split into literal text and field names once, rendered by joining."""
+
+    __slots__ = ('parts',)
+
+    def __init__(self, template):
+        self.parts = tuple((literal, field) for literal, field, _, _ in string.Formatter().parse(template))
+
+    def render(self, values):
+        return ''.join(literal + values[field] if field is not None else literal for literal, field in self.parts)
+
+
+@lru_cache(maxsize=None)
+def compile_template(template):
+    """Return the CompiledTemplate for a template string; every distinct template is compiled once."""
+    return CompiledTemplate(template)
+
+
+class SqlDialect:
+    """How one database spells the statements of a migration: templates, data types and literals."""
+
+    def __init__(self, name, templates=None, type_names=None, auto_increment='', boolean_literals=None,
+                 add_column_constraints=True, no_cycle=' NO CYCLE'):
+        self.name = name
+        self.templates = {template_name: compile_template(template)
+                          for template_name, template in dict(BASE_TEMPLATES, **(templates or {})).items()}
+        self.type_names = type_names or {}
+        self.auto_increment = auto_increment
+        # (true, false) spelling of boolean literals; None writes the changelog's value as is
+        self.boolean_literals = boolean_literals
+        # False where ALTER TABLE ... ADD cannot carry NOT NULL (without a default) or UNIQUE
+        self.add_column_constraints = add_column_constraints
+        # Sequence option turning off CYCLE
+        self.no_cycle = no_cycle
+        self.data_types = {}
+
+    def render(self, template_name, values):
+        return self.templates[template_name].render(values)
+
+    def data_type(self, type_text):
+        """Translate a Liquibase/ANSI data type into this dialect's spelling; unknown types pass through."""
+        if type_text not in self.data_types:
+            self.data_types[type_text] = self.translate_data_type(type_text)
+        return self.data_types[type_text]
+
+    def translate_data_type(self, type_text):
+        match = DATA_TYPE_PATTERN.match(type_text)
+        if not match:
+            return type_text
+        translated = self.type_names.get(' '.join(match.group(1).upper().split()))
+        if translated is None:
+            return type_text
+        # A translation that carries its own arguments (e.g. NUMBER(19)) replaces the original ones
+        return translated if '(' in translated else translated + (match.group(2) or '')
+
+    def boolean_literal(self, value):
+        if self.boolean_literals is None:
+            return value
+        return self.boolean_literals[0] if value.lower() in ('true', '1', 't', 'y', 'yes') else self.boolean_literals[1]
+
+
+DIALECTS = {
+    'generic': SqlDialect('generic'),
+    'mysql': SqlDialect(
+        'mysql',
+        templates={'drop_index': "DROP INDEX {index} ON {table};",
+                   'create_sequence': "-- createSequence: MySQL has no sequences, {sequence} is not created",
+                   'alter_sequence': "-- alterSequence: MySQL has no sequences, {sequence} is not altered",
+                   'drop_sequence': "-- dropSequence: MySQL has no sequences, {sequence} is not dropped"},
+        type_names={'CLOB': 'LONGTEXT', 'BLOB': 'LONGBLOB', 'TIMESTAMP WITH TIME ZONE': 'TIMESTAMP',
+                    'UUID': 'CHAR(36)', 'BOOLEAN': 'BIT(1)'},
+        auto_increment=' AUTO_INCREMENT',
+        boolean_literals=('1', '0')),
+    'postgresql': SqlDialect(
+        'postgresql',
+        templates={'add_column': "ALTER TABLE {table} ADD COLUMN {definitions};"},
+        type_names={'DATETIME': 'TIMESTAMP', 'TINYINT': 'SMALLINT', 'DOUBLE': 'DOUBLE PRECISION',
+                    'CLOB': 'TEXT', 'LONGTEXT': 'TEXT', 'BLOB': 'BYTEA', 'LONGBLOB': 'BYTEA', 'BIT': 'BOOLEAN'},
+        auto_increment=' GENERATED BY DEFAULT AS IDENTITY',
+        boolean_literals=('TRUE', 'FALSE')),
+    'oracle': SqlDialect(
+        'oracle',
+        type_names={'VARCHAR': 'VARCHAR2', 'NVARCHAR': 'NVARCHAR2', 'BIGINT': 'NUMBER(19)', 'INT': 'NUMBER(10)',
+                    'INTEGER': 'NUMBER(10)', 'SMALLINT': 'NUMBER(5)', 'TINYINT': 'NUMBER(3)', 'BOOLEAN': 'NUMBER(1)',
+                    'BIT': 'NUMBER(1)', 'DECIMAL': 'NUMBER', 'NUMERIC': 'NUMBER', 'DOUBLE': 'FLOAT(24)',
+                    'DATETIME': 'TIMESTAMP', 'TEXT': 'CLOB', 'LONGTEXT': 'CLOB', 'LONGBLOB': 'BLOB',
+                    'UUID': 'RAW(16)'},
+        auto_increment=' GENERATED BY DEFAULT AS IDENTITY',
+        boolean_literals=('1', '0'),
+        no_cycle=' NOCYCLE'),
+    # SQLite only takes AUTOINCREMENT on an INTEGER PRIMARY KEY column and accepts any type name
+    'sqlite': SqlDialect(
+        'sqlite',
+        templates={'replace_view': "DROP VIEW IF EXISTS {view};\nCREATE VIEW {view} AS {query};",
+                   'create_routine': "-- CREATE {kind} {name}: SQLite has no stored routines",
+                   'replace_routine_drop': "-- DROP {kind} {name}: SQLite has no stored routines",
+                   'drop_routine': "-- DROP {kind} {name}: SQLite has no stored routines",
+                   'create_sequence': "-- createSequence: SQLite has no sequences, {sequence} is not created",
+                   'alter_sequence': "-- alterSequence: SQLite has no sequences, {sequence} is not altered",
+                   'drop_sequence': "-- dropSequence: SQLite has no sequences, {sequence} is not dropped"},
+        boolean_literals=('1', '0'),
+        add_column_constraints=False),
+}
+
+
+def get_dialect(name):
+    try:
+        return DIALECTS[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown SQL dialect '{name}', expected one of: {', '.join(sorted(DIALECTS))}") from None
@@ -0,0 +1,304 @@
+import hashlib
+import sqlite3
+
+from logics.ChangeModel import (AlterSequenceChange, CreateIndexChange, CreateRoutineChange, CreateSequenceChange,
+                                CreateTableChange, CreateViewChange, DropIndexChange, DropRoutineChange,
+                                DropSequenceChange, DropViewChange, InsertChange, LoadDataChange)
+from logics.ObjectKey import format_key, key_qualifiers, object_key, qualified_key
+from logics.SqlChangelogSerializer import SqlChangelogSerializer
+from logics.SqlDialect import get_dialect
+
+# Columns, primary key flags, explicitly created indexes and row counts of every table, each in one query
+TABLE_COLUMNS_QUERY = """
+    SELECT m.name, c.name, c.type, c.pk
+    FROM sqlite_master AS m JOIN pragma_table_info(m.name) AS c
+    WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'
+    ORDER BY m.name, c.cid
+"""
+INDEX_COLUMNS_QUERY = """
+    SELECT m.name, il.name, il."unique", ix.name, ix."desc"
+    FROM sqlite_master AS m JOIN pragma_index_list(m.name) AS il JOIN pragma_index_xinfo(il.name) AS ix
+    WHERE m.type = 'table' AND il.origin = 'c' AND ix.key = 1
+    ORDER BY m.name, il.name, ix.seqno
+"""
+
+# Changes to objects other than tables, which SQLite has no counterpart for or which read tables of other shards
+OBJECT_CHANGES = (CreateViewChange, DropViewChange, CreateSequenceChange, AlterSequenceChange, DropSequenceChange,
+                  CreateRoutineChange, DropRoutineChange)
+
+# Tables of the migration applied per in-memory database
+SHARD_TABLES = 32
+
+# Tables counted per UNION ALL query; SQLite allows 500 terms in a compound SELECT
+ROW_COUNT_BATCH_SIZE = 250
+
+
+class MigrationValidationError(Exception):
+    """Raised when a changeSet of the migration fails to run."""
+
+    def __init__(self, change, message):
+        super().__init__(f"changeSet {change.changeset_id} failed: {message}")
+        self.change = change
+        self.changeset_id = change.changeset_id
+
+
+def qualified_change_name(change, name):
+    """Return 'catalog.schema.name' for a name in the catalog and schema of a change."""
+    return format_key(qualified_key(change.qualifiers.get('catalogName', ''),
+                                    change.qualifiers.get('schemaName', ''), name))
+
+
+def change_key(change):
+    """Return the key of the table a change concerns, as the validator compares tables."""
+    return qualified_change_name(change, change.table_name).lower()
+
+
+def element_key(element, name_attribute='tableName'):
+    """Return the key of the table or index an element names, as the validator compares them."""
+    return format_key(object_key(element, name_attribute)).lower()
+
+
+class SqliteValidationSerializer(SqlChangelogSerializer):
+    """SQL serializer naming a schema-qualified table or index by one quoted name, e.g. "accounting.m_loan".
+
+    SQLite has no schemas, so tables of the same name in two schemas become two tables of
+    the main database, whose names read back as the keys the validator compares.
+    """
+
+    def __init__(self):
+        super().__init__(dialect='sqlite', qualify_names=False)
+
+    def qualified_name(self, change):
+        return self.flat_name(change, change.table_name)
+
+    def index_name(self, change):
+        return self.flat_name(change, change.index_name)
+
+    def flat_name(self, change, name):
+        return f'"{qualified_change_name(change, name)}"' if change.qualifiers else name
+
+
+class SqliteMigrationValidator:
+    """Dry-run a migration against an in-memory SQLite database.
+
+    The previous snapshot's tables, indexes and inserts are created first, then every
+    generated changeSet is applied in order; seed rows go in with executemany. The resulting
+    schema is read back with batched PRAGMA queries and its fingerprint compared with the
+    one expected from the current snapshot. Tables are applied in groups (see shards), so
+    index name clashes between tables of different groups go unnoticed.
+
+    SQLite cannot add NOT NULL or UNIQUE columns with ALTER TABLE, so nullability is not
+    compared, and tables filled by loadData are left out of the row counts (all tables, when
+    either snapshot has no data). Views, sequences and routines are not applied, and dropIndex
+    changeSets are applied before all others. Tables and indexes are compared by their
+    schema-qualified names (see SqliteValidationSerializer).
+    """
+
+    def __init__(self):
+        self.dialect = get_dialect('sqlite')
+        self.serializer = SqliteValidationSerializer()
+
+    def validate(self, prev_snapshot, current_snapshot, changes):
+        """Return a dict with 'valid', 'failed_changeset', 'error' and the schema 'differences'."""
+        result = {'valid': False, 'failed_changeset': None, 'error': None, 'differences': []}
+        skipped_tables = {element_key(element)
+                          for snapshot in (prev_snapshot, current_snapshot)
+                          for element, _, _ in snapshot.load_data}
+        skipped_tables.update(change_key(change) for change in changes if isinstance(change, LoadDataChange))
+        compare_rows = prev_snapshot.includes_data and current_snapshot.includes_data
+
+        positions = {id(change): position for position, change in enumerate(changes)}
+        changes = [change for change in changes if not isinstance(change, OBJECT_CHANGES)]
+        # SQLite refuses to drop a column an index still covers, while the migration drops indexes after columns
+        changes.sort(key=lambda change: not isinstance(change, DropIndexChange))
+        failure = None
+        actual = {'tables': {}, 'indexes': {}, 'rows': {}}
+        for previous_changes, migration_changes in self.shards(self.previous_schema_changes(prev_snapshot), changes):
+            connection = sqlite3.connect(':memory:')
+            try:
+                self.apply_changes(connection, previous_changes)
+                self.apply_changes(connection, migration_changes)
+                if failure is None:
+                    self.introspect(connection, skipped_tables, actual)
+            except MigrationValidationError as e:
+                # Report the failure that comes first in the migration; the previous schema comes before it
+                position = positions.get(id(e.change), -1)
+                if failure is None or position < failure[0]:
+                    failure = (position, e)
+            finally:
+                connection.close()
+
+        if failure is not None:
+            result['failed_changeset'] = failure[1].changeset_id
+            result['error'] = str(failure[1])
+            return result
+
+        actual = freeze_schema(actual)
+        expected = self.expected_schema(current_snapshot, skipped_tables)
+        if not compare_rows:
+            actual['rows'] = expected['rows'] = {}
+        if schema_fingerprint(actual) != schema_fingerprint(expected):
+            result['differences'] = schema_differences(expected, actual)
+        result['valid'] = not result['differences']
+        return result
+
+    def shards(self, previous_changes, changes):
+        """Yield (previous schema changes, migration changes) per group of tables.
+
+        SQLite reparses the whole schema after every ALTER TABLE, so the tables the migration
+        touches are split into groups of SHARD_TABLES, each applied in a database of its own;
+        the untouched tables, which see no ALTER, share a last one. A change only ever
+        concerns one table, so the changes of a group keep their order.
+        """
+        shard_by_table = {}
+        for change in changes:
+            shard_by_table.setdefault(change_key(change), len(shard_by_table) // SHARD_TABLES)
+        shard_count = (len(shard_by_table) + SHARD_TABLES - 1) // SHARD_TABLES
+        untouched_shard = shard_count
+
+        groups = [([], []) for _ in range(shard_count + 1)]
+        for change in previous_changes:
+            groups[shard_by_table.get(change_key(change), untouched_shard)][0].append(change)
+        for change in changes:
+            groups[shard_by_table[change_key(change)]][1].append(change)
+        return groups
+
+    def previous_schema_changes(self, prev_snapshot):
+        """Return change records creating the previous snapshot's tables, indexes and rows."""
+        changes = [CreateTableChange(table.getAttribute('tableName'), table) for table in prev_snapshot.tables]
+        changes.extend(CreateIndexChange(index.getAttribute('tableName'), index.getAttribute('indexName'), index)
+                       for index in prev_snapshot.indexes)
+        changes.extend(InsertChange(insert.getAttribute('tableName'), [insert]) for insert in prev_snapshot.inserts)
+        for change, element in zip(changes, (*prev_snapshot.tables, *prev_snapshot.indexes, *prev_snapshot.inserts)):
+            change.qualifiers = key_qualifiers(object_key(element))
+            change.changeset_id = f"previous:{format_key(object_key(element))}"
+        return changes
+
+    def apply_changes(self, connection, changes):
+        """Run the changes in order; consecutive inserts into the same columns share one executemany."""
+        for change in changes:
+            if isinstance(change, LoadDataChange):
+                continue
+            pending_sql = None
+            pending_rows = []
+            try:
+                for statement in self.serializer.change_statements(change):
+                    parameters = self.insert_parameters(statement)
+                    if parameters is None:
+                        self.flush_inserts(connection, pending_sql, pending_rows)
+                        pending_sql, pending_rows = None, []
+                        connection.execute(self.serializer.render_statement(statement, self.dialect))
+                        continue
+
+                    sql = (f"INSERT INTO {statement.values['table']} ({statement.values['columns']}) "
+                           f"VALUES ({', '.join('?' * len(parameters))})")
+                    if sql != pending_sql:
+                        self.flush_inserts(connection, pending_sql, pending_rows)
+                        pending_sql, pending_rows = sql, []
+                    pending_rows.append(parameters)
+                self.flush_inserts(connection, pending_sql, pending_rows)
+            except sqlite3.Error as e:
+                raise MigrationValidationError(change, str(e)) from None
+
+    def flush_inserts(self, connection, sql, rows):
+        if rows:
+            connection.executemany(sql, rows)
+
+    def insert_parameters(self, statement):
+        """Return the bind parameters of an insert statement, or None if it has to run as rendered SQL."""
+        if statement.template != 'insert':
+            return None
+        parameters = []
+        for _, value, value_type in statement.literals['values']:
+            if value_type == 'COMPUTED':
+                return None
+            parameters.append(self.dialect.boolean_literal(value)
+                              if value_type == 'BOOLEAN' and value is not None else value)
+        return parameters
+
+    def introspect(self, connection, skipped_tables, schema):
+        """Read tables, indexes and row counts back from the database into a schema dict."""
+        table_names = {}
+        for table_name, column_name, column_type, primary_key in connection.execute(TABLE_COLUMNS_QUERY):
+            table_names.setdefault(table_name.lower(), table_name)
+            schema['tables'].setdefault(table_name.lower(), set()).add(
+                (column_name.lower(), normalize_type(column_type), bool(primary_key)))
+
+        for table_name, index_name, unique, column_name, descending in connection.execute(INDEX_COLUMNS_QUERY):
+            index = schema['indexes'].setdefault((table_name.lower(), index_name.lower()), (bool(unique), []))
+            index[1].append((column_name.lower(), bool(descending)))
+
+        counted_tables = [(key, table_name) for key, table_name in table_names.items() if key not in skipped_tables]
+        for start in range(0, len(counted_tables), ROW_COUNT_BATCH_SIZE):
+            batch = counted_tables[start:start + ROW_COUNT_BATCH_SIZE]
+            query = ' UNION ALL '.join(f'SELECT ?, COUNT(*) FROM "{table_name}"' for _, table_name in batch)
+            schema['rows'].update(connection.execute(query, [key for key, _ in batch]))
+
+    def expected_schema(self, snapshot, skipped_tables):
+        """Return the schema the current snapshot describes, in the layout introspect returns."""
+        schema = {'tables': {}, 'indexes': {}, 'rows': {}}
+        for table in snapshot.tables:
+            columns = schema['tables'].setdefault(element_key(table), set())
+            for column in table.getElementsByTagName('column'):
+                primary_key = any(constraints.getAttribute('primaryKey') == 'true'
+                                  for constraints in column.getElementsByTagName('constraints'))
+                columns.add((column.getAttribute('name').lower(),
+                             normalize_type(self.dialect.data_type(column.getAttribute('type'))), primary_key))
+
+        for index in snapshot.indexes:
+            schema['indexes'][(element_key(index), element_key(index, 'indexName'))] = (
+                index.getAttribute('unique') == 'true',
+                [(column.getAttribute('name').lower(), column.getAttribute('descending') == 'true')
+                 for column in index.getElementsByTagName('column')])
+
+        for table_name in schema['tables']:
+            if table_name not in skipped_tables:
+                schema['rows'][table_name] = 0
+        for insert in snapshot.inserts:
+            table_name = element_key(insert)
+            if table_name in schema['rows']:
+                schema['rows'][table_name] += 1
+        return freeze_schema(schema)
+
+
+def normalize_type(type_text):
+    return ' '.join(type_text.upper().replace(' (', '(').replace(', ', ',').split())
+
+
+def freeze_schema(schema):
+    """Turn the sets and lists of a schema dict into sorted tuples, so equal schemas compare and hash equal."""
+    return {
+        'tables': {name: tuple(sorted(columns)) for name, columns in schema['tables'].items()},
+        'indexes': {key: (unique, tuple(columns)) for key, (unique, columns) in schema['indexes'].items()},
+        'rows': dict(schema['rows']),
+    }
+
+
+def schema_fingerprint(schema):
+    digest = hashlib.blake2b(digest_size=16)
+    for part in ('tables', 'indexes', 'rows'):
+        digest.update(repr(sorted(schema[part].items())).encode('utf-8'))
+        digest.update(b'\x1c')
+    return digest.digest()
+
+
+def schema_differences(expected, actual):
+    """Describe every table, index and row count that differs between two schemas."""
+    differences = []
+    for part, kind in (('tables', 'table'), ('indexes', 'index'), ('rows', 'row_count')):
+        for key in sorted(expected[part].keys() | actual[part].keys()):
+            expected_value = expected[part].get(key)
+            actual_value = actual[part].get(key)
+            if expected_value != actual_value:
+                name = '.'.join(key) if isinstance(key, tuple) else key
+                differences.append({'kind': kind, 'name': name,
+                                    'expected': describe_value(expected_value),
+                                    'actual': describe_value(actual_value)})
+    return differences
+
+
+def describe_value(value):
+    """Return a schema value in a JSON friendly form: None for missing, lists for tuples."""
+    if isinstance(value, tuple):
+        return [describe_value(item) for item in value]
+    return value
@@ -0,0 +1,226 @@
+import os
+import re
+import sqlite3
+from urllib.parse import quote
+
+from logics.ChangelogSnapshot import ChangelogSnapshot
+from logics.ChangelogSource import FileChangelogSource
+from logics.ObjectKey import object_key
+from logics.SchemaElement import SchemaElement
+
+# A snapshot spec naming a SQLite database file instead of a changelog, e.g. sqlite:app.db
+SQLITE_SPEC_PREFIX = 'sqlite:'
+
+# Every column, every index column and every foreign key of the database, one query each
+COLUMNS_QUERY = """
+    SELECT m.name, m.sql, c.name, c.type, c."notnull", c.dflt_value, c.pk
+    FROM sqlite_master AS m JOIN pragma_table_info(m.name) AS c
+    WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'
+    ORDER BY m.rowid, c.cid
+"""
+INDEX_COLUMNS_QUERY = """
+    SELECT m.name, il.name, il."unique", il.origin, ix.name, ix."desc"
+    FROM sqlite_master AS m JOIN pragma_index_list(m.name) AS il JOIN pragma_index_xinfo(il.name) AS ix
+    WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%' AND il.origin IN ('c', 'u') AND ix.key = 1
+    ORDER BY m.rowid, il.seq DESC, ix.seqno
+"""
+FOREIGN_KEYS_QUERY = """
+    SELECT m.name, fk.id, fk."from", fk."table", fk."to", fk.on_delete
+    FROM sqlite_master AS m JOIN pragma_foreign_key_list(m.name) AS fk
+    WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'
+    ORDER BY m.rowid, fk.id, fk.seq
+"""
+
+VIEWS_QUERY = """
+    SELECT name, sql FROM sqlite_master WHERE type = 'view' ORDER BY rowid
+"""
+
+# The query of a CREATE VIEW statement as SQLite keeps it
+VIEW_QUERY_PATTERN = re.compile(r'\s*CREATE\s+(?:TEMP(?:ORARY)?\s+)?VIEW\s+.*?\bAS\s+(.*)$',
+                                re.IGNORECASE | re.DOTALL)
+
+NUMERIC_DEFAULT_PATTERN = re.compile(r'[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?$')
+
+
+def is_sqlite_spec(spec):
+    return spec.startswith(SQLITE_SPEC_PREFIX)
+
+
+def load_sqlite_snapshot(spec, label=None, table_filter=None):
+    """Introspect the SQLite database named by a 'sqlite:path' spec into a ChangelogSnapshot."""
+    return SqliteSnapshotReader(spec[len(SQLITE_SPEC_PREFIX):], table_filter).read(label or spec)
+
+
+class SqliteSnapshotReader:
+    """Read the schema of a SQLite database file into the snapshot model of a changelog.
+
+    Tables come out as createTable elements (columns with their constraints, defaults and
+    foreign keys), explicitly created indexes as createIndex elements and views as createView
+    elements, laid out as a changelog would write them, so the comparer diffs a database like
+    any changelog. Tables, columns, indexes, foreign keys and views each take one catalog query. Row data is not
+    read: the snapshot's includes_data is False, so seed data is not compared against it.
+    Rows of tables and columns a table_filter (see TableFilter) rejects are skipped.
+    """
+
+    def __init__(self, path, table_filter=None):
+        self.path = path
+        self.table_filter = table_filter
+
+    def includes_column(self, table_name, column_name):
+        return self.table_filter is None or (self.table_filter.includes_table(table_name)
+                                             and self.table_filter.includes_column(table_name, column_name))
+
+    def read(self, label):
+        connection = sqlite3.connect(f"file:{quote(os.path.abspath(self.path))}?mode=ro", uri=True)
+        try:
+            tables = self.read_tables(connection)
+            indexes = self.read_indexes(connection, tables)
+            self.read_foreign_keys(connection, tables)
+            views = self.read_views(connection)
+        finally:
+            connection.close()
+
+        snapshot = ChangelogSnapshot(label)
+        snapshot.source = FileChangelogSource()
+        snapshot.stamps.append((self.path, snapshot.source.stamp(self.path)))
+        snapshot.includes_data = False
+        snapshot.tables = list(tables.values())
+        snapshot.indexes = indexes
+        snapshot.views = views
+        return snapshot
+
+    def read_tables(self, connection):
+        """Return {table name: createTable element}, in the order the tables were created."""
+        tables = {}
+        autoincrement_tables = set()
+        primary_keys = {}
+        for table_name, table_sql, name, type_text, not_null, default, primary_key in connection.execute(COLUMNS_QUERY):
+            if not self.includes_column(table_name, name):
+                continue
+            table = tables.get(table_name)
+            if table is None:
+                table = tables[table_name] = SchemaElement('createTable', {'tableName': table_name})
+                if 'AUTOINCREMENT' in (table_sql or '').upper():
+                    autoincrement_tables.add(table_name)
+            column = SchemaElement('column', {'name': name, 'type': type_text})
+            if default is not None:
+                column.attributes.update(default_value_attribute(default))
+
+            constraints = {}
+            if primary_key:
+                constraints['primaryKey'] = 'true'
+                primary_keys.setdefault(table_name, []).append(column)
+            if not_null or primary_key:
+                constraints['nullable'] = 'false'
+            if constraints:
+                column.append_child(SchemaElement('constraints', constraints))
+            table.append_child(column)
+
+        # AUTOINCREMENT only exists on a single INTEGER PRIMARY KEY column
+        for table_name in autoincrement_tables:
+            if len(primary_keys.get(table_name, ())) == 1:
+                primary_keys[table_name][0].attributes['autoIncrement'] = 'true'
+        return tables
+
+    def read_indexes(self, connection, tables):
+        """Return createIndex elements; single-column UNIQUE constraints go onto their column instead."""
+        indexes = {}
+        excluded = set()
+        for table_name, index_name, unique, origin, column_name, descending in connection.execute(INDEX_COLUMNS_QUERY):
+            key = (table_name, index_name)
+            if not self.includes_column(table_name, column_name):
+                excluded.add(key)
+                continue
+            if key not in indexes:
+                indexes[key] = (origin, SchemaElement('createIndex', {'tableName': table_name, 'indexName': index_name}))
+                if unique:
+                    indexes[key][1].attributes['unique'] = 'true'
+            column = SchemaElement('column', {'name': column_name})
+            if descending:
+                column.attributes['descending'] = 'true'
+            indexes[key][1].append_child(column)
+
+        create_indexes = []
+        for (table_name, index_name), (origin, index) in indexes.items():
+            if (table_name, index_name) in excluded:
+                continue
+            if origin == 'c':
+                create_indexes.append(index)
+            elif len(index.children) == 1:
+                column = self.find_column(tables[table_name], index.children[0].getAttribute('name'))
+                if column is not None:
+                    self.column_constraints(column).attributes['unique'] = 'true'
+            # A UNIQUE constraint over several columns has no column-level form and is left out
+        return create_indexes
+
+    def read_foreign_keys(self, connection, tables):
+        """Put each single-column foreign key onto its column's constraints, as references.
+
+        Column constraints only know deleteCascade; other ON DELETE/ON UPDATE actions and
+        foreign keys over several columns are left out.
+        """
+        foreign_keys = {}
+        for table_name, key_id, from_column, to_table, to_column, on_delete in connection.execute(FOREIGN_KEYS_QUERY):
+            if table_name not in tables:
+                continue
+            foreign_keys.setdefault((table_name, key_id), []).append((from_column, to_table, to_column, on_delete))
+
+        for (table_name, _), key_columns in foreign_keys.items():
+            if len(key_columns) != 1:
+                continue
+            from_column, to_table, to_column, on_delete = key_columns[0]
+            column = self.find_column(tables[table_name], from_column)
+            if column is None:
+                continue
+            constraints = self.column_constraints(column)
+            constraints.attributes['foreignKeyName'] = f"fk_{table_name}_{from_column}"
+            # A foreign key without target columns references the primary key of the table
+            constraints.attributes['references'] = f"{to_table}({to_column or self.primary_key(tables, to_table)})"
+            if on_delete == 'CASCADE':
+                constraints.attributes['deleteCascade'] = 'true'
+
+    def read_views(self, connection):
+        """Return {view key: createView element}, the view's query as its text."""
+        views = {}
+        for view_name, view_sql in connection.execute(VIEWS_QUERY):
+            match = VIEW_QUERY_PATTERN.match(view_sql or '')
+            if match:
+                view = SchemaElement('createView', {'viewName': view_name}, text=match.group(1).strip())
+                views[object_key(view, 'viewName')] = view
+        return views
+
+    def primary_key(self, tables, table_name):
+        table = tables.get(table_name)
+        if table is None:
+            return ''
+        return ', '.join(column.getAttribute('name') for column in table.children
+                         if any(constraints.getAttribute('primaryKey') == 'true'
+                                for constraints in column.getElementsByTagName('constraints')))
+
+    def find_column(self, table, column_name):
+        for column in table.children:
+            if column.getAttribute('name').lower() == column_name.lower():
+                return column
+        return None
+
+    def column_constraints(self, column):
+        """Return the constraints child of a column, adding an empty one if it has none."""
+        for child in column.children:
+            if child.tagName == 'constraints':
+                return child
+        constraints = SchemaElement('constraints')
+        column.append_child(constraints)
+        return constraints
+
+
+def default_value_attribute(default):
+    """Return {attribute: value} for a column default as SQLite stores it (SQL text)."""
+    if len(default) >= 2 and default[0] == default[-1] == "'":
+        return {'defaultValue': default[1:-1].replace("''", "'")}
+    if NUMERIC_DEFAULT_PATTERN.match(default):
+        return {'defaultValueNumeric': default}
+    if default.upper() in ('TRUE', 'FALSE'):
+        return {'defaultValueBoolean': default.lower()}
+    if default.upper() == 'NULL':
+        return {}
+    return {'defaultValueComputed': default.strip('()')}
@@ -0,0 +1,344 @@
+import itertools
+import json
+import pickle
+import sqlite3
+
+from logics.ObjectKey import object_key, qualified_key
+
+# Layout version, kept in PRAGMA user_version; a store written with another layout is emptied
+STORE_VERSION = 2
+
+# Kinds of the named objects kept in the objects table
+VIEW = 'view'
+SEQUENCE = 'sequence'
+ROUTINE = 'routine'
+
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    cache_key TEXT NOT NULL,
+    label TEXT NOT NULL,
+    includes_data INTEGER NOT NULL,
+    complete INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS snapshots_by_key ON snapshots (cache_key);
+CREATE TABLE IF NOT EXISTS stamps (
+    snapshot_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    stamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stamps_by_snapshot ON stamps (snapshot_id);
+CREATE TABLE IF NOT EXISTS tables (
+    snapshot_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    catalog_name TEXT NOT NULL,
+    schema_name TEXT NOT NULL,
+    name TEXT NOT NULL,
+    first INTEGER NOT NULL,
+    fingerprint BLOB NOT NULL,
+    element BLOB NOT NULL,
+    PRIMARY KEY (snapshot_id, position)
+);
+CREATE INDEX IF NOT EXISTS tables_by_key ON tables (snapshot_id, catalog_name, schema_name, name, first);
+CREATE TABLE IF NOT EXISTS columns (
+    snapshot_id INTEGER NOT NULL,
+    table_position INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (snapshot_id, table_position, position)
+);
+CREATE INDEX IF NOT EXISTS columns_by_name ON columns (snapshot_id, table_position, name);
+CREATE TABLE IF NOT EXISTS indexes (
+    snapshot_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    catalog_name TEXT NOT NULL,
+    schema_name TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    index_name TEXT NOT NULL,
+    element BLOB NOT NULL,
+    PRIMARY KEY (snapshot_id, position)
+);
+CREATE INDEX IF NOT EXISTS indexes_by_key ON indexes (snapshot_id, catalog_name, schema_name, table_name, index_name);
+CREATE TABLE IF NOT EXISTS inserts (
+    snapshot_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    catalog_name TEXT NOT NULL,
+    schema_name TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    element BLOB NOT NULL,
+    PRIMARY KEY (snapshot_id, position)
+);
+CREATE INDEX IF NOT EXISTS inserts_by_key ON inserts (snapshot_id, catalog_name, schema_name, table_name);
+CREATE TABLE IF NOT EXISTS load_data (
+    snapshot_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    catalog_name TEXT NOT NULL,
+    schema_name TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    csv_path TEXT NOT NULL,
+    element BLOB NOT NULL,
+    PRIMARY KEY (snapshot_id, position)
+);
+CREATE TABLE IF NOT EXISTS objects (
+    snapshot_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    catalog_name TEXT NOT NULL,
+    schema_name TEXT NOT NULL,
+    name TEXT NOT NULL,
+    fingerprint BLOB NOT NULL,
+    element BLOB NOT NULL,
+    PRIMARY KEY (snapshot_id, kind, position)
+);
+CREATE INDEX IF NOT EXISTS objects_by_key ON objects (snapshot_id, kind, tag, catalog_name, schema_name, name);
+"""
+
+# Tables holding the rows of a snapshot, emptied when it is replaced
+SNAPSHOT_TABLES = ('stamps', 'tables', 'columns', 'indexes', 'inserts', 'load_data', 'objects')
+
+CREATED_TABLES_QUERY = """
+SELECT c.catalog_name, c.schema_name, c.name, c.element FROM tables c
+WHERE c.snapshot_id = :current AND NOT EXISTS (
+    SELECT 1 FROM tables p WHERE p.snapshot_id = :previous AND p.catalog_name = c.catalog_name
+    AND p.schema_name = c.schema_name AND p.name = c.name)
+ORDER BY c.position
+"""
+
+# Columns of a table missing from the first table of the same key on the other side; tables
+# whose fingerprints match have the same columns and are never looked into. CROSS JOIN keeps
+# SQLite from reordering the joins: walking the tables first lets every lookup use an index.
+MISSING_COLUMNS_QUERY = """
+SELECT t.position, t.catalog_name, t.schema_name, t.name, tc.position, tc.name FROM tables t
+CROSS JOIN tables o ON o.snapshot_id = :other AND o.first = 1 AND o.catalog_name = t.catalog_name
+    AND o.schema_name = t.schema_name AND o.name = t.name AND o.fingerprint != t.fingerprint
+CROSS JOIN columns tc ON tc.snapshot_id = t.snapshot_id AND tc.table_position = t.position
+WHERE t.snapshot_id = :snapshot AND NOT EXISTS (
+    SELECT 1 FROM columns oc WHERE oc.snapshot_id = o.snapshot_id AND oc.table_position = o.position
+    AND oc.name = tc.name)
+ORDER BY t.position, tc.position
+"""
+
+FIRST_TABLE_QUERY = """
+SELECT element FROM tables WHERE snapshot_id = ? AND catalog_name = ? AND schema_name = ? AND name = ? AND first = 1
+"""
+
+# Inserts into tables without any insert on the other side, grouped by table in first-appearance order
+NEW_INSERTS_QUERY = """
+SELECT catalog_name, schema_name, table_name, element FROM (
+    SELECT c.*, MIN(c.position) OVER (PARTITION BY c.catalog_name, c.schema_name, c.table_name) AS group_position
+    FROM inserts c
+    WHERE c.snapshot_id = :current AND NOT EXISTS (
+        SELECT 1 FROM inserts p WHERE p.snapshot_id = :previous AND p.catalog_name = c.catalog_name
+        AND p.schema_name = c.schema_name AND p.table_name = c.table_name))
+ORDER BY group_position, position
+"""
+
+MISSING_INDEXES_QUERY = """
+SELECT t.catalog_name, t.schema_name, t.table_name, t.index_name, t.element FROM indexes t
+WHERE t.snapshot_id = :snapshot AND NOT EXISTS (
+    SELECT 1 FROM indexes o WHERE o.snapshot_id = :other AND o.catalog_name = t.catalog_name
+    AND o.schema_name = t.schema_name AND o.table_name = t.table_name AND o.index_name = t.index_name)
+ORDER BY t.position
+"""
+
+LOAD_DATA_QUERY = """
+SELECT catalog_name, schema_name, table_name, csv_path, element FROM load_data WHERE snapshot_id = ? ORDER BY position
+"""
+
+DROPPED_OBJECTS_QUERY = """
+SELECT p.tag, p.catalog_name, p.schema_name, p.name, p.element FROM objects p
+WHERE p.snapshot_id = :previous AND p.kind = :kind AND NOT EXISTS (
+    SELECT 1 FROM objects c WHERE c.snapshot_id = :current AND c.kind = p.kind AND c.tag = p.tag
+    AND c.catalog_name = p.catalog_name AND c.schema_name = p.schema_name AND c.name = p.name)
+ORDER BY p.position
+"""
+
+# New objects, and objects whose signature (fingerprint) differs from the previous definition
+CHANGED_OBJECTS_QUERY = """
+SELECT c.tag, c.catalog_name, c.schema_name, c.name, c.element, p.element FROM objects c
+LEFT JOIN objects p ON p.snapshot_id = :previous AND p.kind = c.kind AND p.tag = c.tag
+    AND p.catalog_name = c.catalog_name AND p.schema_name = c.schema_name AND p.name = c.name
+WHERE c.snapshot_id = :current AND c.kind = :kind AND (p.element IS NULL OR p.fingerprint != c.fingerprint)
+ORDER BY c.position
+"""
+
+
+def dump_element(element):
+    return pickle.dumps(element, pickle.HIGHEST_PROTOCOL)
+
+
+def load_element(data):
+    return pickle.loads(data)
+
+
+class SqliteSnapshotStore:
+    """Snapshots kept in a local SQLite file and diffed there with set-based queries.
+
+    A snapshot is written in one transaction and only then marked complete, under the
+    cache key of its changelog (see ChangelogSource.cache_key) and the stamps of the files
+    it was parsed from. A run that was interrupted finds the snapshots it had finished and
+    only parses the rest; a changed file makes its snapshot stale and it is parsed again.
+
+    Elements are stored pickled next to their key columns and fingerprints. The diff queries
+    compare keys and fingerprints inside SQLite (anti-joins for created and dropped objects,
+    joins on fingerprint for changed ones) and only unpickle the elements a change is built
+    from, so memory stays bounded by the size of the migration rather than of the schema.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != STORE_VERSION:
+            self.connection.executescript(''.join(f"DROP TABLE IF EXISTS {table};\n"
+                                                  for table in ('snapshots', *SNAPSHOT_TABLES)))
+            self.connection.execute(f'PRAGMA user_version = {STORE_VERSION}')
+        self.connection.executescript(STORE_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def find_snapshot(self, cache_key, source):
+        """Return (id, includes data) of the complete snapshot stored under cache_key, or None.
+
+        A snapshot some of whose files changed since it was stored is removed instead.
+        """
+        row = self.connection.execute('SELECT id, includes_data FROM snapshots WHERE cache_key = ? AND complete = 1',
+                                      (cache_key,)).fetchone()
+        if row is None:
+            return None
+        stamps = self.connection.execute('SELECT path, stamp FROM stamps WHERE snapshot_id = ?', (row[0],))
+        if source is None or any(json.dumps(source.stamp(path)) != stamp for path, stamp in stamps):
+            with self.connection:
+                self.delete_snapshot(row[0])
+            return None
+        return row[0], bool(row[1])
+
+    def write_snapshot(self, cache_key, snapshot):
+        """Store a ChangelogSnapshot under cache_key, replacing what was stored there, and return its id."""
+        connection = self.connection
+        with connection:
+            for (snapshot_id,) in connection.execute('SELECT id FROM snapshots WHERE cache_key = ?',
+                                                     (cache_key,)).fetchall():
+                self.delete_snapshot(snapshot_id)
+            snapshot_id = connection.execute('INSERT INTO snapshots (cache_key, label, includes_data) VALUES (?, ?, ?)',
+                                             (cache_key, snapshot.label, int(snapshot.includes_data))).lastrowid
+
+            connection.executemany('INSERT INTO stamps VALUES (?, ?, ?)',
+                                   ((snapshot_id, path, json.dumps(stamp)) for path, stamp in snapshot.stamps))
+            connection.executemany('INSERT INTO tables VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                   self.table_rows(snapshot_id, snapshot.tables))
+            connection.executemany('INSERT INTO columns VALUES (?, ?, ?, ?)',
+                                   ((snapshot_id, table_position, position, column.getAttribute('name'))
+                                    for table_position, table in enumerate(snapshot.tables)
+                                    for position, column in enumerate(table.getElementsByTagName('column'))))
+            connection.executemany('INSERT INTO indexes VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                   ((snapshot_id, position, *object_key(index), index.getAttribute('indexName'),
+                                     dump_element(index)) for position, index in enumerate(snapshot.indexes)))
+            connection.executemany('INSERT INTO inserts VALUES (?, ?, ?, ?, ?, ?)',
+                                   ((snapshot_id, position, *object_key(insert), dump_element(insert))
+                                    for position, insert in enumerate(snapshot.inserts)))
+            connection.executemany('INSERT INTO load_data VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                   ((snapshot_id, position, *object_key(element), csv_path, dump_element(element))
+                                    for position, (element, csv_path, _) in enumerate(snapshot.load_data)))
+            objects = itertools.chain(((VIEW, view.tagName, key, view) for key, view in snapshot.views.items()),
+                                      ((SEQUENCE, sequence.tagName, key, sequence)
+                                       for key, sequence in snapshot.sequences.items()),
+                                      ((ROUTINE, tag, key, routine)
+                                       for (tag, key), routine in snapshot.routines.items()))
+            connection.executemany('INSERT INTO objects VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                   ((snapshot_id, kind, position, tag, *key, element.fingerprint(),
+                                     dump_element(element))
+                                    for position, (kind, tag, key, element) in enumerate(objects)))
+            connection.execute('UPDATE snapshots SET complete = 1 WHERE id = ?', (snapshot_id,))
+        return snapshot_id
+
+    def table_rows(self, snapshot_id, tables):
+        seen = set()
+        for position, table in enumerate(tables):
+            key = object_key(table)
+            # Lookups by key find the first definition of a key, as the comparer's index_tables_by_key does
+            first = key not in seen
+            seen.add(key)
+            yield snapshot_id, position, *key, int(first), table.fingerprint(), dump_element(table)
+
+    def delete_snapshot(self, snapshot_id):
+        for table in SNAPSHOT_TABLES:
+            self.connection.execute(f'DELETE FROM {table} WHERE snapshot_id = ?', (snapshot_id,))
+        self.connection.execute('DELETE FROM snapshots WHERE id = ?', (snapshot_id,))
+
+    def created_tables(self, previous, current):
+        """Yield (key, createTable element) for tables of current with no table of their key in previous."""
+        for catalog, schema, name, element in self.connection.execute(CREATED_TABLES_QUERY,
+                                                                      {'previous': previous, 'current': current}):
+            yield qualified_key(catalog, schema, name), load_element(element)
+
+    def dropped_tables(self, previous, current):
+        """Yield the keys of the tables of previous with no table of their key in current."""
+        for catalog, schema, name, _ in self.connection.execute(CREATED_TABLES_QUERY,
+                                                                {'previous': current, 'current': previous}):
+            yield qualified_key(catalog, schema, name)
+
+    def added_columns(self, previous, current):
+        """Yield (key, added column elements) for the tables of current whose columns are not all in previous."""
+        rows = self.connection.execute(MISSING_COLUMNS_QUERY, {'snapshot': current, 'other': previous})
+        for (table_position, catalog, schema, name), table_rows in itertools.groupby(rows, key=lambda row: row[:4]):
+            columns = self.load_table(current, table_position).getElementsByTagName('column')
+            yield qualified_key(catalog, schema, name), [columns[row[4]] for row in table_rows]
+
+    def dropped_columns(self, previous, current):
+        """Yield (key, dropped column names) for the tables of previous with columns missing from current."""
+        rows = self.connection.execute(MISSING_COLUMNS_QUERY, {'snapshot': previous, 'other': current})
+        for (_, catalog, schema, name), table_rows in itertools.groupby(rows, key=lambda row: row[:4]):
+            yield qualified_key(catalog, schema, name), [row[5] for row in table_rows]
+
+    def load_table(self, snapshot_id, position):
+        return load_element(self.connection.execute('SELECT element FROM tables WHERE snapshot_id = ? AND position = ?',
+                                                    (snapshot_id, position)).fetchone()[0])
+
+    def first_table(self, snapshot_id, key):
+        """Return the first createTable element of a key, or None."""
+        row = self.connection.execute(FIRST_TABLE_QUERY, (snapshot_id, *key)).fetchone()
+        return load_element(row[0]) if row else None
+
+    def new_inserts(self, previous, current):
+        """Yield (key, insert elements) per table of current that has inserts and none in previous."""
+        rows = self.connection.execute(NEW_INSERTS_QUERY, {'previous': previous, 'current': current})
+        for (catalog, schema, name), table_rows in itertools.groupby(rows, key=lambda row: row[:3]):
+            yield qualified_key(catalog, schema, name), [load_element(row[3]) for row in table_rows]
+
+    def created_indexes(self, previous, current):
+        """Yield (key, index name, createIndex element) for indexes of current missing from previous."""
+        for catalog, schema, table_name, index_name, element in self.connection.execute(
+                MISSING_INDEXES_QUERY, {'snapshot': current, 'other': previous}):
+            yield qualified_key(catalog, schema, table_name), index_name, load_element(element)
+
+    def dropped_indexes(self, previous, current):
+        """Yield (key, index name) for indexes of previous missing from current."""
+        for catalog, schema, table_name, index_name, _ in self.connection.execute(
+                MISSING_INDEXES_QUERY, {'snapshot': previous, 'other': current}):
+            yield qualified_key(catalog, schema, table_name), index_name
+
+    def load_data(self, snapshot_id, source):
+        """Return the (loadData element, CSV path, source) entries of a snapshot, read with the given source."""
+        return [(load_element(element), csv_path, source)
+                for _, _, _, csv_path, element in self.connection.execute(LOAD_DATA_QUERY, (snapshot_id,))]
+
+    def dropped_objects(self, previous, current, kind):
+        """Yield (tag, key, element) for the views, sequences or routines of previous missing from current."""
+        for tag, catalog, schema, name, element in self.connection.execute(
+                DROPPED_OBJECTS_QUERY, {'previous': previous, 'current': current, 'kind': kind}):
+            yield tag, qualified_key(catalog, schema, name), load_element(element)
+
+    def changed_objects(self, previous, current, kind):
+        """Yield (tag, key, element, previous element or None) for new and changed objects of current."""
+        for tag, catalog, schema, name, element, prev_element in self.connection.execute(
+                CHANGED_OBJECTS_QUERY, {'previous': previous, 'current': current, 'kind': kind}):
+            yield (tag, qualified_key(catalog, schema, name), load_element(element),
+                   load_element(prev_element) if prev_element is not None else None)
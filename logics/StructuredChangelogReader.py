@@ -0,0 +1,128 @@
+import json
+import sys
+
+from logics.LiquibaseYamlLoader import load_yaml
+from logics.SchemaElement import SchemaElement
+
+# Keys whose string value is the text of the element itself, e.g. sql: {sql: "..."}
+ELEMENT_TEXT_KEYS = {'sql', 'selectQuery', 'procedureText', 'procedureBody', 'functionBody'}
+
+# Keys whose string value is a child element holding text, as <where> and <comment> are in XML
+CHILD_TEXT_KEYS = {'where', 'comment'}
+
+# Changelog file extensions by format
+YAML_EXTENSIONS = ('.yaml', '.yml')
+JSON_EXTENSIONS = ('.json',)
+
+
+def is_structured_changelog(path):
+    return path.lower().endswith(YAML_EXTENSIONS + JSON_EXTENSIONS)
+
+
+def parse_structured_changelog(path, data, table_filter=None):
+    """Parse YAML or JSON changelog bytes into a databaseChangeLog SchemaElement tree.
+
+    Changes a table_filter (see TableFilter) rejects are dropped before they are built.
+    """
+    text = data.decode('utf-8-sig') if isinstance(data, (bytes, bytearray)) else bytes(data).decode('utf-8-sig')
+    if path.lower().endswith(JSON_EXTENSIONS):
+        entries = iter_json_changelog_entries(text)
+    else:
+        document = load_yaml(text) or {}
+        entries = document.get('databaseChangeLog') or []
+
+    return SchemaElement('databaseChangeLog', children=[element for entry in entries
+                                                        for element in entry_elements(entry, table_filter)])
+
+
+def iter_json_changelog_entries(text):
+    """Yield the entries of the databaseChangeLog array one at a time.
+
+    Each changeSet/include object is decoded on its own with raw_decode and converted before
+    the next one is read, so the whole changelog never exists as one big dict. Files that do
+    not start with a databaseChangeLog array fall back to a plain json.loads.
+    """
+    decoder = json.JSONDecoder()
+    position = skip_whitespace(text, 0)
+    key = '"databaseChangeLog"'
+    if not text.startswith('{', position):
+        raise ValueError("JSON changelog must be an object with a databaseChangeLog array")
+    position = skip_whitespace(text, position + 1)
+    if not text.startswith(key, position):
+        yield from json.loads(text).get('databaseChangeLog') or []
+        return
+
+    position = skip_whitespace(text, position + len(key))
+    if not text.startswith(':', position):
+        raise ValueError("expected ':' after databaseChangeLog")
+    position = skip_whitespace(text, position + 1)
+    if not text.startswith('[', position):
+        raise ValueError("databaseChangeLog must be an array")
+    position = skip_whitespace(text, position + 1)
+
+    while not text.startswith(']', position):
+        entry, position = decoder.raw_decode(text, position)
+        yield entry
+        position = skip_whitespace(text, position)
+        if text.startswith(',', position):
+            position = skip_whitespace(text, position + 1)
+        elif not text.startswith(']', position):
+            raise ValueError(f"expected ',' or ']' at offset {position} of the databaseChangeLog array")
+
+
+def skip_whitespace(text, position):
+    while position < len(text) and text[position] in ' \t\r\n':
+        position += 1
+    return position
+
+
+def entry_elements(entry, table_filter=None):
+    """Return the elements of one databaseChangeLog entry, e.g. {'changeSet': {...}}."""
+    if not isinstance(entry, dict):
+        return []
+    return [build_element(tag, value, table_filter) for tag, value in entry.items()]
+
+
+def build_element(tag, value, table_filter=None):
+    """Convert one Liquibase YAML/JSON node into a SchemaElement laid out like its XML form.
+
+    Scalars become attributes, nested mappings become child elements and lists (changes,
+    columns, ...) contribute their items as children directly, as they appear in XML.
+    """
+    element = SchemaElement(tag)
+    if not isinstance(value, dict):
+        if value is not None:
+            element.text = attribute_value(value)
+        return element
+
+    for key, item in value.items():
+        if item is None:
+            continue
+        if isinstance(item, list):
+            for child in item:
+                if isinstance(child, dict):
+                    for child_tag, child_value in child.items():
+                        if table_filter is None or table_filter.includes(
+                                child_tag, child_value if isinstance(child_value, dict) else {}, tag,
+                                value.get('tableName', '')):
+                            child_element = build_element(child_tag, child_value, table_filter)
+                            if table_filter is None or table_filter.includes_index(child_element):
+                                element.append_child(child_element)
+                else:
+                    element.append_child(build_element(key, child, table_filter))
+        elif isinstance(item, dict):
+            element.append_child(build_element(key, item, table_filter))
+        elif key == tag or key in ELEMENT_TEXT_KEYS:
+            element.text = attribute_value(item)
+        elif key in CHILD_TEXT_KEYS:
+            element.append_child(SchemaElement(key, text=attribute_value(item)))
+        else:
+            element.attributes[key] = sys.intern(attribute_value(item))
+    return element
+
+
+def attribute_value(value):
+    """Return a scalar as the string XML would carry; JSON booleans become 'true'/'false'."""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
@@ -0,0 +1,60 @@
+from collections import OrderedDict
+
+
+class TableDiffCache:
+    """Bounded LRU cache of table-level diff results keyed by (previous, current) table fingerprints.
+
+    The cached value is the change list of a table pair, not changesets: changeset IDs are
+    stamped fresh every time the changes are written out.
+    """
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached value for key, or None; counts as a hit or a miss."""
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        """Return hit/miss statistics as a plain dict."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self.entries),
+            'max_size': self.max_size,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+def merge_cache_stats(all_stats):
+    """Add up the statistics of several caches, e.g. one per worker process."""
+    merged = {'hits': 0, 'misses': 0, 'evictions': 0, 'size': 0, 'max_size': 0}
+    for stats in all_stats:
+        for name in merged:
+            merged[name] += stats[name]
+    lookups = merged['hits'] + merged['misses']
+    merged['hit_rate'] = merged['hits'] / lookups if lookups else 0.0
+    return merged
@@ -0,0 +1,114 @@
+import fnmatch
+import re
+
+# Prefix marking a filter pattern as a regular expression; any other pattern is a glob
+REGEX_PATTERN_PREFIX = 're:'
+
+# Attributes naming the table a change element applies to
+TABLE_NAME_ATTRIBUTES = ('tableName', 'baseTableName')
+
+# Change elements whose <column> children are filtered by the column patterns
+COLUMN_PARENT_TAGS = {'createTable', 'addColumn', 'dropColumn', 'insert', 'update'}
+
+
+def compile_patterns(patterns):
+    """Compile glob and 're:' patterns into one case-insensitive regex matching whole names, or None."""
+    parts = []
+    for pattern in patterns:
+        if pattern.startswith(REGEX_PATTERN_PREFIX):
+            parts.append(f"(?:{pattern[len(REGEX_PATTERN_PREFIX):]})\\Z")
+        else:
+            parts.append(fnmatch.translate(pattern))
+    return re.compile('|'.join(parts), re.IGNORECASE) if parts else None
+
+
+def split_patterns(value):
+    """Split a comma-separated option value into patterns; a 're:' pattern is taken whole."""
+    if value.startswith(REGEX_PATTERN_PREFIX):
+        return [value]
+    return [pattern.strip() for pattern in value.split(',') if pattern.strip()]
+
+
+class TableFilter:
+    """Include/exclude filters on table names, and exclude filters on column names.
+
+    Patterns are globs ('m_loan*') or regular expressions ('re:m_(loan|client)_.*'),
+    matched case-insensitively against the whole name and compiled into a single regex per
+    list. A table is selected when it matches an include pattern (or there are none) and no
+    exclude pattern. Column patterns match 'column' or 'table.column'.
+
+    The changelog readers ask includes() before they build an element, so a change to a
+    filtered-out table is skipped together with everything inside it. Views, sequences and
+    routines belong to no table and are not filtered.
+    """
+
+    def __init__(self, include_tables=(), exclude_tables=(), exclude_columns=()):
+        self.include_tables = tuple(include_tables)
+        self.exclude_tables = tuple(exclude_tables)
+        self.exclude_columns = tuple(exclude_columns)
+        self.include_pattern = compile_patterns(self.include_tables)
+        self.exclude_pattern = compile_patterns(self.exclude_tables)
+        self.column_pattern = compile_patterns(self.exclude_columns)
+        self.table_decisions = {}  # table name -> selected, decided once per name
+
+    @property
+    def key(self):
+        """Return a hashable key of the patterns, for caches of filtered snapshots."""
+        return self.include_tables, self.exclude_tables, self.exclude_columns
+
+    def includes_table(self, table_name):
+        selected = self.table_decisions.get(table_name)
+        if selected is None:
+            selected = ((self.include_pattern is None or self.include_pattern.match(table_name) is not None)
+                        and (self.exclude_pattern is None or self.exclude_pattern.match(table_name) is None))
+            self.table_decisions[table_name] = selected
+        return selected
+
+    def includes_column(self, table_name, column_name):
+        if self.column_pattern is None:
+            return True
+        return (self.column_pattern.match(column_name) is None
+                and self.column_pattern.match(f"{table_name}.{column_name}") is None)
+
+    def includes(self, tag_name, attributes, parent_tag_name=None, parent_table_name=''):
+        """Tell whether an element, given as its tag and attribute dict, is kept.
+
+        A change naming a filtered-out table is dropped, and so is a <column> of a table
+        change (createTable, addColumn, insert, ...) whose name an exclude pattern matches.
+        Indexes are checked against the column patterns once built, see includes_index.
+        """
+        for name in TABLE_NAME_ATTRIBUTES:
+            table_name = attributes.get(name)
+            if table_name is not None:
+                if tag_name == 'dropColumn' and 'columnName' in attributes:
+                    return self.includes_table(table_name) and self.includes_column(table_name,
+                                                                                    attributes['columnName'])
+                return self.includes_table(table_name)
+        if tag_name == 'column' and parent_tag_name in COLUMN_PARENT_TAGS:
+            return self.includes_column(parent_table_name, attributes.get('name', ''))
+        return True
+
+    def prune(self, elements, parent=None):
+        """Return the elements that are kept, with excluded children removed from them in place.
+
+        Used where a reader builds a change before it can be filtered, e.g. from a SQL statement.
+        """
+        kept = []
+        for element in elements:
+            parent_tag_name = parent.tagName if parent is not None else None
+            parent_table_name = parent.getAttribute('tableName') if parent is not None else ''
+            if not self.includes(element.tagName, element.attributes, parent_tag_name, parent_table_name):
+                continue
+            if element.children:
+                element.children = self.prune(element.children, element)
+            if self.includes_index(element):
+                kept.append(element)
+        return kept
+
+    def includes_index(self, element):
+        """Tell whether a built element is kept: False for a createIndex over an excluded column."""
+        if element.tagName != 'createIndex' or self.column_pattern is None:
+            return True
+        table_name = element.getAttribute('tableName')
+        return all(self.includes_column(table_name, column.getAttribute('name'))
+                   for column in element.children if column.tagName == 'column')
@@ -0,0 +1,281 @@
+import itertools
+import json
+
+from logics.ChangeLogComparator import LiquibaseChangelogComparer
+from logics.ChangeSerializers import get_serializer
+from logics.ChangelogSnapshot import ChangelogSnapshot, seed_data_digest
+from logics.ObjectKey import format_key, object_key
+from logics.SchemaElement import SchemaElement
+
+# Side whose definition is kept when both branches changed an object differently
+CONFLICT_RESOLUTION = 'ours'
+
+
+def fingerprint(element):
+    return element.fingerprint()
+
+
+def definition_fingerprint(element):
+    return element.definition_fingerprint()
+
+
+def group_fingerprints(elements):
+    return tuple(element.fingerprint() for element in elements)
+
+
+def load_data_fingerprints(entries):
+    """Identify the loadData entries of a table by their elements and the content of their files."""
+    return tuple((element.fingerprint(), seed_data_digest(source, csv_path)) for element, csv_path, source in entries)
+
+
+def first_by_key(elements, key=object_key):
+    """Return {key: element}; the first definition of a key wins, as in the comparer."""
+    by_key = {}
+    for element in elements:
+        by_key.setdefault(key(element), element)
+    return by_key
+
+
+def index_key(index):
+    return object_key(index), index.getAttribute('indexName')
+
+
+def describe_index_key(key):
+    return f"{format_key(key[0])} {key[1]}"
+
+
+def group_by_key(items, key):
+    groups = {}
+    for item in items:
+        groups.setdefault(key(item), []).append(item)
+    return groups
+
+
+def merged_key_order(base, ours, theirs):
+    """Keys of ours in order, then those only theirs has, then those only base has."""
+    return dict.fromkeys(itertools.chain(ours, theirs, base))
+
+
+class SnapshotMerge:
+    """Three-way merge of the snapshots of two branches of a common base.
+
+    Objects are matched by key and compared by fingerprint: an object one branch left as
+    it was in base takes the other branch's definition, and one both branches changed the
+    same way is taken once. A table both branches changed differently is merged attribute
+    by attribute and column by column, and inserts into a table both branches changed are
+    merged row by row (rows either branch added are kept, rows either branch removed are
+    dropped). Anything else changed differently on both branches is a conflict: ours is
+    kept and the conflict is recorded in conflicts.
+
+    Only keys touched on either branch are merged. merge returns the base and merged
+    snapshots narrowed to those keys; unchanged objects would diff to nothing, so diffing
+    the two gives the migration from base to the merged schema.
+    """
+
+    def __init__(self, base, ours, theirs, label='merged'):
+        self.base = base
+        self.ours = ours
+        self.theirs = theirs
+        self.label = label
+        self.conflicts = []
+
+    def merge(self):
+        """Return (base snapshot, merged snapshot), both holding only the keys touched on either branch."""
+        base_part = ChangelogSnapshot(self.base.label)
+        merged = ChangelogSnapshot(self.label)
+        base_part.includes_data = self.base.includes_data
+        merged.includes_data = self.ours.includes_data and self.theirs.includes_data
+        base_part.source = self.base.source
+        merged.source = self.ours.source
+
+        snapshots = (self.base, self.ours, self.theirs)
+        table_maps = [first_by_key(snapshot.tables) for snapshot in snapshots]
+        base_tables, merged_tables = self.merge_objects('table', *table_maps, fingerprint, format_key,
+                                                        self.merge_table)
+        # Tables some side has that are not merged (unchanged tables are on all sides); objects a
+        # branch added to them have nothing to refer to
+        dropped_tables = set().union(*table_maps) - set(table_maps[0]).intersection(*table_maps[1:])
+        dropped_tables.difference_update(merged_tables)
+
+        base_indexes, merged_indexes = self.merge_objects(
+            'index', *(first_by_key(snapshot.indexes, index_key) for snapshot in snapshots), fingerprint,
+            describe_index_key)
+        base_part.indexes = list(base_indexes.values())
+        merged.indexes = self.without_dropped_tables('index', merged_indexes, dropped_tables, describe_index_key,
+                                                     lambda key: key[0])
+
+        base_inserts, merged_inserts = self.merge_objects(
+            'insert', *(group_by_key(snapshot.inserts, object_key) for snapshot in snapshots), group_fingerprints,
+            format_key, self.merge_inserts)
+        base_part.inserts = [insert for inserts in base_inserts.values() for insert in inserts]
+        merged.inserts = [insert for inserts in self.without_dropped_tables('insert', merged_inserts, dropped_tables,
+                                                                            format_key)
+                          for insert in inserts]
+
+        base_load_data, merged_load_data = self.merge_objects(
+            'loadData', *(group_by_key(snapshot.load_data, lambda entry: object_key(entry[0]))
+                          for snapshot in snapshots), load_data_fingerprints, format_key)
+        base_part.load_data = [entry for entries in base_load_data.values() for entry in entries]
+        merged.load_data = [entry for entries in self.without_dropped_tables('loadData', merged_load_data,
+                                                                             dropped_tables, format_key)
+                            for entry in entries]
+
+        # The comparer reads the primary keys of changed seed data from the tables, so those come along
+        for key in dict.fromkeys(object_key(entry[0]) for entry in merged.load_data):
+            if key not in base_tables and key not in merged_tables and key in table_maps[0]:
+                base_tables[key] = merged_tables[key] = table_maps[0][key]
+        base_part.tables = [table for key, table in table_maps[0].items() if key in base_tables]
+        merged.tables = list(merged_tables.values())
+
+        base_part.views, merged.views = self.merge_objects(
+            'view', self.base.views, self.ours.views, self.theirs.views, definition_fingerprint, format_key)
+        base_part.sequences, merged.sequences = self.merge_objects(
+            'sequence', self.base.sequences, self.ours.sequences, self.theirs.sequences, fingerprint, format_key)
+        base_part.routines, merged.routines = self.merge_objects(
+            'routine', self.base.routines, self.ours.routines, self.theirs.routines, definition_fingerprint,
+            lambda key: format_key(key[1]))
+        return base_part, merged
+
+    def merge_objects(self, kind, base, ours, theirs, identity, describe, merge_both=None):
+        """Three-way merge {key: object} maps; return ({key: base object}, {key: merged object}) of the touched keys.
+
+        The base map keeps base order, the merged map the order of merged_key_order.
+        """
+        base_part, merged = {}, {}
+        for key in merged_key_order(base, ours, theirs):
+            base_value, ours_value, theirs_value = base.get(key), ours.get(key), theirs.get(key)
+            identities = [identity(value) if value is not None else None
+                          for value in (base_value, ours_value, theirs_value)]
+            if identities[0] == identities[1] == identities[2]:
+                continue
+            value = self.merge_value(kind, describe(key), base_value, ours_value, theirs_value, identities, merge_both)
+            if base_value is not None:
+                base_part[key] = base_value
+            if value is not None:
+                merged[key] = value
+        return {key: value for key, value in base.items() if key in base_part}, merged
+
+    def merge_value(self, kind, name, base, ours, theirs, identities, merge_both=None):
+        """Return the merged object (None when the merge has none) given the identities of the three sides."""
+        base_identity, ours_identity, theirs_identity = identities
+        if ours_identity == theirs_identity or theirs_identity == base_identity:
+            return ours
+        if ours_identity == base_identity:
+            return theirs
+        if merge_both is not None and ours is not None and theirs is not None:
+            return merge_both(name, base, ours, theirs)
+        self.add_conflict(kind, name, base, ours, theirs)
+        return ours
+
+    def add_conflict(self, kind, name, base, ours, theirs):
+        if base is None:
+            reason = 'added differently on both branches'
+        elif ours is None:
+            reason = 'dropped on ours, changed on theirs'
+        elif theirs is None:
+            reason = 'changed on ours, dropped on theirs'
+        else:
+            reason = 'changed differently on both branches'
+        self.conflicts.append({'object': kind, 'name': name, 'reason': reason, 'resolution': CONFLICT_RESOLUTION})
+
+    def merge_table(self, name, base, ours, theirs):
+        """Merge a createTable both branches changed: attributes one by one, then columns by name."""
+        base_attributes = base.attributes if base is not None else {}
+        attributes = {}
+        for attribute in merged_key_order(base_attributes, ours.attributes, theirs.attributes):
+            values = (base_attributes.get(attribute), ours.attributes.get(attribute),
+                      theirs.attributes.get(attribute))
+            value = self.merge_value('table attribute', f"{name} {attribute}", *values, values)
+            if value is not None:
+                attributes[attribute] = value
+
+        sides = [first_by_key((child for child in table.children if child.tagName == 'column'),
+                              lambda column: column.getAttribute('name')) if table is not None else {}
+                 for table in (base, ours, theirs)]
+        children = []
+        for column_name in merged_key_order(*sides):
+            columns = [side.get(column_name) for side in sides]
+            identities = [column.fingerprint() if column is not None else None for column in columns]
+            column = self.merge_value('column', f"{name}.{column_name}", *columns, identities)
+            if column is not None:
+                children.append(column)
+        children.extend(child for child in ours.children if child.tagName != 'column')
+        return SchemaElement(ours.tagName, attributes, children, ours.text)
+
+    def merge_inserts(self, name, base, ours, theirs):
+        """Merge the inserts into a table row by row: rows either branch added are kept, removed ones dropped."""
+        base_rows = set(group_fingerprints(base or ()))
+        theirs_rows = set(group_fingerprints(theirs))
+        ours_rows = set(group_fingerprints(ours))
+        rows = [insert for insert in ours
+                if insert.fingerprint() in theirs_rows or insert.fingerprint() not in base_rows]
+        return rows + [insert for insert in theirs
+                       if insert.fingerprint() not in base_rows and insert.fingerprint() not in ours_rows]
+
+    def without_dropped_tables(self, kind, merged, dropped_tables, describe, table_key=lambda key: key):
+        """Return the merged objects whose table is still there, recording the others as conflicts."""
+        kept = {}
+        for key, value in merged.items():
+            if table_key(key) in dropped_tables:
+                self.conflicts.append({'object': kind, 'name': describe(key),
+                                       'reason': 'table dropped on the other branch', 'resolution': 'dropped'})
+            else:
+                kept[key] = value
+        return list(kept.values())
+
+
+class ThreeWayChangelogMerger:
+    """Generate the migration from a base changelog to the merge of two branches of it.
+
+    base, ours and theirs are changelog specs as the comparer loads them (file paths,
+    'revision:path', 'sqlite:path' or 'stored:NAME'); each is parsed once. See SnapshotMerge
+    for how the branches are merged and conflicts resolved.
+    """
+
+    def __init__(self, base_spec, ours_spec, theirs_spec, comparer_options=None):
+        self.base_spec = base_spec
+        self.ours_spec = ours_spec
+        self.theirs_spec = theirs_spec
+        self.label = f"{ours_spec} + {theirs_spec}"
+        self.comparer = LiquibaseChangelogComparer(base_spec, self.label, **(comparer_options or {}))
+        self.conflicts = []
+
+    def merge_changes(self):
+        """Return the change records of the merge migration, IDs stamped; conflicts are kept in conflicts."""
+        try:
+            base, ours, theirs = (self.comparer.load_snapshot(spec)
+                                  for spec in (self.base_spec, self.ours_spec, self.theirs_spec))
+        finally:
+            if self.comparer.git_reader is not None:
+                self.comparer.git_reader.close()
+                self.comparer.git_reader = None
+
+        merge = SnapshotMerge(base, ours, theirs, self.label)
+        base_part, merged = merge.merge()
+        self.conflicts = merge.conflicts
+        return self.comparer.diff_snapshots(base_part, merged)
+
+    def merge_and_generate(self, output_format='xml', report_path=None, conflict_report_path=None):
+        """Return the merge migration in output_format, or None if it could not be generated.
+
+        With a conflict_report_path, the conflicts are written there as JSON (also when there are none).
+        """
+        try:
+            serializer = get_serializer(output_format)
+            changes = self.merge_changes()
+            if report_path:
+                self.comparer.write_report(changes, report_path)
+            if conflict_report_path:
+                self.write_conflict_report(conflict_report_path)
+            return serializer.to_string(changes)
+
+        except Exception as e:
+            print(f"Error generating merge migration script: {e}")
+            return None
+
+    def write_conflict_report(self, path):
+        report = {'base': self.base_spec, 'ours': self.ours_spec, 'theirs': self.theirs_spec,
+                  'conflicts': self.conflicts}
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+            file.write('\n')
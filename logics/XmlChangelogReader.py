@@ -0,0 +1,195 @@
+import hashlib
+import re
+import sys
+from xml.parsers import expat
+
+from logics.SchemaElement import SchemaElement
+
+# Bytes handed to expat per call
+PARSE_CHUNK_SIZE = 1 << 20
+
+# Elements whose text bodies (SQL, view and routine definitions) are not loaded while parsing
+LAZY_TEXT_TAGS = frozenset({'sql', 'createView', 'createProcedure', 'createFunction', 'createTrigger',
+                            'createPackage', 'createPackageBody'})
+
+# Depth of the change elements (databaseChangeLog > changeSet > change); only elements down to it get a
+# span, as the XML writer copies whole changes and never their columns
+SPAN_DEPTH = 2
+
+# Tag and attribute names shared by every parser, so each distinct name is stored once
+NAMES = {}
+
+# encoding="..." of the XML declaration; spans are only kept for UTF-8 (and ASCII) files
+XML_DECLARATION_ENCODING_PATTERN = re.compile(rb'<\?xml[^>]*encoding\s*=\s*["\']([A-Za-z0-9._-]+)["\']')
+
+
+def parse_xml_changelog(data, span_path=None, lazy_text_tags=LAZY_TEXT_TAGS, table_filter=None, span_stamp=None):
+    """Parse an XML changelog (bytes or a memory map) into a databaseChangeLog SchemaElement tree.
+
+    With a span_path, change elements (see SPAN_DEPTH) also get span = (span_path, start, end,
+    span_stamp): the byte range of their markup in the file, which the XML writer can copy
+    instead of rebuilding it, and the stamp of the file as parsed (see FileChangelogSource.stamp),
+    so markup is not copied from a file that changed since. The
+    text of lazy_text_tags elements is then not loaded either; see SchemaElement.text_source.
+    Elements a table_filter (see TableFilter) rejects are left out, with everything inside them.
+    """
+    return XmlChangelogReader(data, span_path, lazy_text_tags, table_filter, span_stamp).read()
+
+
+def read_element_text(text_source):
+    """Load the text of a lazily read element from its changelog file.
+
+    The file is opened for each load and closed again, so no changelog stays open (or, on
+    Windows, locked) between loads. ValueError is raised when the markup no longer matches
+    the digest taken while parsing, i.e. the file changed since.
+    """
+    path, offset, length, digest = text_source
+    with open(path, 'rb') as file:
+        file.seek(offset)
+        markup = file.read(length)
+    if hashlib.blake2b(markup, digest_size=16).digest() != digest:
+        raise ValueError(f"{path} changed since it was parsed")
+    return XmlChangelogReader(markup).read().text
+
+
+class XmlChangelogReader:
+    """Build SchemaElements straight from expat events, without a DOM in between.
+
+    Elements come out as SchemaElement.from_dom would copy them from minidom: attributes in
+    document order, element children, and the text of direct text and CDATA children (dropped
+    when it is only whitespace). Comments and processing instructions are skipped.
+    """
+
+    def __init__(self, data, span_path=None, lazy_text_tags=LAZY_TEXT_TAGS, table_filter=None, span_stamp=None):
+        self.data = data
+        self.span_path = span_path if span_path and self.is_utf8() else None
+        self.span_stamp = span_stamp
+        # Text bodies can only be skipped when they can be read back from the file
+        self.lazy_text_tags = lazy_text_tags if self.span_path else ()
+        self.stack = []       # (element, start offset, text parts or None when lazy) of the open elements
+        self.root = None
+        self.text_lazy = False
+        self.table_filter = table_filter
+        self.skip_depth = 0   # depth inside an element the table filter rejected
+        self.pruned = set()   # ids of open elements that lost a child to the filter; they get no span
+
+    def is_utf8(self):
+        match = XML_DECLARATION_ENCODING_PATTERN.match(self.data[:256].lstrip(b'\xef\xbb\xbf'))
+        return match is None or match.group(1).lower().replace(b'_', b'-') in (b'utf-8', b'utf8', b'us-ascii', b'ascii')
+
+    def read(self):
+        parser = expat.ParserCreate(intern=NAMES)
+        parser.ordered_attributes = True
+        parser.buffer_text = True
+        parser.StartElementHandler = self.start_element
+        parser.EndElementHandler = self.end_element
+        parser.CharacterDataHandler = self.character_data
+        self.parser = parser
+
+        for start in range(0, len(self.data), PARSE_CHUNK_SIZE):
+            parser.Parse(self.data[start:start + PARSE_CHUNK_SIZE], False)
+        parser.Parse(b'', True)
+        return self.root
+
+    def start_element(self, name, attributes):
+        # Values are interned too: type strings, table and column names repeat throughout a changelog
+        attributes = dict(zip(attributes[::2], map(sys.intern, attributes[1::2])))
+        if self.table_filter is not None and not self.filter_includes(name, attributes):
+            self.pruned.add(id(self.stack[-1][0]))
+            self.start_skipping()
+            return
+
+        element = SchemaElement(name, attributes)
+        if self.stack:
+            self.stack[-1][0].append_child(element)
+        else:
+            self.root = element
+        text_parts = None if name in self.lazy_text_tags else []
+        self.stack.append((element, self.parser.CurrentByteIndex, text_parts))
+        self.update_text_handler(text_parts is None)
+
+    def end_element(self, name):
+        element, start, text_parts = self.stack.pop()
+        self.update_text_handler(bool(self.stack) and self.stack[-1][2] is None)
+        pruned = False
+        if self.table_filter is not None:
+            if not self.table_filter.includes_index(element):
+                self.prune_last_child()
+                return
+            if id(element) in self.pruned:
+                # Its markup still holds the filtered-out children, so it gets no span to copy
+                self.pruned.discard(id(element))
+                if self.stack:
+                    self.pruned.add(id(self.stack[-1][0]))
+                pruned = text_parts is not None
+        if text_parts:
+            text = ''.join(text_parts)
+            if text.strip():
+                element.text = text
+
+        if self.span_path is not None and not pruned and (len(self.stack) <= SPAN_DEPTH or text_parts is None):
+            position = self.parser.CurrentByteIndex
+            if not element.children and not text_parts:
+                # An empty element tag reports its end after '/>', an end tag at its '</'
+                start_tag_end = self.start_tag_end(start)
+                if self.data[start_tag_end - 2:start_tag_end] == b'/>':
+                    element.span = (self.span_path, start, start_tag_end, self.span_stamp)
+                    return
+            element.span = (self.span_path, start, self.data.find(b'>', position) + 1, self.span_stamp)
+
+            if text_parts is None:
+                end = element.span[2]
+                digest = hashlib.blake2b(self.data[start:end], digest_size=16).digest()
+                element.set_text_source((self.span_path, start, end - start, digest))
+
+    def update_text_handler(self, lazy):
+        """Only hand character data to Python inside elements whose text is loaded."""
+        if lazy != self.text_lazy:
+            self.text_lazy = lazy
+            self.parser.CharacterDataHandler = None if lazy else self.character_data
+
+    def prune_last_child(self):
+        """Drop the element just closed from its parent, which then no longer matches its markup."""
+        parent = self.stack[-1][0]
+        parent.children.pop()
+        self.pruned.add(id(parent))
+
+    def filter_includes(self, name, attributes):
+        if not self.stack:
+            return True
+        parent = self.stack[-1][0]
+        return self.table_filter.includes(name, attributes, parent.tagName, parent.attributes.get('tableName', ''))
+
+    def start_skipping(self):
+        """Pass over a rejected element: its events only move a depth counter until it ends."""
+        self.skip_depth = 1
+        self.parser.StartElementHandler = self.skip_start_element
+        self.parser.EndElementHandler = self.skip_end_element
+        self.parser.CharacterDataHandler = None
+
+    def skip_start_element(self, name, attributes):
+        self.skip_depth += 1
+
+    def skip_end_element(self, name):
+        self.skip_depth -= 1
+        if not self.skip_depth:
+            self.parser.StartElementHandler = self.start_element
+            self.parser.EndElementHandler = self.end_element
+            self.parser.CharacterDataHandler = None if self.text_lazy else self.character_data
+
+    def character_data(self, text):
+        self.stack[-1][2].append(text)
+
+    def start_tag_end(self, position):
+        """Return the offset just past the '>' closing the tag that starts at position."""
+        data = self.data
+        while True:
+            tag_end = data.find(b'>', position)
+            double_quote = data.find(b'"', position, tag_end)
+            single_quote = data.find(b"'", position, tag_end)
+            quotes = [quote for quote in (double_quote, single_quote) if quote != -1]
+            if not quotes:
+                return tag_end + 1
+            quote = min(quotes)
+            # Attribute values may contain '>'; skip to the closing quote
+            position = data.find(data[quote:quote + 1], quote + 1) + 1
@@ -0,0 +1,169 @@
+import mmap
+import os
+from xml.dom import minidom
+
+from logics.ChangeSerializer import ChangeSerializer
+
+# Indentation of the changeSet children in the output, and per nesting level below them
+CHANGE_INDENT = '    '
+LEVEL_INDENT = '  '
+
+# Attributes of the <databaseChangeLog> root element, in output order
+ROOT_ATTRIBUTES = (
+    ('xmlns', 'http://www.liquibase.org/xml/ns/dbchangelog'),
+    ('xmlns:xsi', 'http://www.w3.org/2001/XMLSchema-instance'),
+    ('xsi:schemaLocation', 'http://www.liquibase.org/xml/ns/dbchangelog '
+                           'http://www.liquibase.org/xml/ns/dbchangelog/dbchangelog-latest.xsd'),
+)
+
+
+class XmlChangelogSerializer(ChangeSerializer):
+    """Turn a list of change records into a Liquibase XML changelog, one changeSet per record."""
+
+    format_name = 'xml'
+    file_extension = '.xml'
+
+    def write(self, changes, file):
+        """Stream the changelog, formatted like toprettyxml of the whole document.
+
+        Each changeSet is built as a small DOM of its own, written and dropped again. Change
+        elements taken unmodified from a local XML changelog are not rebuilt at all: their
+        markup is copied from the memory-mapped source file and re-indented (see SourceMarkup).
+        """
+        document = minidom.Document()
+        root = self.create_root(document)
+        root_start = root.toxml()[:-2]
+
+        file.write('<?xml version="1.0" ?>\n')
+        empty = True
+        with SourceMarkup() as source_markup:
+            for change in changes:
+                if empty:
+                    file.write(root_start + '>\n')
+                    empty = False
+                self.write_changeset(document, change, file, source_markup)
+
+        file.write(root_start + '/>\n' if empty else '</databaseChangeLog>\n')
+
+    def write_changeset(self, document, change, file, source_markup):
+        change_set = document.createElement('changeSet')
+        change_set.setAttribute('author', self.author)
+        change_set.setAttribute('id', change.changeset_id)
+        file.write('  ' + change_set.toxml()[:-2] + '>\n')
+        for element in self.change_elements(change):
+            markup = source_markup.get(element)
+            if markup is None:
+                element.to_dom(document).writexml(file, CHANGE_INDENT, LEVEL_INDENT, '\n')
+            else:
+                file.write(CHANGE_INDENT + markup + '\n')
+        file.write('  </changeSet>\n')
+
+    def to_document(self, changes):
+        """Return an in-memory minidom document holding a changeSet for every change."""
+        document = self.create_document()
+        for change in changes:
+            document.documentElement.appendChild(self.build_changeset(document, change))
+        return document
+
+    def create_document(self):
+        """Creates the in-memory XML structure with the root element."""
+        doc = minidom.Document()
+        doc.appendChild(self.create_root(doc))
+        return doc
+
+    def create_root(self, document):
+        database_change_log = document.createElement('databaseChangeLog')
+        for name, value in ROOT_ATTRIBUTES:
+            database_change_log.setAttribute(name, value)
+        return database_change_log
+
+    def build_changeset(self, document, change):
+        change_set = document.createElement('changeSet')
+        change_set.setAttribute('author', self.author)
+        change_set.setAttribute('id', change.changeset_id)
+        for element in self.change_elements(change):
+            change_set.appendChild(element.to_dom(document))
+        return change_set
+
+
+class SourceMarkup:
+    """Copy the markup of elements with a span out of their memory-mapped changelog files.
+
+    The first line keeps its place; following lines that start with a tag are re-indented
+    from the source's indentation step to LEVEL_INDENT per level below CHANGE_INDENT, and
+    lines of text content are copied as they are. Files are mapped on first use, together
+    with their stamp (as FileChangelogSource.stamp), and unmapped when the context exits.
+    get returns None when an element cannot be copied (no span, a stamp other than the one
+    the span was read with, i.e. the file changed since it was parsed, or irregular
+    indentation); the caller then writes the element from its SchemaElement instead.
+    """
+
+    def __init__(self):
+        self.files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        for file, mapped, _ in self.files.values():
+            if mapped is not None:
+                mapped.close()
+            if file is not None:
+                file.close()
+        self.files = {}
+
+    def buffer(self, path):
+        if isinstance(path, bytes):
+            # The markup itself, see SnapshotHistoryStore
+            return path
+        if path not in self.files:
+            try:
+                file = open(path, 'rb')
+            except OSError:
+                self.files[path] = (None, None, None)
+                return None
+            stat = os.fstat(file.fileno())
+            try:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                mapped = None
+            self.files[path] = (file, mapped, (stat.st_mtime_ns, stat.st_size))
+        return self.files[path][1]
+
+    def get(self, element):
+        if element.span is None:
+            return None
+        path, start, end = element.span[:3]
+        data = self.buffer(path)
+        if data is None or (not isinstance(path, bytes) and self.files[path][2] != element.span[3]):
+            return None
+
+        tag = element.tagName.encode('utf-8')
+        if data[start:start + len(tag) + 1] != b'<' + tag or data[end - 1:end] != b'>':
+            return None
+        line_start = data.rfind(b'\n', 0, start) + 1
+        base_indent = data[line_start:start]
+        if base_indent.strip(b' \t'):
+            return None
+
+        try:
+            lines = data[start:end].decode('utf-8').replace('\r\n', '\n').split('\n')
+        except UnicodeDecodeError:
+            return None
+        return reindent(lines, len(base_indent.decode('ascii').expandtabs()))
+
+
+def reindent(lines, base_width):
+    """Re-indent the tag lines after the first relative to base_width; None if they are not nested below it."""
+    tag_lines = []
+    for number, line in enumerate(lines[1:], start=1):
+        content = line.lstrip(' \t')
+        if content.startswith('<'):
+            tag_lines.append((number, len(line[:len(line) - len(content)].expandtabs()) - base_width, content))
+
+    step = min((width for _, width, _ in tag_lines if width > 0), default=1)
+    if any(width < 0 or width % step for _, width, _ in tag_lines):
+        return None
+    for number, width, content in tag_lines:
+        lines[number] = CHANGE_INDENT + LEVEL_INDENT * (width // step) + content
+    return '\n'.join(lines)
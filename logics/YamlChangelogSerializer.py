@@ -0,0 +1,65 @@
+import json
+import re
+
+from logics.ChangeSerializer import ChangeSerializer, StringWriter
+
+# Strings that can be written without quotes; anything else is written as a double-quoted scalar
+PLAIN_SCALAR_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_ .()/-]*[A-Za-z0-9_.()/-]|[A-Za-z_]')
+
+# Plain scalars YAML would read back as something other than a string
+YAML_RESERVED_WORDS = {'true', 'false', 'yes', 'no', 'on', 'off', 'null', 'y', 'n'}
+
+
+class YamlChangelogSerializer(ChangeSerializer):
+    """Write a change list as a Liquibase YAML changelog, one changeSet at a time.
+
+    The output only uses block mappings, block sequences and plain or double-quoted
+    scalars, so no YAML library is needed to write it.
+    """
+
+    format_name = 'yaml'
+    file_extension = '.yaml'
+
+    def write(self, changes, file):
+        empty = True
+        for change in changes:
+            if empty:
+                file.write('databaseChangeLog:\n')
+                empty = False
+            self.write_node(file, [self.changeset_mapping(change)], 2)
+        if empty:
+            file.write('databaseChangeLog: []\n')
+
+    def write_node(self, file, value, indent):
+        pad = ' ' * indent
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if isinstance(item, (dict, list)) and item:
+                    file.write(f"{pad}{key}:\n")
+                    self.write_node(file, item, indent + 2)
+                else:
+                    file.write(f"{pad}{key}: {self.scalar(item)}\n")
+        else:
+            for item in value:
+                if isinstance(item, dict) and item:
+                    # The first key of a mapping item goes on the dash line
+                    chunks = []
+                    self.write_node(StringWriter(chunks), item, indent + 2)
+                    block = ''.join(chunks)
+                    file.write(f"{pad}- {block[indent + 2:]}")
+                else:
+                    file.write(f"{pad}- {self.scalar(item)}\n")
+
+    def scalar(self, value):
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        if value is None:
+            return 'null'
+        if isinstance(value, dict):
+            return '{}'
+        if isinstance(value, list):
+            return '[]'
+        if PLAIN_SCALAR_PATTERN.fullmatch(value) and value.lower() not in YAML_RESERVED_WORDS:
+            return value
+        # A JSON string is a valid YAML double-quoted scalar
+        return json.dumps(value, ensure_ascii=False)
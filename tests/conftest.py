@@ -0,0 +1,53 @@
+import os
+import subprocess
+import textwrap
+
+import pytest
+
+CHANGELOG_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<databaseChangeLog xmlns="http://www.liquibase.org/xml/ns/dbchangelog">
+{body}
+</databaseChangeLog>
+"""
+
+
+@pytest.fixture
+def write_changelog(tmp_path):
+    """Write an XML changelog with the given changeSet markup into tmp_path and return its path."""
+    def write(name, body):
+        path = tmp_path / name
+        path.write_text(changelog_text(body), encoding='utf-8')
+        return str(path)
+    return write
+
+
+class GitRepository:
+    """A scratch git repository for tests; commit writes files and returns the new commit id."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        os.makedirs(self.path, exist_ok=True)
+        self.git('init', '-q')
+
+    def git(self, *args):
+        return subprocess.run(['git', '-C', self.path, *args], check=True, capture_output=True, text=True).stdout
+
+    def commit(self, files, message='change'):
+        for name, content in files.items():
+            path = os.path.join(self.path, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(content)
+        self.git('add', '.')
+        self.git('-c', 'user.name=test', '-c', 'user.email=test@example.com', 'commit', '-q', '-m', message)
+        return self.git('rev-parse', 'HEAD').strip()
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    return GitRepository(tmp_path / 'repo')
+
+
+def changelog_text(body):
+    """Return the text of an XML changelog holding the given changeSet markup."""
+    return CHANGELOG_TEMPLATE.format(body=textwrap.dedent(body).strip())
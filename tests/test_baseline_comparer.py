@@ -0,0 +1,34 @@
+from logics.BaselineComparer import BaselineComparer
+
+BASELINE = """
+<changeSet id="1" author="a">
+  <createTable tableName="client"><column name="id" type="INT"/><column name="name" type="VARCHAR(20)"/></createTable>
+  <createTable tableName="loan"><column name="id" type="INT"/></createTable>
+</changeSet>
+"""
+
+
+def candidates(write_changelog):
+    return [write_changelog('tenant1.xml', BASELINE.replace('<column name="name" type="VARCHAR(20)"/>', '')),
+            write_changelog('tenant2.xml', BASELINE),
+            write_changelog('tenant3.xml', '<changeSet id="1" author="a"><createTable')]
+
+
+def test_every_candidate_gets_its_own_migration(write_changelog):
+    comparer = BaselineComparer(write_changelog('baseline.xml', BASELINE))
+
+    results = dict(comparer.compare_many(candidates(write_changelog)))
+
+    tenant1, tenant2, tenant3 = results.values()
+    assert 'addColumn' in tenant1 and 'add-column-client-1' in tenant1
+    assert 'changeSet' not in tenant2
+    assert tenant3 is None
+    # The loan table is identical in both valid candidates and diffed once
+    assert comparer.cache_stats()['hits'] >= 1
+
+
+def test_parallel_comparison_matches_the_sequential_one(write_changelog):
+    comparer = BaselineComparer(write_changelog('baseline.xml', BASELINE))
+    specs = candidates(write_changelog)
+
+    assert list(comparer.compare_many_parallel(specs, max_workers=2)) == list(comparer.compare_many(specs))
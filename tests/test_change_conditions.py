@@ -0,0 +1,64 @@
+import pytest
+
+from logics.ChangeConditions import Environment, conditions_for, parse_environment
+
+
+@pytest.mark.parametrize('context, contexts, expected', [
+    ('', ['prod'], True),
+    ('prod', ['prod'], True),
+    ('prod', ['test'], False),
+    ('prod', [], True),
+    ('!test', ['prod'], True),
+    ('prod and eu', ['prod'], False),
+    ('prod and eu', ['prod', 'eu'], True),
+    ('test, (prod and !us)', ['prod', 'eu'], True),
+])
+def test_context_expressions(context, contexts, expected):
+    assert conditions_for(context=context).applies_to(Environment('env', contexts=contexts)) is expected
+
+
+@pytest.mark.parametrize('labels, label_expression, expected', [
+    ('beta', 'beta', True),
+    ('beta', '!beta', False),
+    ('beta, eu', 'beta and eu', True),
+    ('beta', 'beta and eu', False),
+    ('beta', None, True),
+    ('', 'beta', True),
+    ('', '!beta', True),
+    ('', 'beta and eu', True),
+])
+def test_label_expressions(labels, label_expression, expected):
+    assert conditions_for(labels=labels).applies_to(Environment('env', labels=label_expression)) is expected
+
+
+def test_environment_spec_with_settings():
+    environment = parse_environment('prod:contexts=prod,eu;labels=!beta;dbms=MySQL')
+
+    assert environment.contexts == {'prod', 'eu'}
+    assert environment.dbms == 'mysql'
+    assert conditions_for(context='eu', labels='beta').applies_to(environment) is False
+    assert conditions_for(context='eu', dbms='mysql').applies_to(environment) is True
+
+
+def test_environment_filtering_keeps_unlabeled_changesets(tmp_path, write_changelog):
+    from logics.ChangeLogComparator import LiquibaseChangelogComparer
+
+    previous = write_changelog('s1.xml', '')
+    current = write_changelog('s2.xml', """
+        <changeSet id="1" author="a">
+          <createTable tableName="always"><column name="id" type="INT"/></createTable>
+        </changeSet>
+        <changeSet id="2" author="a" labels="beta">
+          <createTable tableName="beta_only"><column name="id" type="INT"/></createTable>
+        </changeSet>
+        <changeSet id="3" author="a" context="test">
+          <createTable tableName="test_only"><column name="id" type="INT"/></createTable>
+        </changeSet>
+    """)
+    comparer = LiquibaseChangelogComparer(previous, current, counter_file=None)
+    environments = [parse_environment('prod:contexts=prod;labels=!beta'), parse_environment('test:labels=beta')]
+
+    tables = {environment.name: sorted(change.table_name for change in changes)
+              for environment, changes in comparer.generate_environment_changes(environments)}
+
+    assert tables == {'prod': ['always'], 'test': ['always', 'beta_only', 'test_only']}
@@ -0,0 +1,99 @@
+from logics.ChangeLogComparator import LiquibaseChangelogComparer
+
+XML_CHANGELOG = """
+<changeSet id="1" author="a">
+  <createTable tableName="client">
+    <column name="id" type="INT"><constraints primaryKey="true" nullable="false"/></column>
+    <column name="name" type="VARCHAR(20)"/>
+  </createTable>
+</changeSet>
+<changeSet id="2" author="a">
+  <addColumn tableName="client"><column name="active" type="BOOLEAN" defaultValueBoolean="true"/></addColumn>
+  <insert tableName="client"><column name="id" valueNumeric="1"/><column name="name" value="first"/></insert>
+</changeSet>
+"""
+
+YAML_CHANGELOG = """\
+databaseChangeLog:
+  - changeSet:
+      id: 1
+      author: a
+      changes:
+        - createTable:
+            tableName: client
+            columns:
+              - column:
+                  name: id
+                  type: INT
+                  constraints:
+                    primaryKey: true
+                    nullable: false
+              - column:
+                  name: name
+                  type: VARCHAR(20)
+  - include:
+      file: more.json
+      relativeToChangelogFile: true
+"""
+
+JSON_CHANGELOG = """\
+{"databaseChangeLog": [
+  {"changeSet": {"id": "2", "author": "a", "changes": [
+    {"addColumn": {"tableName": "client", "columns": [
+      {"column": {"name": "active", "type": "BOOLEAN", "defaultValueBoolean": true}}]}},
+    {"insert": {"tableName": "client", "columns": [
+      {"column": {"name": "id", "valueNumeric": 1}},
+      {"column": {"name": "name", "value": "first"}}]}}
+  ]}}
+]}
+"""
+
+
+def test_yaml_and_json_changelogs_read_like_xml(tmp_path, write_changelog):
+    (tmp_path / 'changelog.yaml').write_text(YAML_CHANGELOG, encoding='utf-8')
+    (tmp_path / 'more.json').write_text(JSON_CHANGELOG, encoding='utf-8')
+    xml_changelog = write_changelog('changelog.xml', XML_CHANGELOG)
+
+    comparer = LiquibaseChangelogComparer(str(tmp_path / 'changelog.yaml'), xml_changelog, counter_file=None)
+
+    assert comparer.check_migration_needed()['first_difference'] is None
+    assert comparer.generate_changes() == []
+
+
+SQL_CHANGELOG = """\
+--liquibase formatted sql
+
+--changeset a:1
+CREATE TABLE client (
+    id INT NOT NULL PRIMARY KEY,
+    name VARCHAR(20)
+);
+
+--changeset a:2
+ALTER TABLE client ADD active BOOLEAN DEFAULT TRUE;
+INSERT INTO client (id, name) VALUES (1, 'first');
+"""
+
+
+def test_formatted_sql_changelog_reads_like_xml(tmp_path, write_changelog):
+    (tmp_path / 'changelog.sql').write_text(SQL_CHANGELOG, encoding='utf-8')
+    xml_changelog = write_changelog('changelog.xml', XML_CHANGELOG)
+
+    comparer = LiquibaseChangelogComparer(str(tmp_path / 'changelog.sql'), xml_changelog, counter_file=None)
+
+    assert comparer.check_migration_needed()['first_difference'] is None
+
+
+def test_formatted_sql_index_and_drop_column(tmp_path, write_changelog):
+    (tmp_path / 'changelog.sql').write_text(SQL_CHANGELOG + """
+--changeset a:3
+CREATE UNIQUE INDEX idx_client_name ON client (name);
+ALTER TABLE client DROP COLUMN active;
+""", encoding='utf-8')
+    previous = write_changelog('changelog.xml', XML_CHANGELOG)
+
+    comparer = LiquibaseChangelogComparer(previous, str(tmp_path / 'changelog.sql'), counter_file=None)
+    changes = comparer.generate_changes()
+
+    assert [(change.change_type, change.table_name) for change in changes] == [('dropColumn', 'client'),
+                                                                                ('createIndex', 'client')]
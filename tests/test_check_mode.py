@@ -0,0 +1,44 @@
+import json
+
+import cli
+
+TABLE = """
+<changeSet id="1" author="a">
+  <createTable tableName="t"><column name="id" type="INT"/>{column}</createTable>
+</changeSet>
+"""
+
+
+def check(capsys, *changelogs):
+    exit_code = cli.main([*changelogs, '--check'])
+    return exit_code, json.loads(capsys.readouterr().out)
+
+
+def test_identical_changelogs_need_no_migration(capsys, write_changelog):
+    previous = write_changelog('s1.xml', TABLE.format(column=''))
+    current = write_changelog('s2.xml', TABLE.format(column=''))
+
+    exit_code, summary = check(capsys, previous, current)
+
+    assert exit_code == 0
+    assert summary['migration_needed'] is False
+    assert summary['first_difference'] is None
+
+
+def test_first_difference_is_reported(capsys, write_changelog):
+    previous = write_changelog('s1.xml', TABLE.format(column=''))
+    current = write_changelog('s2.xml', TABLE.format(column='<column name="name" type="VARCHAR(20)"/>'))
+
+    exit_code, summary = check(capsys, previous, current)
+
+    assert exit_code == 1
+    assert summary['first_difference'] == {'change': 'addColumn', 'tableName': 't', 'column': 'name'}
+
+
+def test_unreadable_changelog_exits_with_two(capsys, tmp_path, write_changelog):
+    previous = write_changelog('s1.xml', TABLE.format(column=''))
+
+    exit_code, summary = check(capsys, previous, str(tmp_path / 'missing.xml'))
+
+    assert exit_code == 2
+    assert 'error' in summary
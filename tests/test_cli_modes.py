@@ -0,0 +1,30 @@
+import pytest
+
+import cli
+
+
+@pytest.mark.parametrize('mode', [['--history', 'HEAD~1..HEAD'], ['--baseline', 'current.xml']])
+@pytest.mark.parametrize('option', [['--format', 'sql'], ['--seed-data-format', 'loadData'],
+                                    ['--seed-data-dir', 'seed'], ['--version-store', 'versions.db']])
+def test_history_and_baseline_reject_comparison_options(tmp_path, capsys, mode, option):
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main(['db/changelog.xml', *mode, '--output', str(tmp_path / 'out'), *option])
+
+    assert exit_info.value.code == 2
+    assert f"{mode[0]} cannot be combined with {option[0]}" in capsys.readouterr().err
+    assert not (tmp_path / 'out').exists()
+
+
+def test_baseline_writes_one_xml_migration_per_candidate(tmp_path, write_changelog):
+    current = write_changelog('current.xml', """
+    <changeSet id="1" author="a">
+      <createTable tableName="t"><column name="id" type="INT"/></createTable>
+    </changeSet>
+    """)
+    candidate = write_changelog('tenant.xml', '')
+
+    assert cli.main([candidate, '--baseline', current, '--output', str(tmp_path / 'out'), '--workers', '1']) == 0
+
+    [migration] = (tmp_path / 'out').iterdir()
+    assert migration.suffix == '.xml'
+    assert 'createTable' in migration.read_text(encoding='utf-8')
@@ -0,0 +1,52 @@
+import cli
+
+COUNTER_FILE = 'global_counter.txt'
+
+CHANGESET = """
+<changeSet id="1" author="a">
+  <createTable tableName="t"><column name="id" type="INT"/></createTable>
+</changeSet>
+"""
+
+
+def run_cli(tmp_path, monkeypatch, write_changelog, *options):
+    previous = write_changelog('s1.xml', '')
+    current = write_changelog('s2.xml', CHANGESET)
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / COUNTER_FILE).write_text('7', encoding='utf-8')
+    return cli.main([previous, current, *options])
+
+
+def test_migration_advances_the_counter(tmp_path, monkeypatch, write_changelog):
+    run_cli(tmp_path, monkeypatch, write_changelog, '--output', str(tmp_path / 'migration.xml'))
+
+    assert 'create-table-t-7' in (tmp_path / 'migration.xml').read_text(encoding='utf-8')
+    assert (tmp_path / COUNTER_FILE).read_text(encoding='utf-8') == '8'
+
+
+def test_check_leaves_the_counter_untouched(tmp_path, monkeypatch, write_changelog, capsys):
+    assert run_cli(tmp_path, monkeypatch, write_changelog, '--check') == 1
+
+    assert '"migration_needed": true' in capsys.readouterr().out
+    assert (tmp_path / COUNTER_FILE).read_text(encoding='utf-8') == '7'
+
+
+def test_validate_leaves_the_counter_untouched(tmp_path, monkeypatch, write_changelog, capsys):
+    assert run_cli(tmp_path, monkeypatch, write_changelog, '--validate') == 0
+
+    assert '"valid": true' in capsys.readouterr().out
+    assert (tmp_path / COUNTER_FILE).read_text(encoding='utf-8') == '7'
+
+
+def test_validate_migration_keeps_the_comparers_counter(tmp_path, monkeypatch, write_changelog):
+    from logics.ChangeLogComparator import LiquibaseChangelogComparer
+
+    previous = write_changelog('s1.xml', '')
+    current = write_changelog('s2.xml', CHANGESET)
+    counter_file = tmp_path / COUNTER_FILE
+    counter_file.write_text('7', encoding='utf-8')
+    comparer = LiquibaseChangelogComparer(previous, current, counter_file=str(counter_file))
+
+    assert comparer.validate_migration()['changesets'] == 1
+    assert counter_file.read_text(encoding='utf-8') == '7'
+    assert [change.changeset_id for change in comparer.generate_changes()] == ['create-table-t-7']
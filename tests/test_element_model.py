@@ -0,0 +1,47 @@
+import pickle
+
+from conftest import changelog_text
+from logics.MemoryBenchmark import measure_changelog_memory
+from logics.ObjectKey import object_key
+from logics.XmlChangelogReader import parse_xml_changelog
+
+TABLES = ''.join(f"""
+<changeSet id="{table}" author="a">
+  <createTable tableName="t{table}">
+    <column name="id" type="BIGINT"><constraints primaryKey="true"/></column>
+    <column name="created_at" type="DATETIME"/>
+  </createTable>
+</changeSet>
+""" for table in range(50))
+
+
+def test_repeated_names_and_values_are_stored_once():
+    root = parse_xml_changelog(changelog_text(TABLES).encode('utf-8'))
+    columns = root.getElementsByTagName('column')
+
+    assert len(columns) == 100
+    assert len({id(column.getAttribute('type')) for column in columns}) == 2
+    assert len({id(column.getAttribute('name')) for column in columns}) == 2
+    # Leaf elements share one empty children tuple and have no instance dict
+    assert len({id(column.children) for column in columns if not column.children}) == 1
+    assert not hasattr(columns[0], '__dict__')
+
+
+def test_keys_are_shared_and_elements_survive_pickling():
+    root = parse_xml_changelog(changelog_text(TABLES).encode('utf-8'))
+    tables = root.getElementsByTagName('createTable')
+
+    assert object_key(tables[0]) is object_key(tables[0])
+    copy = pickle.loads(pickle.dumps(tables[0]))
+    assert copy.fingerprint() == tables[0].fingerprint()
+    assert [column.getAttribute('name') for column in copy.getElementsByTagName('column')] == ['id', 'created_at']
+
+
+def test_memory_benchmark_reports_a_smaller_model(tmp_path):
+    path = tmp_path / 'changelog.xml'
+    path.write_text(changelog_text(TABLES), encoding='utf-8')
+
+    result = measure_changelog_memory(str(path))
+
+    assert result['columns'] == 100
+    assert result['model_bytes'] < result['dom_bytes']
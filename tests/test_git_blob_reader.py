@@ -0,0 +1,91 @@
+import subprocess
+
+import pytest
+
+from logics.GitBlobReader import GitCatFileBatch, GitObjectNotFound
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A git repository with one commit holding 'db/changelog.xml' and 'db/my changes/change log.xml'."""
+    def git(*args):
+        subprocess.run(['git', '-C', str(tmp_path), *args], check=True, capture_output=True)
+
+    git('init', '-q')
+    (tmp_path / 'db' / 'my changes').mkdir(parents=True)
+    (tmp_path / 'db' / 'changelog.xml').write_bytes(b'<databaseChangeLog/>\n')
+    (tmp_path / 'db' / 'my changes' / 'change log.xml').write_bytes(b'<databaseChangeLog>spaced</databaseChangeLog>\n')
+    git('add', '.')
+    git('-c', 'user.name=test', '-c', 'user.email=test@example.com', 'commit', '-q', '-m', 'changelogs')
+    return str(tmp_path)
+
+
+@pytest.fixture
+def reader(repo):
+    with GitCatFileBatch(repo) as reader:
+        yield reader
+
+
+def test_read_blob(reader):
+    assert reader.read_blob('HEAD', 'db/changelog.xml') == b'<databaseChangeLog/>\n'
+    assert (reader.read_blob('HEAD', 'db/my changes/change log.xml')
+            == b'<databaseChangeLog>spaced</databaseChangeLog>\n')
+
+
+@pytest.mark.parametrize('path', ['db/missing.xml', 'db/missing file.xml', 'db/my changes/missing file.xml'])
+def test_missing_objects_raise_not_found(reader, path):
+    with pytest.raises(GitObjectNotFound):
+        reader.read_blob('HEAD', path)
+    # The reader stays usable after a missing object
+    assert reader.read_blob('HEAD', 'db/changelog.xml') == b'<databaseChangeLog/>\n'
+
+
+def test_exists(reader):
+    assert reader.exists('HEAD', 'db/changelog.xml')
+    assert reader.exists('HEAD', 'db/my changes/change log.xml')
+    assert reader.exists('HEAD', 'db/my changes')
+    assert not reader.exists('HEAD', 'db/missing.xml')
+    assert not reader.exists('HEAD', 'db/missing file.xml')
+    assert not reader.exists('HEAD', 'db/my changes/missing file.xml')
+    assert not reader.exists('no-such-branch', 'db/changelog.xml')
+
+
+def test_exists_does_not_read_objects(repo):
+    reader = GitCatFileBatch(repo)
+    try:
+        assert reader.exists('HEAD', 'db/changelog.xml')
+        assert reader.process is None
+        assert reader.check_process is not None
+    finally:
+        reader.close()
+
+
+def test_list_tree(reader):
+    assert sorted(reader.list_tree('HEAD', 'db')) == [('changelog.xml', False), ('my changes', True)]
+    with pytest.raises(GitObjectNotFound):
+        reader.list_tree('HEAD', 'db/changelog.xml')
+
+
+def commit_tree(path, *init_options):
+    """Commit 'db/a.xml', 'db/b.xml', 'db/sub/c.xml' and a submodule gitlink 'db/module' in a new repository."""
+    def git(*args):
+        return subprocess.run(['git', '-C', str(path), *args], check=True, capture_output=True, text=True).stdout
+
+    path.mkdir()
+    git('init', '-q', *init_options)
+    (path / 'db' / 'sub').mkdir(parents=True)
+    for name in ('a.xml', 'b.xml', 'sub/c.xml'):
+        (path / 'db' / name).write_bytes(b'<databaseChangeLog/>\n')
+    git('add', '.')
+    git('update-index', '--add', '--cacheinfo', f"160000,{git('hash-object', 'db/a.xml').strip()},db/module")
+    git('-c', 'user.name=test', '-c', 'user.email=test@example.com', 'commit', '-q', '-m', 'tree')
+    return str(path)
+
+
+@pytest.mark.parametrize('object_format', ['sha1', 'sha256'])
+def test_list_tree_reads_object_ids_of_the_repository_format(tmp_path, object_format):
+    repo = commit_tree(tmp_path / object_format, f"--object-format={object_format}")
+
+    with GitCatFileBatch(repo) as reader:
+        assert reader.list_tree('HEAD', 'db') == [('a.xml', False), ('b.xml', False), ('sub', True)]
+        assert reader.list_tree('HEAD', '') == [('db', True)]
@@ -0,0 +1,35 @@
+import os
+
+from conftest import changelog_text
+from logics.HistoryMiner import MAX_HISTORY_WORKERS, ChangelogHistoryMiner
+
+TABLE = ('<changeSet id="{id}" author="a">'
+         '<createTable tableName="{name}"><column name="id" type="INT"/></createTable></changeSet>')
+
+
+def tables(*names):
+    return changelog_text(''.join(TABLE.format(id=index, name=name) for index, name in enumerate(names, start=1)))
+
+
+def test_one_migration_per_revision_pair_and_malformed_revisions_skipped(tmp_path, git_repo, capsys):
+    first = git_repo.commit({'db/changelog.xml': tables('a')})
+    malformed = git_repo.commit({'db/changelog.xml': '<databaseChangeLog><changeSet'})
+    third = git_repo.commit({'db/changelog.xml': tables('a', 'b')})
+    fourth = git_repo.commit({'db/changelog.xml': tables('a', 'b', 'c')})
+
+    miner = ChangelogHistoryMiner(git_repo.path, 'db/changelog.xml', max_workers=1)
+    result = miner.mine(f"{first}..HEAD", str(tmp_path / 'out'))
+
+    assert result.revision_count == 4
+    assert [revision for revision, _ in result.skipped_revisions] == [malformed]
+    # The malformed revision breaks the chain: only the last pair is diffed
+    assert [(entry[1], entry[2], entry[4]) for entry in result.migration_files] == [(third, fourth, 1)]
+    assert 'tableName="c"' in open(result.migration_files[0][3], encoding='utf-8').read()
+    assert os.listdir(tmp_path / 'out') == [os.path.basename(result.migration_files[0][3])]
+    # Library code leaves stdout to the caller
+    assert capsys.readouterr().out == ''
+
+
+def test_workers_are_capped(git_repo):
+    assert ChangelogHistoryMiner(git_repo.path, 'db/changelog.xml', max_workers=1000).max_workers == MAX_HISTORY_WORKERS
+    assert ChangelogHistoryMiner(git_repo.path, 'db/changelog.xml', max_workers=2).max_workers == 2
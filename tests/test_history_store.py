@@ -0,0 +1,46 @@
+import json
+import os
+
+import cli
+from logics.ChangeLogComparator import LiquibaseChangelogComparer
+
+PREVIOUS = """
+<changeSet id="1" author="a">
+  <createTable tableName="client"><column name="id" type="INT"/><column name="legacy" type="INT"/></createTable>
+  <createTable tableName="audit"><column name="id" type="INT"/></createTable>
+  <createView viewName="client_ids">SELECT id FROM client</createView>
+</changeSet>
+"""
+
+CURRENT = """
+<changeSet id="1" author="a">
+  <createTable tableName="client"><column name="id" type="INT"/><column name="name" type="VARCHAR(20)"/></createTable>
+  <createTable tableName="audit"><column name="id" type="INT"/></createTable>
+  <createTable tableName="loan"><column name="id" type="INT"/></createTable>
+  <createView viewName="client_ids">SELECT id FROM client</createView>
+</changeSet>
+"""
+
+
+def save_version(capsys, store, changelog, name):
+    assert cli.main([changelog, '--version-store', store, '--save-version', name]) == 0
+    return json.loads(capsys.readouterr().out)
+
+
+def test_saved_versions_diff_like_their_changelogs(tmp_path, capsys, write_changelog):
+    store = str(tmp_path / 'versions.db')
+    previous = write_changelog('s1.xml', PREVIOUS)
+    current = write_changelog('s2.xml', CURRENT)
+    expected = LiquibaseChangelogComparer(previous, current, counter_file=None).compare_and_generate()
+
+    save_version(capsys, store, previous, 'v1')
+    saved = save_version(capsys, store, current, 'v2')
+    os.remove(previous)
+    os.remove(current)
+
+    # Only the changed client table and the new loan table are new content
+    assert (saved['elements'], saved['new_elements']) == (4, 2)
+    stored = LiquibaseChangelogComparer('stored:v1', 'stored:v2', counter_file=None, version_store=store)
+    assert stored.compare_and_generate() == expected
+    assert LiquibaseChangelogComparer('stored:v2', 'stored:v2', counter_file=None,
+                                      version_store=store).check_migration_needed()['migration_needed'] is False
@@ -0,0 +1,38 @@
+import json
+import re
+
+from logics.ChangeLogComparator import LiquibaseChangelogComparer
+
+PREVIOUS = """
+<changeSet id="1" author="a">
+  <createTable tableName="client"><column name="id" type="INT"/><column name="legacy" type="INT"/></createTable>
+  <createTable tableName="audit"><column name="id" type="INT"/></createTable>
+</changeSet>
+"""
+
+CURRENT = """
+<changeSet id="1" author="a">
+  <createTable tableName="client"><column name="id" type="INT"/><column name="name" type="VARCHAR(20)"/></createTable>
+  <createTable tableName="loan"><column name="id" type="INT"/></createTable>
+  <createIndex tableName="loan" indexName="idx_loan_id"><column name="id"/></createIndex>
+</changeSet>
+"""
+
+
+def test_report_lists_the_changes_of_the_migration(tmp_path, write_changelog):
+    report_path = tmp_path / 'report.json'
+    comparer = LiquibaseChangelogComparer(write_changelog('s1.xml', PREVIOUS), write_changelog('s2.xml', CURRENT),
+                                          counter_file=None)
+
+    migration = comparer.compare_and_generate(report_path=str(report_path))
+
+    report = json.loads(report_path.read_text(encoding='utf-8'))
+    assert [entry['id'] for entry in report['changes']] == re.findall(r'<changeSet [^>]*\bid="([^"]+)"', migration)
+    assert {'id': 'add-column-client-3', 'change': 'addColumn', 'tableName': 'client',
+            'columns': ['name']} in report['changes']
+    summary = report['summary']
+    assert (summary['changesets'], summary['tables_added'], summary['tables_dropped']) == (5, 1, 1)
+    assert (summary['columns_added'], summary['columns_dropped']) == (1, 1)
+    assert summary['added_tables'] == ['loan']
+    assert summary['dropped_tables'] == ['audit']
+    assert summary['created_indexes'] == ['idx_loan_id']
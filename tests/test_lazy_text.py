@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+from logics.XmlChangelogReader import parse_xml_changelog
+
+VIEW = '<createView viewName="v">SELECT id FROM t</createView>'
+
+
+def parse_view(path):
+    with open(path, 'rb') as file:
+        root = parse_xml_changelog(file.read(), span_path=os.path.abspath(path))
+    return root.getElementsByTagName('createView')[0]
+
+
+@pytest.fixture
+def changelog(write_changelog):
+    return write_changelog('views.xml', f'<changeSet id="1" author="a">\n  {VIEW}\n</changeSet>')
+
+
+def test_text_is_loaded_on_first_use(changelog):
+    view = parse_view(changelog)
+    assert view.text_source is not None
+
+    assert view.text == 'SELECT id FROM t'
+
+
+def test_changelog_can_be_replaced_after_text_was_loaded(changelog):
+    view = parse_view(changelog)
+    assert view.text == 'SELECT id FROM t'
+
+    # Nothing keeps the file open, so it can be removed and rewritten (as on Windows, where open files are locked)
+    data = open(changelog, 'rb').read()
+    os.remove(changelog)
+    with open(changelog, 'wb') as file:
+        file.write(data.replace(b'<changeSet', b'<!-- x --><changeSet'))
+
+    assert parse_view(changelog).text == 'SELECT id FROM t'
+
+
+def test_text_of_a_file_changed_since_parsing_is_not_loaded(changelog):
+    view = parse_view(changelog)
+    data = open(changelog, 'rb').read()
+    with open(changelog, 'wb') as file:
+        file.write(data.replace(b'SELECT id', b'SELECT no'))
+
+    with pytest.raises(ValueError):
+        view.text
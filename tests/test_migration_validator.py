@@ -0,0 +1,88 @@
+from logics.ChangeLogComparator import LiquibaseChangelogComparer
+from logics.SqliteMigrationValidator import SqliteMigrationValidator
+
+PREVIOUS = """
+<changeSet id="1" author="a">
+  <createTable schemaName="sales" tableName="orders">
+    <column name="id" type="INT"><constraints primaryKey="true"/></column>
+  </createTable>
+  <createTable schemaName="archive" tableName="orders">
+    <column name="id" type="INT"><constraints primaryKey="true"/></column>
+  </createTable>
+  <createIndex schemaName="sales" tableName="orders" indexName="idx_orders_id">
+    <column name="id"/>
+  </createIndex>
+  <createIndex schemaName="archive" tableName="orders" indexName="idx_orders_id">
+    <column name="id"/>
+  </createIndex>
+</changeSet>
+"""
+
+CURRENT = """
+<changeSet id="1" author="a">
+  <createTable schemaName="sales" tableName="orders">
+    <column name="id" type="INT"><constraints primaryKey="true"/></column>
+    <column name="total" type="DECIMAL(19, 6)"/>
+  </createTable>
+  <createTable schemaName="archive" tableName="orders">
+    <column name="id" type="INT"><constraints primaryKey="true"/></column>
+  </createTable>
+  <createIndex schemaName="sales" tableName="orders" indexName="idx_orders_id">
+    <column name="id"/>
+  </createIndex>
+  <createIndex schemaName="archive" tableName="orders" indexName="idx_orders_id">
+    <column name="id"/>
+  </createIndex>
+</changeSet>
+"""
+
+
+def validate(write_changelog, previous_body, current_body):
+    previous = write_changelog('previous.xml', previous_body)
+    current = write_changelog('current.xml', current_body)
+    return LiquibaseChangelogComparer(previous, current, counter_file=None).validate_migration()
+
+
+def test_tables_of_the_same_name_in_two_schemas_are_kept_apart(write_changelog):
+    result = validate(write_changelog, PREVIOUS, CURRENT)
+
+    assert result['error'] is None
+    assert result['changesets'] == 1
+    assert result['valid'], result['differences']
+
+
+def test_a_change_applied_to_the_wrong_schema_is_reported(write_changelog):
+    comparer = LiquibaseChangelogComparer(write_changelog('previous.xml', PREVIOUS),
+                                          write_changelog('current.xml', CURRENT), counter_file=None)
+    prev_snapshot = comparer.load_snapshot(comparer.previous_xml_path)
+    current_snapshot = comparer.load_snapshot(comparer.current_xml_path)
+    changes = comparer.diff_snapshots(prev_snapshot, current_snapshot)
+    changes[0].qualifiers = {'schemaName': 'archive'}
+
+    result = SqliteMigrationValidator().validate(prev_snapshot, current_snapshot, changes)
+
+    assert not result['valid']
+    assert sorted(difference['name'] for difference in result['differences']) == ['archive.orders', 'sales.orders']
+
+
+def test_dropping_an_indexed_column_validates(write_changelog):
+    previous = """
+    <changeSet id="1" author="a">
+      <createTable tableName="client">
+        <column name="id" type="INT"><constraints primaryKey="true"/></column>
+        <column name="legacy" type="VARCHAR(20)"/>
+      </createTable>
+      <createIndex tableName="client" indexName="idx_legacy"><column name="legacy"/></createIndex>
+    </changeSet>
+    """
+    current = """
+    <changeSet id="1" author="a">
+      <createTable tableName="client">
+        <column name="id" type="INT"><constraints primaryKey="true"/></column>
+      </createTable>
+    </changeSet>
+    """
+    result = validate(write_changelog, previous, current)
+
+    assert result['error'] is None
+    assert result['valid'], result['differences']
@@ -0,0 +1,38 @@
+from logics.ChangeLogComparator import LiquibaseChangelogComparer
+
+PREVIOUS = """
+<changeSet id="1" author="a">
+  <createTable schemaName="sales" tableName="orders"><column name="id" type="INT"/></createTable>
+  <createTable schemaName="archive" tableName="orders"><column name="id" type="INT"/></createTable>
+  <createTable tableName="orders"><column name="id" type="INT"/></createTable>
+</changeSet>
+"""
+
+CURRENT = """
+<changeSet id="1" author="a">
+  <createTable schemaName="sales" tableName="orders">
+    <column name="id" type="INT"/><column name="total" type="INT"/>
+  </createTable>
+  <createTable schemaName="archive" tableName="orders"><column name="id" type="INT"/></createTable>
+  <createTable catalogName="hq" schemaName="sales" tableName="orders"><column name="id" type="INT"/></createTable>
+</changeSet>
+"""
+
+
+def diff(write_changelog, max_workers):
+    comparer = LiquibaseChangelogComparer(write_changelog('s1.xml', PREVIOUS), write_changelog('s2.xml', CURRENT),
+                                          counter_file=None, max_workers=max_workers)
+    return [(change.changeset_id, change.change_type, change.qualifiers, change.table_name)
+            for change in comparer.generate_changes()]
+
+
+def test_tables_of_the_same_name_are_told_apart_by_catalog_and_schema(write_changelog):
+    assert diff(write_changelog, max_workers=1) == [
+        ('drop-table-orders-1', 'dropTable', {}, 'orders'),
+        ('create-table-orders-2', 'createTable', {'catalogName': 'hq', 'schemaName': 'sales'}, 'orders'),
+        ('add-column-orders-3', 'addColumn', {'schemaName': 'sales'}, 'orders'),
+    ]
+
+
+def test_schemas_diffed_in_worker_processes_give_the_same_migration(write_changelog):
+    assert diff(write_changelog, max_workers=2) == diff(write_changelog, max_workers=1)
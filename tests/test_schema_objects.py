@@ -0,0 +1,37 @@
+from logics.ChangeLogComparator import LiquibaseChangelogComparer
+
+PREVIOUS = """
+<changeSet id="1" author="a">
+  <createView viewName="active_clients">SELECT id, name FROM client WHERE active = 1</createView>
+  <createView viewName="client_names">SELECT name FROM client</createView>
+  <createView viewName="old_view">SELECT 1</createView>
+  <createSequence sequenceName="client_seq" startValue="1" incrementBy="1"/>
+  <createProcedure procedureName="touch_client">CREATE PROCEDURE touch_client() BEGIN SELECT 1; END</createProcedure>
+</changeSet>
+"""
+
+CURRENT = """
+<changeSet id="1" author="a">
+  <createView viewName="active_clients">
+    select id,   name
+    from client where active = 1
+  </createView>
+  <createView viewName="client_names">SELECT name, id FROM client</createView>
+  <createSequence sequenceName="client_seq" startValue="1" incrementBy="10"/>
+  <createSequence sequenceName="loan_seq" startValue="100"/>
+  <createProcedure procedureName="touch_client">CREATE PROCEDURE touch_client() BEGIN SELECT 1; END</createProcedure>
+</changeSet>
+"""
+
+
+def test_views_sequences_and_routines_are_diffed_by_definition(write_changelog):
+    comparer = LiquibaseChangelogComparer(write_changelog('s1.xml', PREVIOUS), write_changelog('s2.xml', CURRENT),
+                                          counter_file=None)
+
+    changes = comparer.generate_changes()
+
+    assert [(change.change_type, change.table_name) for change in changes] == [
+        ('dropView', 'old_view'), ('alterSequence', 'client_seq'), ('createSequence', 'loan_seq'),
+        ('createView', 'client_names')]
+    assert changes[1].attributes == {'incrementBy': '10'}
+    assert changes[3].replace
@@ -0,0 +1,107 @@
+import csv
+
+from logics.ChangeLogComparator import SEED_DATA_LOAD_DATA, LiquibaseChangelogComparer
+
+TABLE = """
+<changeSet id="1" author="a">
+  <createTable tableName="t">
+    <column name="id" type="INT"><constraints primaryKey="true"/></column>
+    <column name="name" type="VARCHAR(20)"/>
+  </createTable>
+  <loadData tableName="t" file="{csv}" relativeToChangelogFile="true"/>
+  {inserts}
+</changeSet>
+"""
+
+INSERTS = """
+  <insert tableName="t"><column name="id" valueNumeric="1"/><column name="name" value="x"/></insert>
+  <insert tableName="t"><column name="id" valueNumeric="2"/><column name="name" value="y"/></insert>
+"""
+
+
+def read_rows(path):
+    with open(path, newline='', encoding='utf-8') as file:
+        return list(csv.reader(file))[1:]
+
+
+def seed_data_changelogs(tmp_path, write_changelog):
+    (tmp_path / 'a.csv').write_text('id,name\n5,old\n', encoding='utf-8')
+    (tmp_path / 'b.csv').write_text('id,name\n5,old\n10,csv\n', encoding='utf-8')
+    previous = write_changelog('s1.xml', TABLE.format(csv='a.csv', inserts=''))
+    current = write_changelog('s2.xml', TABLE.format(csv='b.csv', inserts=INSERTS))
+    return previous, current
+
+
+def load_data_files(changes, seed_data_dir):
+    """Return the rows of the CSV file behind every loadData change, in change order."""
+    return [read_rows(seed_data_dir.parent / change.file) for change in changes
+            if type(change).__name__ == 'LoadDataChange']
+
+
+def test_new_inserts_and_csv_delta_of_one_table_get_separate_files(tmp_path, write_changelog):
+    previous, current = seed_data_changelogs(tmp_path, write_changelog)
+    seed_data_dir = tmp_path / 'out' / 'seed'
+    comparer = LiquibaseChangelogComparer(previous, current, seed_data_format=SEED_DATA_LOAD_DATA,
+                                          seed_data_dir=str(seed_data_dir), counter_file=None)
+
+    changes = comparer.generate_changes()
+
+    assert sorted(load_data_files(changes, seed_data_dir)) == [[['1', 'x'], ['2', 'y']], [['10', 'csv']]]
+
+
+def test_environments_write_seed_data_to_their_own_directories(tmp_path, write_changelog):
+    from logics.ChangeConditions import parse_environment
+
+    previous, current = seed_data_changelogs(tmp_path, write_changelog)
+    seed_data_dir = tmp_path / 'out' / 'seed'
+    comparer = LiquibaseChangelogComparer(previous, current, seed_data_format=SEED_DATA_LOAD_DATA,
+                                          seed_data_dir=str(seed_data_dir), counter_file=None)
+
+    paths = comparer.compare_and_generate_environments([parse_environment('prod'), parse_environment('test')],
+                                                       str(tmp_path / 'out'))
+
+    assert sorted(paths) == ['prod', 'test']
+    for environment in ('prod', 'test'):
+        migration = (tmp_path / 'out' / f"migration.{environment}.xml").read_text(encoding='utf-8')
+        assert f'file="seed/{environment}/t.csv"' in migration
+        assert f'file="seed/{environment}/t.2.csv"' in migration
+        assert sorted([read_rows(seed_data_dir / environment / 't.csv'),
+                       read_rows(seed_data_dir / environment / 't.2.csv')]) == [[['1', 'x'], ['2', 'y']],
+                                                                                 [['10', 'csv']]]
+
+
+def test_where_clause_quotes_what_is_not_a_number():
+    from logics.CsvSeedData import seed_data_where_clause
+
+    types = {'id': 'NUMERIC', 'code': 'STRING'}
+    assert seed_data_where_clause({'id': ' 42 ', 'code': "it's"}, types) == "id = 42 AND code = 'it''s'"
+    assert seed_data_where_clause({'id': '-1.5e3'}, types) == "id = -1.5e3"
+    assert seed_data_where_clause({'id': '', 'code': None}, types) == "id IS NULL AND code IS NULL"
+    assert seed_data_where_clause({'id': '1 OR 1=1'}, types) == "id = '1 OR 1=1'"
+    assert seed_data_where_clause({'id': "0; DROP TABLE t; --'"}, types) == "id = '0; DROP TABLE t; --'''"
+
+
+def test_new_rows_are_chunked_into_insert_changesets(tmp_path, write_changelog):
+    (tmp_path / 'a.csv').write_text('id,name\n', encoding='utf-8')
+    rows = ''.join(f'<insert tableName="t"><column name="id" valueNumeric="{row}"/></insert>\n' for row in range(5))
+    previous = write_changelog('s1.xml', TABLE.format(csv='a.csv', inserts=''))
+    current = write_changelog('s2.xml', TABLE.format(csv='a.csv', inserts=rows))
+    comparer = LiquibaseChangelogComparer(previous, current, insert_batch_size=2, counter_file=None)
+
+    changes = comparer.generate_changes()
+
+    assert [change.change_type for change in changes] == ['insert'] * 3
+    assert [len(change.rows) for change in changes] == [2, 2, 1]
+    assert [change.changeset_id for change in changes] == ['insert-t-1', 'insert-t-2', 'insert-t-3']
+
+
+def test_new_rows_in_load_data_mode_become_one_csv_file(tmp_path, write_changelog):
+    previous, current = seed_data_changelogs(tmp_path, write_changelog)
+    seed_data_dir = tmp_path / 'out' / 'seed'
+    comparer = LiquibaseChangelogComparer(previous, current, insert_batch_size=1, seed_data_format=SEED_DATA_LOAD_DATA,
+                                          seed_data_dir=str(seed_data_dir), counter_file=None)
+
+    migration = comparer.compare_and_generate()
+
+    assert migration.count('<loadData ') == 2
+    assert '<insert ' not in migration
@@ -0,0 +1,34 @@
+import pytest
+
+from logics.ChangeLogComparator import LiquibaseChangelogComparer
+from logics.ChangeSerializers import SERIALIZERS, get_serializer
+
+CURRENT = """
+<changeSet id="1" author="a">
+  <createTable tableName="client">
+    <column name="id" type="INT"><constraints primaryKey="true"/></column>
+    <column name="name" type="VARCHAR(20)" defaultValue="n/a"/>
+  </createTable>
+  <createIndex tableName="client" indexName="idx_client_name" unique="true"><column name="name"/></createIndex>
+  <insert tableName="client"><column name="id" valueNumeric="1"/><column name="name" value="O'Brien"/></insert>
+  <createSequence sequenceName="client_seq" startValue="100"/>
+  <createView viewName="client_names">SELECT name FROM client</createView>
+</changeSet>
+"""
+
+
+@pytest.mark.parametrize('output_format', sorted(SERIALIZERS))
+def test_migration_read_back_matches_the_current_changelog(tmp_path, write_changelog, output_format):
+    current = write_changelog('current.xml', CURRENT)
+    comparer = LiquibaseChangelogComparer(write_changelog('previous.xml', ''), current, counter_file=None)
+    migration_path = tmp_path / f"migration{get_serializer(output_format).file_extension}"
+    migration_path.write_text(comparer.compare_and_generate(output_format=output_format), encoding='utf-8')
+
+    check = LiquibaseChangelogComparer(str(migration_path), current, counter_file=None).check_migration_needed()
+
+    assert check['first_difference'] is None
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError, match="expected one of: json, sql, xml, yaml"):
+        get_serializer('toml')
@@ -0,0 +1,85 @@
+import os
+from xml.dom import minidom
+
+from logics.ChangeLogComparator import LiquibaseChangelogComparer
+
+CHANGESETS = """
+<changeSet id="1" author="a">
+  <createTable tableName="orders">
+    <column name="id" type="INT"/>
+    <column name="customer_id" type="INT">
+      <constraints foreignKeyName="fk_customer" referencedTableName="customers" referencedColumnNames="id"/>
+    </column>
+  </createTable>
+  <createTable tableName="customers"><column name="id" type="INT"/></createTable>
+  {inserts}
+</changeSet>
+"""
+
+INSERT = '<insert tableName="customers"><column name="id" valueNumeric="{id}"/></insert>'
+
+
+def write_shards(tmp_path, write_changelog, rows=6, **options):
+    previous = write_changelog('s1.xml', '')
+    current = write_changelog('s2.xml', CHANGESETS.format(
+        inserts='\n'.join(INSERT.format(id=row) for row in range(1, rows + 1))))
+    comparer = LiquibaseChangelogComparer(previous, current, counter_file=None)
+    master_path = comparer.compare_and_generate_sharded(str(tmp_path / 'shards'), **options)
+    assert master_path is not None
+    includes = [include.getAttribute('file')
+                for include in minidom.parse(master_path).getElementsByTagName('include')]
+    return {name: changeset_ids(tmp_path / 'shards' / name) for name in includes}
+
+
+def changeset_ids(path):
+    return [changeset.getAttribute('id') for changeset in minidom.parse(str(path)).getElementsByTagName('changeSet')]
+
+
+def test_shards_per_table_in_dependency_order(tmp_path, write_changelog):
+    shards = write_shards(tmp_path, write_changelog)
+
+    assert list(shards) == ['001-customers.xml', '002-orders.xml']
+    assert shards['001-customers.xml'][0] == 'create-table-customers-2'
+    assert len(shards['001-customers.xml']) == 7
+    assert shards['002-orders.xml'] == ['create-table-orders-1']
+
+
+def test_max_changesets_per_shard_splits_groups(tmp_path, write_changelog):
+    shards = write_shards(tmp_path, write_changelog, max_changesets_per_shard=3)
+
+    assert list(shards) == ['001-customers-part1.xml', '002-customers-part2.xml', '003-customers-part3.xml',
+                            '004-orders.xml']
+    assert [len(ids) for ids in shards.values()] == [3, 3, 1, 1]
+
+
+def test_max_bytes_per_shard_rolls_over_to_new_files(tmp_path, write_changelog):
+    shards = write_shards(tmp_path, write_changelog, rows=20, shard_by='changeset', max_bytes_per_shard=1000)
+
+    assert len(shards) > 1
+    assert all(name.startswith('001-changesets-') for name in shards)
+    assert sum(len(ids) for ids in shards.values()) == 22
+    # A file is only rolled over once it has reached the cap
+    assert all(os.path.getsize(tmp_path / 'shards' / name) >= 1000 for name in list(shards)[:-1])
+
+
+def test_views_and_sequences_are_dropped_around_the_table_changes(tmp_path, write_changelog):
+    table = """
+    <changeSet id="1" author="a">
+      <createTable tableName="t">
+        <column name="id" type="INT" defaultValueSequenceNext="{sequence}"/>
+        {column}
+      </createTable>
+      {objects}
+    </changeSet>
+    """
+    previous = write_changelog('s1.xml', table.format(
+        sequence='seq_t', column='<column name="name" type="VARCHAR(20)"/>',
+        objects='<createSequence sequenceName="seq_t"/>\n<createView viewName="v">SELECT name FROM t</createView>'))
+    current = write_changelog('s2.xml', table.format(sequence='', column='', objects=''))
+    comparer = LiquibaseChangelogComparer(previous, current, counter_file=None)
+
+    master_path = comparer.compare_and_generate_sharded(str(tmp_path / 'shards'))
+
+    shards = [include.getAttribute('file') for include in minidom.parse(master_path).getElementsByTagName('include')]
+    assert shards == ['001-drop-views-and-routines.xml', '002-t.xml', '003-drop-sequences.xml']
+    assert 'dropColumn' in (tmp_path / 'shards' / '002-t.xml').read_text(encoding='utf-8')
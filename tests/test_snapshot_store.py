@@ -0,0 +1,49 @@
+from logics.ChangeLogComparator import LiquibaseChangelogComparer
+
+PREVIOUS = """
+<changeSet id="1" author="a">
+  <createTable tableName="client"><column name="id" type="INT"/><column name="legacy" type="INT"/></createTable>
+  <createTable tableName="audit"><column name="id" type="INT"/></createTable>
+  <createIndex tableName="client" indexName="idx_legacy"><column name="legacy"/></createIndex>
+  <createSequence sequenceName="client_seq" startValue="1"/>
+  <createView viewName="old_view">SELECT 1</createView>
+</changeSet>
+"""
+
+CURRENT = """
+<changeSet id="1" author="a">
+  <createTable tableName="client"><column name="id" type="INT"/><column name="name" type="VARCHAR(20)"/></createTable>
+  <createTable tableName="loan"><column name="id" type="INT"/></createTable>
+  <createIndex tableName="loan" indexName="idx_loan_id"><column name="id"/></createIndex>
+  <insert tableName="loan"><column name="id" valueNumeric="1"/></insert>
+  <createSequence sequenceName="client_seq" startValue="1" incrementBy="5"/>
+  <createView viewName="client_names">SELECT name FROM client</createView>
+</changeSet>
+"""
+
+
+def generate(previous, current, **options):
+    return LiquibaseChangelogComparer(previous, current, counter_file=None, **options).compare_and_generate()
+
+
+def test_store_gives_the_same_migration_as_a_plain_diff(tmp_path, write_changelog):
+    previous = write_changelog('s1.xml', PREVIOUS)
+    current = write_changelog('s2.xml', CURRENT)
+    store = str(tmp_path / 'snapshots.db')
+
+    expected = generate(previous, current)
+
+    assert generate(previous, current, snapshot_store=store) == expected
+    # The second run reads both snapshots back from the store
+    assert generate(previous, current, snapshot_store=store) == expected
+
+
+def test_changed_changelog_is_stored_again(tmp_path, write_changelog):
+    previous = write_changelog('s1.xml', PREVIOUS)
+    current = write_changelog('s2.xml', CURRENT)
+    store = str(tmp_path / 'snapshots.db')
+    generate(previous, current, snapshot_store=store)
+
+    current = write_changelog('s2.xml', PREVIOUS)
+
+    assert '<changeSet' not in generate(previous, current, snapshot_store=store)
@@ -0,0 +1,34 @@
+import os
+
+from logics.ChangeLogComparator import LiquibaseChangelogComparer
+from logics.XmlChangelogSerializer import XmlChangelogSerializer
+
+CREATE_TABLE = '<createTable tableName="t"><column name="id" type="INT"/></createTable>'
+
+
+def generate(tmp_path, write_changelog):
+    previous = write_changelog('s1.xml', '')
+    current = write_changelog('s2.xml', f'<changeSet id="1" author="a">\n  {CREATE_TABLE}\n</changeSet>')
+    return current, LiquibaseChangelogComparer(previous, current, counter_file=None).generate_changes()
+
+
+def test_unchanged_markup_is_copied_from_the_source(tmp_path, write_changelog):
+    _, changes = generate(tmp_path, write_changelog)
+
+    assert CREATE_TABLE in XmlChangelogSerializer().to_string(changes)
+
+
+def test_markup_is_not_copied_from_a_changed_file(tmp_path, write_changelog):
+    current, changes = generate(tmp_path, write_changelog)
+    with open(current, 'r+b') as file:
+        data = file.read()
+        file.seek(0)
+        # Same length, so the span still points at a well-formed createTable
+        file.write(data.replace(b'type="INT"', b'type="XYZ"'))
+    stat = os.stat(current)
+    os.utime(current, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    migration = XmlChangelogSerializer().to_string(changes)
+
+    assert 'XYZ' not in migration
+    assert '<column name="id" type="INT"/>' in migration
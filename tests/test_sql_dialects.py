@@ -0,0 +1,48 @@
+from logics.ChangeLogComparator import LiquibaseChangelogComparer
+
+PREVIOUS = """
+<changeSet id="1" author="a">
+  <createTable schemaName="app" tableName="client">
+    <column name="id" type="BIGINT"><constraints primaryKey="true"/></column>
+    <column name="legacy" type="INT"/>
+  </createTable>
+</changeSet>
+"""
+
+CURRENT = """
+<changeSet id="1" author="a">
+  <createTable schemaName="app" tableName="client">
+    <column name="id" type="BIGINT"><constraints primaryKey="true"/></column>
+    <column name="active" type="BOOLEAN" defaultValueBoolean="true"/>
+  </createTable>
+  <insert schemaName="app" tableName="client">
+    <column name="id" valueNumeric="1"/><column name="active" valueBoolean="false"/>
+  </insert>
+</changeSet>
+"""
+
+EXPECTED_STATEMENTS = {
+    'mysql': ["ALTER TABLE app.client ADD active BIT(1) DEFAULT 1;",
+              "INSERT INTO app.client (id, active) VALUES (1, 0);"],
+    'postgresql': ["ALTER TABLE app.client ADD COLUMN active BOOLEAN DEFAULT TRUE;",
+                   "INSERT INTO app.client (id, active) VALUES (1, FALSE);"],
+    'oracle': ["ALTER TABLE app.client ADD active NUMBER(1) DEFAULT 1;",
+               "INSERT INTO app.client (id, active) VALUES (1, 0);"],
+}
+
+
+def test_every_dialect_gets_its_own_sql_file(tmp_path, write_changelog):
+    comparer = LiquibaseChangelogComparer(write_changelog('s1.xml', PREVIOUS), write_changelog('s2.xml', CURRENT),
+                                          counter_file=None)
+
+    assert comparer.compare_and_generate(sql_dir=str(tmp_path / 'sql'), sql_dialects=sorted(EXPECTED_STATEMENTS))
+
+    assert sorted(path.name for path in (tmp_path / 'sql').iterdir()) == [
+        'migration.mysql.sql', 'migration.oracle.sql', 'migration.postgresql.sql']
+    for dialect, statements in EXPECTED_STATEMENTS.items():
+        sql = (tmp_path / 'sql' / f"migration.{dialect}.sql").read_text(encoding='utf-8')
+        assert sql.startswith('--liquibase formatted sql\n')
+        assert f"--changeset migration:add-column-client-1 dbms:{dialect}\n" in sql
+        assert "ALTER TABLE app.client DROP COLUMN legacy;" in sql
+        for statement in statements:
+            assert statement in sql
@@ -0,0 +1,46 @@
+import sqlite3
+
+from logics.ChangeLogComparator import LiquibaseChangelogComparer
+
+CHANGELOG = """
+<changeSet id="1" author="a">
+  <createTable tableName="client">
+    <column name="id" type="INTEGER"><constraints primaryKey="true"/></column>
+    <column name="name" type="VARCHAR(20)"/>
+  </createTable>
+  <createIndex tableName="client" indexName="idx_client_name"><column name="name"/></createIndex>
+</changeSet>
+"""
+
+
+def create_database(path, *statements):
+    connection = sqlite3.connect(path)
+    try:
+        for statement in statements:
+            connection.execute(statement)
+        connection.commit()
+    finally:
+        connection.close()
+    return f"sqlite:{path}"
+
+
+def test_database_matching_the_changelog_needs_no_migration(tmp_path, write_changelog):
+    database = create_database(tmp_path / 'app.db',
+                               "CREATE TABLE client (id INTEGER PRIMARY KEY, name VARCHAR(20))",
+                               "CREATE INDEX idx_client_name ON client (name)")
+
+    comparer = LiquibaseChangelogComparer(database, write_changelog('changelog.xml', CHANGELOG), counter_file=None)
+
+    assert comparer.check_migration_needed()['first_difference'] is None
+
+
+def test_changelog_is_diffed_against_the_database(tmp_path, write_changelog):
+    database = create_database(tmp_path / 'app.db',
+                               "CREATE TABLE client (id INTEGER PRIMARY KEY, legacy INT)",
+                               "CREATE TABLE audit (id INTEGER)")
+
+    changes = LiquibaseChangelogComparer(database, write_changelog('changelog.xml', CHANGELOG),
+                                         counter_file=None).generate_changes()
+
+    assert [(change.change_type, change.table_name) for change in changes] == [
+        ('dropTable', 'audit'), ('addColumn', 'client'), ('dropColumn', 'client'), ('createIndex', 'client')]
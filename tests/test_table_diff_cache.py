@@ -0,0 +1,29 @@
+from logics.ChangeLogComparator import LiquibaseChangelogComparer
+from logics.TableDiffCache import TableDiffCache
+
+TABLE = """
+<changeSet id="1" author="a">
+  <createTable tableName="t">
+    <column name="id" type="INT"/>
+    {column}
+  </createTable>
+</changeSet>
+"""
+
+
+def test_cache_stats_count_one_lookup_per_table_pair(write_changelog):
+    previous = write_changelog('s1.xml', TABLE.format(column='<column name="old" type="INT"/>'))
+    current = write_changelog('s2.xml', TABLE.format(column='<column name="new" type="INT"/>'))
+    cache = TableDiffCache()
+
+    cold = LiquibaseChangelogComparer(previous, current, counter_file=None, table_diff_cache=cache).generate_changes()
+    assert [change.change_type for change in cold] == ['addColumn', 'dropColumn']
+    assert cache.stats()['hits'] == 0
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['hit_rate'] == 0.0
+
+    warm = LiquibaseChangelogComparer(previous, current, counter_file=None, table_diff_cache=cache).generate_changes()
+    assert [change.change_type for change in warm] == ['addColumn', 'dropColumn']
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['hit_rate'] == 0.5
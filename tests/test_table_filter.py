@@ -0,0 +1,46 @@
+from logics.ChangeLogComparator import LiquibaseChangelogComparer
+from logics.TableFilter import TableFilter, split_patterns
+
+PREVIOUS = """
+<changeSet id="1" author="a">
+  <createTable tableName="m_loan"><column name="id" type="INT"/></createTable>
+  <createTable tableName="m_client"><column name="id" type="INT"/></createTable>
+</changeSet>
+"""
+
+CURRENT = """
+<changeSet id="1" author="a">
+  <createTable tableName="m_loan">
+    <column name="id" type="INT"/><column name="updated_at" type="DATETIME"/><column name="amount" type="INT"/>
+  </createTable>
+  <createTable tableName="m_client"><column name="id" type="INT"/><column name="name" type="VARCHAR(20)"/></createTable>
+  <createTable tableName="tmp_import"><column name="id" type="INT"/></createTable>
+</changeSet>
+"""
+
+
+def diff(write_changelog, table_filter):
+    return [(change.change_type, change.table_name,
+             [column.getAttribute('name') for column in getattr(change, 'columns', ())])
+            for change in LiquibaseChangelogComparer(write_changelog('s1.xml', PREVIOUS),
+                                                     write_changelog('s2.xml', CURRENT), counter_file=None,
+                                                     table_filter=table_filter).generate_changes()]
+
+
+def test_excluded_tables_and_columns_are_left_out(write_changelog):
+    table_filter = TableFilter(exclude_tables=['tmp_*'], exclude_columns=['*.updated_at'])
+
+    assert diff(write_changelog, table_filter) == [('addColumn', 'm_loan', ['amount']),
+                                                   ('addColumn', 'm_client', ['name'])]
+
+
+def test_include_patterns_take_globs_and_regular_expressions(write_changelog):
+    table_filter = TableFilter(include_tables=[*split_patterns('M_LOAN'), *split_patterns('re:tmp_.*')])
+
+    assert diff(write_changelog, table_filter) == [('createTable', 'tmp_import', []),
+                                                   ('addColumn', 'm_loan', ['updated_at', 'amount'])]
+
+
+def test_split_patterns():
+    assert split_patterns(' m_loan*, m_client ,') == ['m_loan*', 'm_client']
+    assert split_patterns('re:m_(loan|client),x') == ['re:m_(loan|client),x']
@@ -0,0 +1,56 @@
+import json
+
+import cli
+from logics.ThreeWayMerge import ThreeWayChangelogMerger
+
+BASE = """
+<changeSet id="1" author="a">
+  <createTable tableName="client"><column name="id" type="INT"/></createTable>
+  <createTable tableName="audit"><column name="id" type="INT"/></createTable>
+  <createView viewName="client_ids">SELECT id FROM client</createView>
+</changeSet>
+"""
+
+OURS = """
+<changeSet id="1" author="a">
+  <createTable tableName="client"><column name="id" type="INT"/><column name="name" type="VARCHAR(20)"/></createTable>
+  <createTable tableName="audit"><column name="id" type="INT"/></createTable>
+  <createView viewName="client_ids">SELECT id FROM client WHERE id > 0</createView>
+</changeSet>
+"""
+
+THEIRS = """
+<changeSet id="1" author="a">
+  <createTable tableName="client"><column name="id" type="INT"/><column name="email" type="VARCHAR(50)"/></createTable>
+  <createTable tableName="loan"><column name="id" type="INT"/></createTable>
+  <createView viewName="client_ids">SELECT id FROM client WHERE id > 1</createView>
+</changeSet>
+"""
+
+
+def test_changes_of_both_branches_are_merged(write_changelog):
+    merger = ThreeWayChangelogMerger(write_changelog('base.xml', BASE), write_changelog('ours.xml', OURS),
+                                     write_changelog('theirs.xml', THEIRS), comparer_options={'counter_file': None})
+
+    changes = merger.merge_changes()
+
+    assert [(change.change_type, change.table_name) for change in changes] == [
+        ('createTable', 'loan'), ('dropTable', 'audit'), ('addColumn', 'client'), ('createView', 'client_ids')]
+    assert [column.getAttribute('name') for column in changes[2].columns] == ['name', 'email']
+    assert 'id > 0' in changes[3].view.text
+    assert merger.conflicts == [{'object': 'view', 'name': 'client_ids',
+                                 'reason': 'changed differently on both branches', 'resolution': 'ours'}]
+
+
+def test_cli_exits_with_one_on_conflicts_and_writes_the_report(tmp_path, monkeypatch, write_changelog):
+    base, ours, theirs = (write_changelog(name, body) for name, body in
+                          (('base.xml', BASE), ('ours.xml', OURS), ('theirs.xml', THEIRS)))
+    monkeypatch.chdir(tmp_path)
+
+    exit_code = cli.main([ours, theirs, '--merge-base', base, '--output', 'merge.xml',
+                          '--conflict-report', 'conflicts.json'])
+
+    assert exit_code == 1
+    assert '<createTable tableName="loan">' in (tmp_path / 'merge.xml').read_text(encoding='utf-8')
+    report = json.loads((tmp_path / 'conflicts.json').read_text(encoding='utf-8'))
+    assert [conflict['name'] for conflict in report['conflicts']] == ['client_ids']
@@ -1,9 +1,26 @@
 # change_log_window.py
 
 import sys
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QFileDialog,QMessageBox
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QFileDialog,QMessageBox, \
+    QComboBox, QPlainTextEdit, QSpinBox
 from PyQt5.QtCore import Qt
 from logics.ChangeLogComparator import LiquibaseChangelogComparer
+from logics.ChangeSerializers import RenderedChangelogCache
+from logics.ShardedChangelogWriter import SHARD_BY_CHANGESET, SHARD_BY_TABLE
+
+# Output formats offered in the format selector: (label, serializer format name, save dialog filter)
+OUTPUT_FORMATS = (
+    ("Liquibase XML", 'xml', "XML Files (*.xml);;All Files (*)"),
+    ("Liquibase YAML", 'yaml', "YAML Files (*.yaml *.yml);;All Files (*)"),
+    ("Liquibase JSON", 'json', "JSON Files (*.json);;All Files (*)"),
+    ("Formatted SQL", 'sql', "SQL Files (*.sql);;All Files (*)"),
+)
+
+# Shard modes offered in the shard selector: (label, shard_by)
+SHARD_MODES = (
+    ("One shard per table", SHARD_BY_TABLE),
+    ("One stream of changesets", SHARD_BY_CHANGESET),
+)
 
 class ChangeLogWindow(QWidget):
     def __init__(self):
@@ -11,6 +28,7 @@ class ChangeLogWindow(QWidget):
 
         self.current_xml = None  # To store the current XML file path
         self.previous_xml = None  # To store the previous XML file path
+        self.rendered_changelog = None  # Change list of the last comparison, rendered per output format
 
         self.initUI()
 
@@ -55,25 +73,64 @@ class ChangeLogWindow(QWidget):
         self.generate_btn.setEnabled(False)  # Initially disabled until files are selected
         self.generate_btn.clicked.connect(self.generate_migration_script)
 
+        # Create a selector for the output format; switching it re-renders the last comparison
+        self.format_combo = QComboBox()
+        for label, _, _ in OUTPUT_FORMATS:
+            self.format_combo.addItem(label)
+        self.format_combo.currentIndexChanged.connect(self.show_preview)
+        vbox.addWidget(self.format_combo, alignment=Qt.AlignCenter)
+
         # Add the generate button below the file names, centered between both
         vbox.addWidget(self.generate_btn, alignment=Qt.AlignCenter)
 
+        # Create a "Generate Sharded Migration" button that writes shard files plus a master changelog
+        self.generate_sharded_btn = QPushButton("Generate Sharded Migration")
+        self.generate_sharded_btn.setEnabled(False)  # Initially disabled until files are selected
+        self.generate_sharded_btn.clicked.connect(self.generate_sharded_migration)
+        vbox.addWidget(self.generate_sharded_btn, alignment=Qt.AlignCenter)
+
+        # Shard options: how changesets are grouped, and the caps per shard file (0 means no cap)
+        hbox_shards = QHBoxLayout()
+        self.shard_by_combo = QComboBox()
+        for label, _ in SHARD_MODES:
+            self.shard_by_combo.addItem(label)
+        self.max_changesets_spin = QSpinBox()
+        self.max_changesets_spin.setRange(0, 1000000)
+        self.max_changesets_spin.setSpecialValueText("No limit")
+        self.max_kilobytes_spin = QSpinBox()
+        self.max_kilobytes_spin.setRange(0, 10000000)
+        self.max_kilobytes_spin.setSuffix(" KB")
+        self.max_kilobytes_spin.setSpecialValueText("No limit")
+        hbox_shards.addWidget(self.shard_by_combo)
+        hbox_shards.addWidget(QLabel("Max changesets per shard:"))
+        hbox_shards.addWidget(self.max_changesets_spin)
+        hbox_shards.addWidget(QLabel("Max size per shard:"))
+        hbox_shards.addWidget(self.max_kilobytes_spin)
+        vbox.addLayout(hbox_shards)
+
+        # Read-only preview of the generated migration in the selected format
+        self.preview = QPlainTextEdit()
+        self.preview.setReadOnly(True)
+        vbox.addWidget(self.preview)
+
         self.setLayout(vbox)
         self.setWindowTitle("Change Log Selector")
         self.show()
 
     def select_current_xml(self):
-        file_name, _ = QFileDialog.getOpenFileName(self, "Select Current Change Log", "", "XML files (*.xml)")
+        file_name, _ = QFileDialog.getOpenFileName(self, "Select Current Change Log", "", "Changelog files (*.xml *.yaml *.yml *.json *.sql)")
         if file_name:
             self.current_xml = file_name  # Store the selected file path
+            self.rendered_changelog = None  # A new file means a new comparison
             self.current_label.setText(
                 f"Selected: {file_name.split('/')[-1]}")  # Display the file name under the button
             self.check_enable_generate_btn()  # Check if both files are selected to enable the migration button
 
     def select_previous_xml(self):
-        file_name, _ = QFileDialog.getOpenFileName(self, "Select Previous Change Log", "", "XML files (*.xml)")
+        file_name, _ = QFileDialog.getOpenFileName(self, "Select Previous Change Log", "", "Changelog files (*.xml *.yaml *.yml *.json *.sql)")
         if file_name:
             self.previous_xml = file_name  # Store the selected file path
+            self.rendered_changelog = None  # A new file means a new comparison
             self.previous_label.setText(
                 f"Selected: {file_name.split('/')[-1]}")  # Display the file name under the button
             self.check_enable_generate_btn()  # Check if both files are selected to enable the migration button
@@ -82,6 +139,7 @@ class ChangeLogWindow(QWidget):
         """Enable the 'Generate Migration Script' button only if both files are selected."""
         if self.current_xml and self.previous_xml:
             self.generate_btn.setEnabled(True)  # Enable the button when both files are selected
+            self.generate_sharded_btn.setEnabled(True)
 
     def generate_migration_script(self):
         """Handle the logic for generating the migration script."""
@@ -92,13 +150,19 @@ class ChangeLogWindow(QWidget):
         current_changelog_path = self.current_xml  # Replace with the actual path to the current XML
 
         try:
-            comparator = LiquibaseChangelogComparer(previous_changelog_path, current_changelog_path)
-            new_changelog = comparator.compare_and_generate()
+            # The diff runs once per pair of files; other formats are rendered from the same changes
+            if self.rendered_changelog is None:
+                comparator = LiquibaseChangelogComparer(previous_changelog_path, current_changelog_path)
+                self.rendered_changelog = RenderedChangelogCache(comparator.generate_changes())
+
+            _, output_format, file_filter = OUTPUT_FORMATS[self.format_combo.currentIndex()]
+            new_changelog = self.rendered_changelog.render(output_format)
+            self.preview.setPlainText(new_changelog)
 
             # Open a file dialog for the user to select the export location
             options = QFileDialog.Options()
             file_path, _ = QFileDialog.getSaveFileName(self, "Save Migration Script", "",
-                                                       "XML Files (*.xml);;All Files (*)", options=options)
+                                                       file_filter, options=options)
 
             # If the user selects a file path
             if file_path:
@@ -119,3 +183,31 @@ class ChangeLogWindow(QWidget):
         # Print the new XML to see the generated migration changelog
         # print(new_changelog)
 
+    def show_preview(self):
+        """Show the last comparison in the selected output format, without running the diff again."""
+        if self.rendered_changelog is None:
+            return
+        _, output_format, _ = OUTPUT_FORMATS[self.format_combo.currentIndex()]
+        self.preview.setPlainText(self.rendered_changelog.render(output_format))
+
+    def generate_sharded_migration(self):
+        """Generate the migration as shard files plus a master changelog in a chosen folder, per the shard options."""
+        output_dir = QFileDialog.getExistingDirectory(self, "Select Output Folder For Migration Shards", "")
+        if not output_dir:
+            print("Save operation was canceled.")
+            return
+
+        try:
+            comparator = LiquibaseChangelogComparer(self.previous_xml, self.current_xml)
+            master_path = comparator.compare_and_generate_sharded(
+                output_dir,
+                shard_by=SHARD_MODES[self.shard_by_combo.currentIndex()][1],
+                max_changesets_per_shard=self.max_changesets_spin.value() or None,
+                max_bytes_per_shard=self.max_kilobytes_spin.value() * 1024 or None)
+
+            if master_path:
+                QMessageBox.information(self, "Success", f"Migration shards saved successfully!\nMaster changelog: {master_path}")
+
+        except Exception as e:
+            print(f"Error generating sharded migration script: {e}")
+